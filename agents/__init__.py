@@ -0,0 +1,15 @@
+from dotenv import find_dotenv, load_dotenv
+
+
+def load_environment():
+    """Load ``.env`` into ``os.environ``: the one nearest the working directory, else the repo's.
+
+    Runs when the package is imported and again first thing when an agent is
+    built, so settings read at import or construction time (AGENT_BACKENDS,
+    VECTOR_BACKEND, AGENT_MODE, PDF_CHUNKER, PDF_RETRIEVER, PDF_CORPUS, ...)
+    see ``.env`` whichever agent is built first.
+    """
+    load_dotenv(find_dotenv(usecwd=True) or find_dotenv(), override=True)
+
+
+load_environment()
@@ -0,0 +1,272 @@
+import base64
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from agents.metrics import get_metrics
+
+CACHE_DIR = os.getenv("AGENT_CACHE_DIR", ".cache")
+
+
+def normalize_question(question: str) -> str:
+    question = re.sub(r"[^\w\s]", " ", question.lower())
+    return " ".join(question.split())
+
+
+def _encode_vector(vector):
+    if vector is None:
+        return None
+    return base64.b64encode(np.asarray(vector, dtype=np.float32).tobytes()).decode("ascii")
+
+
+def _decode_vector(data):
+    if data is None:
+        return None
+    return np.frombuffer(base64.b64decode(data), dtype=np.float32)
+
+
+class AnswerCache:
+    """TTL/LRU-bounded cache of answers keyed on document and question.
+
+    Lookups first try the normalized question exactly. When an embeddings
+    model is passed and ``similarity_threshold`` is set, a miss falls back to
+    the nearest cached question for the same document by cosine similarity.
+    Entries persist to an append-only JSON-lines journal so answers survive
+    restarts: a store appends just its own entries, after the in-memory
+    update and outside the lock lookups take, and the journal is compacted
+    to the live entries once it holds twice ``max_entries`` lines.
+    """
+
+    def __init__(
+        self,
+        path: str = None,
+        ttl_seconds: float = 24 * 60 * 60,
+        max_entries: int = 1000,
+        similarity_threshold: float = 0.95,
+        clock=time.time,
+    ):
+        self.path = path or os.path.join(CACHE_DIR, "answers.jsonl")
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.similarity_threshold = similarity_threshold
+        self._clock = clock
+        self._lock = threading.Lock()
+        # Serializes journal writes; taken before self._lock, never while holding it
+        self._write_lock = threading.Lock()
+        # Journal records not yet written, in the order they were stored
+        self._pending = []
+        self._journal_lines = 0
+        self._entries = OrderedDict()
+        # (namespace, doc) -> (keys, unit-normalized vector matrix), rebuilt lazily
+        self._indexes = {}
+        self._metrics = {
+            "hits": 0,
+            "semantic_hits": 0,
+            "misses": 0,
+            "evictions": 0,
+            "saved_seconds": 0.0,
+        }
+        self._load()
+
+    @staticmethod
+    def _key(namespace: str, doc: str, question: str) -> str:
+        return f"{namespace}|{doc}|{normalize_question(question)}"
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                lines = f.readlines()
+        except OSError:
+            print(f"Ignoring unreadable answer cache at {self.path}")
+            return
+        for line in lines:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # A torn last line from an interrupted append
+                continue
+            key = record.pop("key")
+            record["vector"] = _decode_vector(record.get("vector"))
+            self._entries[key] = record
+            self._entries.move_to_end(key)
+        self._journal_lines = len(lines)
+        self._evict()
+
+    @staticmethod
+    def _record(key: str, entry: dict) -> str:
+        return json.dumps(dict(entry, key=key, vector=_encode_vector(entry.get("vector")))) + "\n"
+
+    def _flush(self):
+        """Append pending entries to the journal, compacting it when it has grown too long."""
+        with self._write_lock:
+            with self._lock:
+                pending, self._pending = self._pending, []
+                compact = self._journal_lines + len(pending) > 2 * self.max_entries
+                if compact:
+                    # Entries are replaced, never mutated, so a shallow copy is a consistent snapshot
+                    pending = list(self._entries.items())
+            if not pending and not compact:
+                return
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            lines = [self._record(key, entry) for key, entry in pending]
+            if compact:
+                tmp_path = self.path + ".tmp"
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    f.writelines(lines)
+                os.replace(tmp_path, self.path)
+                self._journal_lines = len(lines)
+            else:
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.writelines(lines)
+                self._journal_lines += len(lines)
+
+    def _evict(self):
+        now = self._clock()
+        expired = [k for k, e in self._entries.items() if now - e["created_at"] > self.ttl_seconds]
+        for key in expired:
+            self._drop(key)
+        while len(self._entries) > self.max_entries:
+            self._drop(next(iter(self._entries)))
+
+    def _drop(self, key: str):
+        entry = self._entries.pop(key)
+        self._indexes.pop((entry["namespace"], entry["doc"]), None)
+        self._metrics["evictions"] += 1
+
+    def _nearest(self, namespace: str, doc: str, vector):
+        index = self._indexes.get((namespace, doc))
+        if index is None:
+            keys = [
+                k for k, e in self._entries.items()
+                if e["namespace"] == namespace and e["doc"] == doc and e.get("vector") is not None
+            ]
+            if not keys:
+                return None, 0.0
+            matrix = np.stack([self._entries[k]["vector"] for k in keys])
+            matrix /= np.linalg.norm(matrix, axis=1, keepdims=True) + 1e-12
+            index = (keys, matrix)
+            self._indexes[(namespace, doc)] = index
+        keys, matrix = index
+        query = np.asarray(vector, dtype=np.float32)
+        if query.shape[0] != matrix.shape[1]:
+            return None, 0.0
+        scores = matrix @ (query / (np.linalg.norm(query) + 1e-12))
+        best = int(np.argmax(scores))
+        return keys[best], float(scores[best])
+
+    def lookup(self, namespace: str, doc: str, question: str, embeddings=None, vector=None):
+        """Return ``(answer, vector)``; answer is None on a miss.
+
+        ``vector`` is the question embedding computed for the semantic
+        lookup (or None), to be passed back to :meth:`store` on a miss.
+        Callers that already embedded the normalized question, e.g. in a
+        batch, can pass it in instead of ``embeddings``.
+        """
+        start = time.perf_counter()
+        key = self._key(namespace, doc, question)
+        with self._lock:
+            self._evict()
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self._count("hits", namespace, entry, start)
+                return entry["answer"], entry.get("vector")
+
+        if (embeddings is None and vector is None) or self.similarity_threshold is None:
+            with self._lock:
+                self._count("misses", namespace)
+            return None, vector
+
+        if vector is None:
+            vector = embeddings.embed_query(normalize_question(question))
+        vector = np.asarray(vector, dtype=np.float32)
+        with self._lock:
+            nearest, score = self._nearest(namespace, doc, vector)
+            if nearest is not None and score >= self.similarity_threshold and nearest in self._entries:
+                entry = self._entries[nearest]
+                self._entries.move_to_end(nearest)
+                self._count("semantic_hits", namespace, entry, start)
+                return entry["answer"], vector
+            self._count("misses", namespace)
+        return None, vector
+
+    def _count(self, result: str, namespace: str, entry: dict = None, start: float = None):
+        # Caller holds the lock
+        self._metrics[result] += 1
+        if entry is not None:
+            self._metrics["saved_seconds"] += max(entry["latency"] - (time.perf_counter() - start), 0.0)
+        get_metrics().incr("cache_lookups", cache=f"answer_{namespace}", result=result)
+
+    def store(self, namespace: str, doc: str, question: str, answer: str, latency: float, vector=None):
+        self.store_many(namespace, doc, [(question, answer, latency, vector)])
+
+    def store_many(self, namespace: str, doc: str, items):
+        """Store ``(question, answer, latency, vector)`` items with one append to the journal."""
+        with self._lock:
+            for question, answer, latency, vector in items:
+                key = self._key(namespace, doc, question)
+                entry = self._entries[key] = {
+                    "namespace": namespace,
+                    "doc": doc,
+                    "question": normalize_question(question),
+                    "answer": answer,
+                    "latency": latency,
+                    "created_at": self._clock(),
+                    "vector": None if vector is None else np.asarray(vector, dtype=np.float32),
+                }
+                self._entries.move_to_end(key)
+                self._pending.append((key, entry))
+            self._indexes.pop((namespace, doc), None)
+            self._evict()
+        self._flush()
+
+    def get_or_compute(self, namespace: str, doc: str, question: str, compute, embeddings=None):
+        answer, vector = self.lookup(namespace, doc, question, embeddings)
+        if answer is not None:
+            return answer
+        start = time.perf_counter()
+        answer = compute()
+        self.store(namespace, doc, question, answer, time.perf_counter() - start, vector)
+        return answer
+
+    def metrics(self) -> dict:
+        with self._lock:
+            metrics = dict(self._metrics)
+            metrics["size"] = len(self._entries)
+            lookups = metrics["hits"] + metrics["semantic_hits"] + metrics["misses"]
+            metrics["hit_rate"] = (metrics["hits"] + metrics["semantic_hits"]) / lookups if lookups else 0.0
+            return metrics
+
+    def clear(self):
+        with self._write_lock:
+            with self._lock:
+                self._entries.clear()
+                self._indexes.clear()
+                self._pending = []
+            if os.path.exists(self.path):
+                os.remove(self.path)
+            self._journal_lines = 0
+
+
+_answer_cache = None
+_answer_cache_lock = threading.Lock()
+
+
+def get_answer_cache() -> AnswerCache:
+    global _answer_cache
+    with _answer_cache_lock:
+        if _answer_cache is None:
+            threshold = os.getenv("ANSWER_CACHE_SIMILARITY", "0.95")
+            _answer_cache = AnswerCache(
+                ttl_seconds=float(os.getenv("ANSWER_CACHE_TTL", str(24 * 60 * 60))),
+                max_entries=int(os.getenv("ANSWER_CACHE_MAX", "1000")),
+                similarity_threshold=float(threshold) if threshold else None,
+            )
+        return _answer_cache
@@ -0,0 +1,159 @@
+import os
+import sys
+import threading
+
+from agents import load_environment
+
+CACHE_DIR = os.getenv("AGENT_CACHE_DIR", ".cache")
+BACKEND_MODES = ("live", "fake", "record", "replay")
+
+
+class Backends:
+    """Where agents get their LLM, embeddings, weather API and vector store.
+
+    - live: Gemini/Groq through the LLM router, Gemini embeddings,
+      OpenWeatherMap and ``VECTOR_BACKEND`` (Qdrant by default).
+    - fake: deterministic offline fakes (agents.fakes) with latencies drawn
+      from ``FAKE_LLM_LATENCY``, ``FAKE_EMBED_LATENCY`` and
+      ``FAKE_WEATHER_LATENCY``, and the in-process numpy vector store.
+    - record: live services, with every response also written to cassettes
+      under ``cassette_dir``.
+    - replay: answers only from those cassettes (agents.recording); no
+      network and no API keys. ``REPLAY_LATENCY`` replays recorded timings.
+
+    Each kind is built once and shared, like the live LLM router.
+    """
+
+    def __init__(self, mode: str = None, cassette_dir: str = None, seed: int = 0):
+        self.mode = mode or os.getenv("AGENT_BACKENDS", "live")
+        if self.mode not in BACKEND_MODES:
+            raise ValueError(f"Unknown backend mode {self.mode!r}; expected one of {BACKEND_MODES}")
+        self.cassette_dir = cassette_dir or os.getenv("AGENT_CASSETTE_DIR", os.path.join(CACHE_DIR, "cassettes"))
+        self.seed = seed
+        self.replay_latency = os.getenv("REPLAY_LATENCY", "false").lower() in ("1", "true", "yes")
+        self._lock = threading.Lock()
+        self._built = {}
+
+    def _get(self, key, build):
+        with self._lock:
+            if key not in self._built:
+                self._built[key] = build()
+            return self._built[key]
+
+    def _cassette(self, name: str):
+        from agents.recording import Cassette
+
+        return self._get(("cassette", name), lambda: Cassette(os.path.join(self.cassette_dir, f"{name}.jsonl")))
+
+    def llm(self):
+        return self._get("llm", self._build_llm)
+
+    def _build_llm(self):
+        if self.mode == "fake":
+            from agents.fakes import FakeChatModel
+
+            return FakeChatModel(
+                latency=os.getenv("FAKE_LLM_LATENCY", "0.05"),
+                token_latency=float(os.getenv("FAKE_TOKEN_LATENCY", "0")),
+                seed=self.seed,
+            )
+        from agents.recording import RecordingChatModel
+
+        if self.mode == "replay":
+            return RecordingChatModel(cassette=self._cassette("llm"), mode="replay", replay_latency=self.replay_latency)
+        from agents.llm_router import get_llm_router
+
+        if self.mode == "record":
+            return RecordingChatModel(cassette=self._cassette("llm"), inner=get_llm_router(), mode="record")
+        return get_llm_router()
+
+    def embeddings(self, model: str = "gemini-embedding-001"):
+        return self._get(("embeddings", model), lambda: self._build_embeddings(model))
+
+    def _build_embeddings(self, model: str):
+        if self.mode == "fake":
+            from agents.fakes import FakeEmbeddings
+
+            return FakeEmbeddings(latency=os.getenv("FAKE_EMBED_LATENCY", "0.01"), seed=self.seed)
+        from agents.recording import RecordingEmbeddings
+
+        if self.mode == "replay":
+            return RecordingEmbeddings(
+                self._cassette("embeddings"), mode="replay", model=model, replay_latency=self.replay_latency
+            )
+        from langchain_google_genai import GoogleGenerativeAIEmbeddings
+
+        live = GoogleGenerativeAIEmbeddings(model=model)
+        if self.mode == "record":
+            return RecordingEmbeddings(self._cassette("embeddings"), live, mode="record", model=model)
+        return live
+
+    def weather(self):
+        """An object with ``run(location)``; non-live backends also have ``arun``."""
+        return self._get("weather", self._build_weather)
+
+    def _build_weather(self):
+        if self.mode == "fake":
+            from agents.fakes import FakeWeather
+
+            return FakeWeather(
+                latency=os.getenv("FAKE_WEATHER_LATENCY", "0.05"),
+                error_rate=float(os.getenv("FAKE_WEATHER_ERROR_RATE", "0")),
+                seed=self.seed,
+            )
+        from agents.recording import RecordingWeather
+
+        if self.mode == "replay":
+            return RecordingWeather(self._cassette("weather"), mode="replay", replay_latency=self.replay_latency)
+        from langchain_community.utilities import OpenWeatherMapAPIWrapper
+
+        live = OpenWeatherMapAPIWrapper()
+        if self.mode == "record":
+            from agents.weather_client import AsyncWeatherClient
+
+            return RecordingWeather(self._cassette("weather"), live, AsyncWeatherClient(live), mode="record")
+        return live
+
+    def vector_backend(self) -> str:
+        # A live Qdrant is only the default when talking to live services
+        default = "qdrant" if self.mode in ("live", "record") else "numpy"
+        return os.getenv("VECTOR_BACKEND", default)
+
+
+def embed_queries(embeddings, texts):
+    """Embed ``texts`` as search queries in one batched request.
+
+    Embeddings that batch queries differently from documents define their
+    own ``embed_queries``. Gemini embeds queries with its own task type, so
+    its batches ask for it to match what ``embed_query`` returns.
+    """
+    if hasattr(embeddings, "embed_queries"):
+        return embeddings.embed_queries(texts)
+    # Not imported here: an instance means the module is loaded already
+    gemini = sys.modules.get("langchain_google_genai")
+    if gemini is not None and isinstance(embeddings, gemini.GoogleGenerativeAIEmbeddings):
+        return embeddings.embed_documents(texts, task_type="RETRIEVAL_QUERY")
+    return embeddings.embed_documents(texts)
+
+
+_backends = None
+_backends_lock = threading.Lock()
+
+
+def get_backends() -> Backends:
+    """Process-wide Backends, chosen by ``AGENT_BACKENDS`` unless set_backends ran first."""
+    global _backends
+    with _backends_lock:
+        if _backends is None:
+            # The mode is fixed for the process from here on, so it must see .env
+            load_environment()
+            _backends = Backends()
+        return _backends
+
+
+def set_backends(backends: Backends) -> Backends:
+    """Swap the process-wide Backends (e.g. fakes in a load test); returns the previous one."""
+    global _backends
+    with _backends_lock:
+        previous, _backends = _backends, backends
+        return previous
@@ -0,0 +1,293 @@
+import os
+import re
+from typing import Any, Callable, List, Optional
+
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from langchain_text_splitters import CharacterTextSplitter, TextSplitter
+from pydantic import ConfigDict
+
+from agents.metrics import get_metrics
+
+CHUNKERS = ("structured", "character")
+# (chunk_size, chunk_overlap): tokens for "structured", characters for "character"
+CHUNK_DEFAULTS = {"structured": (256, 32), "character": (1000, 0)}
+# Context tokens per answer for each model. A few chunks hold the answer; every
+# token beyond that adds prefill latency and counts against per-minute quotas.
+CONTEXT_BUDGETS = {"gemini-2.5-flash": 1500, "llama-3.3-70b-versatile": 1000}
+DEFAULT_CONTEXT_BUDGET = 1000
+
+SENTENCE_BREAK = re.compile(r"(?<=[.!?])\s+")
+LINE_BREAK = re.compile(r"\s*\n\s*")
+WORD_BREAK = re.compile(r"\s+")
+NUMBERED_HEADING = re.compile(r"^(?:\d+(?:\.\d+)*\.?|[IVX]+\.)\s+[A-Z]")
+WORD_PATTERN = re.compile(r"\w+")
+BULLETS = "•-*–·▪"
+
+
+def estimate_tokens(text: str) -> int:
+    """Tokens as characters / 4, the estimate metrics and benchmarks use too."""
+    return (len(text) + 3) // 4
+
+
+def is_heading(line: str, max_words: int = 10) -> bool:
+    """Whether a line of extracted PDF text looks like a section heading.
+
+    Numbered ("2.1 Revenue"), markdown, all-caps and short title-case or
+    colon-terminated lines count; anything ending like a sentence does not.
+    """
+    words = line.split()
+    if not words or len(words) > max_words or line[-1] in ".,;!?":
+        return False
+    if line.startswith("#") or NUMBERED_HEADING.match(line) or (line.endswith(":") and len(words) <= 6):
+        return True
+    letters = [c for c in line if c.isalpha()]
+    if len(letters) >= 3 and all(c.isupper() for c in letters):
+        return True
+    long_words = [w for w in words if len(w) > 3 and w[0].isalpha()]
+    return bool(long_words) and "," not in line and all(w[0].isupper() for w in long_words)
+
+
+class StructuredTextSplitter(TextSplitter):
+    """Token-sized chunks that end on heading, paragraph and sentence boundaries.
+
+    Text is parsed into sections (a heading and its paragraphs). PDF text
+    has no blank lines, so a paragraph also ends at a short line that ends
+    a sentence, and a bullet starts one; lines wrapped inside a paragraph
+    are joined back together. Whole sections that fit are packed together;
+    a longer one is split at paragraphs, then sentences, then lines or
+    words, and each of its chunks starts with the section heading and the
+    last ``chunk_overlap`` tokens of sentences from the chunk before. Sizes
+    are in tokens as counted by ``length_function`` (default: characters / 4).
+    Ingestion splits page by page, so chunks never span pages. Each chunk's
+    metadata gets the ``section`` heading it starts in.
+    """
+
+    def __init__(self, chunk_size: int = 256, chunk_overlap: int = 32, length_function: Callable[[str], int] = estimate_tokens, **kwargs):
+        super().__init__(chunk_size=chunk_size, chunk_overlap=chunk_overlap, length_function=length_function, **kwargs)
+
+    def sections(self, text: str):
+        """(heading, paragraphs) pairs in order; text before the first heading has heading ""."""
+        lines = [line.strip() for line in text.splitlines()]
+        width = max((len(line) for line in lines), default=0)
+        sections = [("", [])]
+        paragraph = []
+
+        def end_paragraph():
+            if paragraph:
+                sections[-1][1].append(" ".join(paragraph))
+                paragraph.clear()
+
+        for line in lines:
+            if not line:
+                end_paragraph()
+            elif is_heading(line):
+                end_paragraph()
+                sections.append((line, []))
+            else:
+                if line[0] in BULLETS:
+                    end_paragraph()
+                paragraph.append(line)
+                if line[-1] in ".!?:" and len(line) < 0.8 * width:
+                    end_paragraph()
+        end_paragraph()
+        return [(heading, paragraphs) for heading, paragraphs in sections if heading or paragraphs]
+
+    def _units(self, text: str, size: int):
+        # Pieces of ``text`` no longer than ``size``, cut at the coarsest boundary that works
+        if self._length_function(text) <= size:
+            return [text]
+        for pattern in (SENTENCE_BREAK, LINE_BREAK, WORD_BREAK):
+            parts = [part for part in pattern.split(text) if part.strip()]
+            if len(parts) > 1:
+                return [unit for part in parts for unit in self._units(part, size)]
+        return [text]
+
+    def _split_section(self, heading: str, paragraphs) -> List[str]:
+        head = f"{heading}\n" if heading else ""
+        size = max(1, self._chunk_size - self._length_function(head))
+        chunks = []
+        current = []  # (separator, text, tokens, fresh)
+        for paragraph in paragraphs:
+            for index, unit in enumerate(self._units(paragraph, size)):
+                tokens = self._length_function(unit)
+                if current and sum(u[2] for u in current) + tokens > size:
+                    if any(u[3] for u in current):
+                        chunks.append(current)
+                    overlap = []
+                    for u in reversed(current):
+                        if sum(o[2] for o in overlap) + u[2] > self._chunk_overlap:
+                            break
+                        overlap.insert(0, (u[0], u[1], u[2], False))
+                    while overlap and sum(o[2] for o in overlap) + tokens > size:
+                        overlap.pop(0)
+                    current = overlap
+                current.append(("\n\n" if index == 0 else " ", unit, tokens, True))
+        if any(u[3] for u in current):
+            chunks.append(current)
+        return [head + "".join((sep if i else "") + text for i, (sep, text, _, _) in enumerate(chunk)) for chunk in chunks]
+
+    def split_sections(self, text: str):
+        """(section heading, chunk text) pairs for one page of text."""
+        chunks = []
+        pending, pending_tokens = [], 0
+        for heading, paragraphs in self.sections(text):
+            whole = "\n".join(filter(None, [heading, "\n\n".join(paragraphs)]))
+            tokens = self._length_function(whole)
+            if pending and pending_tokens + tokens > self._chunk_size:
+                chunks.append((pending[0][0], "\n\n".join(t for _, t in pending)))
+                pending, pending_tokens = [], 0
+            if tokens <= self._chunk_size:
+                pending.append((heading, whole))
+                pending_tokens += tokens
+            else:
+                chunks.extend((heading, chunk) for chunk in self._split_section(heading, paragraphs))
+        if pending:
+            chunks.append((pending[0][0], "\n\n".join(t for _, t in pending)))
+        return chunks
+
+    def split_text(self, text: str) -> List[str]:
+        return [chunk for _, chunk in self.split_sections(text)]
+
+    def create_documents(self, texts, metadatas=None) -> List[Document]:
+        metadatas = metadatas or [{}] * len(texts)
+        return [
+            Document(page_content=chunk, metadata={**metadata, "section": section})
+            for text, metadata in zip(texts, metadatas)
+            for section, chunk in self.split_sections(text)
+        ]
+
+
+def chunking_params(chunker: str = None, chunk_size: int = None, chunk_overlap: int = None):
+    """Resolve (chunker, chunk_size, chunk_overlap) from arguments, then PDF_CHUNKER/CHUNK_SIZE/CHUNK_OVERLAP."""
+    chunker = chunker or os.getenv("PDF_CHUNKER", "structured")
+    if chunker not in CHUNKERS:
+        raise ValueError(f"Unknown chunker {chunker!r}; expected one of {CHUNKERS}")
+    default_size, default_overlap = CHUNK_DEFAULTS[chunker]
+    if chunk_size is None:
+        chunk_size = int(os.getenv("CHUNK_SIZE") or default_size)
+    if chunk_overlap is None:
+        chunk_overlap = int(os.getenv("CHUNK_OVERLAP") or default_overlap)
+    return chunker, chunk_size, chunk_overlap
+
+
+def make_text_splitter(chunker: str, chunk_size: int, chunk_overlap: int) -> TextSplitter:
+    if chunker == "character":
+        return CharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    if chunker == "structured":
+        return StructuredTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    raise ValueError(f"Unknown chunker {chunker!r}; expected one of {CHUNKERS}")
+
+
+def shingles(text: str, size: int = 3) -> set:
+    words = WORD_PATTERN.findall(text.lower())
+    if len(words) < size:
+        return {tuple(words)} if words else set()
+    return {tuple(words[i : i + size]) for i in range(len(words) - size + 1)}
+
+
+class ContextAssembler:
+    """Packs retrieved chunks, best first, into a prompt context of ``max_tokens``.
+
+    A chunk whose word 3-grams are at least ``duplicate_threshold`` covered
+    by the chunks already kept (repeated boilerplate, chunk overlap, the
+    same passage in two documents) is dropped. A chunk that does not fit is
+    skipped for smaller ones further down, except that the best remaining
+    chunk is cut at a sentence boundary when at least ``min_tokens`` are
+    left. At most ``max_chunks`` chunks are kept.
+    """
+
+    def __init__(
+        self,
+        max_tokens: int = DEFAULT_CONTEXT_BUDGET,
+        max_chunks: int = None,
+        duplicate_threshold: float = 0.8,
+        min_tokens: int = 32,
+        length_function: Callable[[str], int] = estimate_tokens,
+    ):
+        self.max_tokens = max_tokens
+        self.max_chunks = max_chunks
+        self.duplicate_threshold = duplicate_threshold
+        self.min_tokens = min_tokens
+        self.length_function = length_function
+
+    def _trim(self, doc: Document, tokens: int) -> Optional[Document]:
+        # The leading sentences (or words) of ``doc`` that fit in ``tokens``
+        kept = []
+        for pattern in (SENTENCE_BREAK, WORD_BREAK):
+            for part in pattern.split(doc.page_content):
+                if self.length_function(" ".join(kept + [part])) > tokens:
+                    break
+                kept.append(part)
+            if kept:
+                return Document(page_content=" ".join(kept), metadata=doc.metadata, id=doc.id)
+        return None
+
+    def assemble(self, docs) -> List[Document]:
+        """Chunks to stuff into the prompt, from ``docs`` ordered best first (any iterable)."""
+        metrics = get_metrics()
+        selected = []
+        seen = set()
+        remaining = self.max_tokens
+        trimmed = False
+        for doc in docs:
+            if remaining < 1 or (self.max_chunks and len(selected) >= self.max_chunks):
+                break
+            grams = shingles(doc.page_content)
+            if grams and len(grams & seen) >= self.duplicate_threshold * len(grams):
+                metrics.incr("context_chunks", result="duplicate")
+                continue
+            tokens = self.length_function(doc.page_content)
+            if tokens > remaining:
+                if trimmed or remaining < self.min_tokens:
+                    metrics.incr("context_chunks", result="over_budget")
+                    continue
+                doc = self._trim(doc, remaining)
+                trimmed = True
+                if doc is None:
+                    continue
+                tokens = self.length_function(doc.page_content)
+                metrics.incr("context_chunks", result="trimmed")
+            else:
+                metrics.incr("context_chunks", result="kept")
+            selected.append(doc)
+            seen |= grams
+            remaining -= tokens
+        metrics.incr("context_tokens", self.max_tokens - remaining)
+        return selected
+
+
+def model_names(llm) -> List[str]:
+    """Model names behind a chat model, including every provider of an LLM router."""
+    if hasattr(llm, "providers"):
+        return [name for provider in llm.providers for name in model_names(provider.model)]
+    if getattr(llm, "inner", None) is not None:
+        return model_names(llm.inner)
+    name = getattr(llm, "model_name", None) or getattr(llm, "model", None)
+    return [name.rsplit("/", 1)[-1]] if isinstance(name, str) else []
+
+
+def context_budget(llm=None) -> int:
+    """Context tokens per answer: CONTEXT_TOKEN_BUDGET, else the smallest CONTEXT_BUDGETS entry of ``llm``'s models.
+
+    A router may answer with any of its providers, so the tightest budget applies.
+    """
+    configured = os.getenv("CONTEXT_TOKEN_BUDGET", "").strip()
+    if configured:
+        return int(configured)
+    budgets = [CONTEXT_BUDGETS[name] for name in model_names(llm) if name in CONTEXT_BUDGETS]
+    return min(budgets) if budgets else DEFAULT_CONTEXT_BUDGET
+
+
+class AssembledRetriever(BaseRetriever):
+    """Runs ``retriever`` (which returns ``fetch_k`` candidates) and packs its results with ``assembler``."""
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    retriever: Any
+    assembler: Any
+    fetch_k: int = 20
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun):
+        return self.assembler.assemble(self.retriever.invoke(query))
@@ -0,0 +1,181 @@
+import os
+import sys
+import threading
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from agents.chunking import chunking_params, make_text_splitter
+from agents.hybrid import MultiSink, get_keyword_index
+from agents.ingest import IngestJob, StreamingIngestor, load_pdf_pages
+from agents.backends import get_backends
+from agents.ingest_cache import IngestCache, content_sha256, get_ingest_cache, ingest_key, read_source
+from agents.metrics import get_metrics
+from agents.vector_backends import get_vector_backend
+
+
+class PDFCorpus:
+    """Many PDFs in one shared vector collection.
+
+    A document's id is its content hash. Every chunk carries it as
+    ``metadata.doc_id``, and each document has its own ingest manifest
+    entry, so adding or removing a document never re-embeds or deletes the
+    others. Retrieval is scoped to documents with a ``doc_id`` filter. That
+    field has a payload index on a Qdrant server and a field index on
+    NumpyVectorStore, so scoped queries cost the same whether the corpus
+    holds ten PDFs or thousands. Embedded Qdrant (qdrant_local) has no
+    payload indexes, so there a scoped query scans the collection.
+    """
+
+    def __init__(
+        self,
+        name: str = "corpus",
+        embeddings=None,
+        vector_backend: str = None,
+        chunk_size: int = None,
+        chunk_overlap: int = None,
+        embedding_model: str = "gemini-embedding-001",
+        ingest_cache: IngestCache = None,
+        embed_batch_size: int = 64,
+        embed_concurrency: int = 4,
+        chunker: str = None,
+    ):
+        self.name = name
+        # Same chunker settings and defaults as PDFAgent
+        self.chunker, self.chunk_size, self.chunk_overlap = chunking_params(chunker, chunk_size, chunk_overlap)
+        self.embedding_model = embedding_model
+        self.embed_batch_size = embed_batch_size
+        self.embed_concurrency = embed_concurrency
+        self.ingest_cache = ingest_cache or get_ingest_cache()
+        self.vector_backend = vector_backend or get_backends().vector_backend()
+        self.backend = get_vector_backend(self.vector_backend)
+        self.embeddings = embeddings or get_backends().embeddings(embedding_model)
+        self.params = (self.chunk_size, self.chunk_overlap, embedding_model, self.vector_backend, self.chunker)
+        # Different chunking or embeddings cannot share vectors, so they get their own collection
+        self.collection_name = IngestCache.collection_name(name, ingest_key(f"corpus:{name}", *self.params))
+        self._store = None
+        self._lock = threading.Lock()
+
+    def _key(self, doc_id: str) -> str:
+        return ingest_key(f"corpus:{self.collection_name}:{doc_id}", *self.params)
+
+    def __contains__(self, doc_id: str) -> bool:
+        key = self._key(doc_id)
+        if self.ingest_cache.get(key) is None:
+            return False
+        if self.backend.exists(self.collection_name):
+            return True
+        # The manifest outlived the collection (a wiped Qdrant, an in-memory index after a restart)
+        self.ingest_cache.discard(key)
+        return False
+
+    def documents(self) -> list:
+        """Manifest entries (doc_id, name, pages, chunks, ...) of every document in the corpus."""
+        found = self.ingest_cache.find(corpus=self.collection_name)
+        if found and not self.backend.exists(self.collection_name):
+            for key, _ in found:
+                self.ingest_cache.discard(key)
+            return []
+        return [entry for _, entry in found]
+
+    def add(self, source, name: str = None) -> str:
+        """Ingest a PDF (path, bytes or file-like) unless it is already in the corpus; return its doc_id."""
+        source = read_source(source)
+        doc_id = content_sha256(source)
+        if doc_id in self:
+            get_metrics().incr("cache_lookups", cache="corpus", result="hit")
+            return doc_id
+        if name is None and isinstance(source, (str, os.PathLike)):
+            name = os.path.basename(source)
+        return self.add_pages(doc_id, load_pdf_pages(source, doc_id), name=name)
+
+    def add_pages(self, doc_id: str, pages, name: str = None) -> str:
+        """Ingest already parsed page Documents as ``doc_id``."""
+        start = time.perf_counter()
+        ingestor = StreamingIngestor(
+            self._sink(),
+            self.embeddings,
+            make_text_splitter(self.chunker, self.chunk_size, self.chunk_overlap),
+            batch_size=self.embed_batch_size,
+            max_concurrency=self.embed_concurrency,
+            doc_id=doc_id,
+        )
+        job = IngestJob()
+        job.run(lambda: ingestor.run(pages, {}, job))
+        seconds = time.perf_counter() - start
+        self.ingest_cache.put(
+            self._key(doc_id),
+            corpus=self.collection_name,
+            collection_name=self.collection_name,
+            doc_id=doc_id,
+            name=name,
+            pages=job.stats["pages"],
+            chunks=job.stats["chunks"],
+            build_seconds=seconds,
+        )
+        get_metrics().incr("cache_lookups", cache="corpus", result="miss")
+        get_metrics().observe("ingest", seconds, "corpus")
+        print(f"Added {name or doc_id[:16]} to corpus {self.collection_name} ({job.stats['chunks']} chunks, {seconds:.3f}s)")
+        return doc_id
+
+    def _sink(self):
+        # Vectors plus the keyword index hybrid retrieval fuses them with
+        return MultiSink([self.backend.sink(self.collection_name), get_keyword_index(self.collection_name).sink()])
+
+    def remove(self, doc_id: str) -> bool:
+        """Delete one document's chunks and manifest entry; the rest of the corpus is untouched."""
+        key = self._key(doc_id)
+        if self.ingest_cache.get(key) is None:
+            return False
+        sink = self._sink()
+        sink.delete_documents([doc_id])
+        sink.flush()
+        self.ingest_cache.discard(key)
+        return True
+
+    def store(self):
+        """The shared vector store; search it through ``filter``/``retriever`` to scope by document."""
+        with self._lock:
+            if self._store is None:
+                if not self.backend.exists(self.collection_name):
+                    # An empty corpus still needs a collection to search
+                    self.backend.sink(self.collection_name).ensure(len(self.embeddings.embed_query("dimension")))
+                self._store = self.backend.open_store(self.collection_name, self.embeddings)
+            return self._store
+
+    def filter(self, doc_ids=None):
+        """Backend-native filter for ``doc_ids``, or None to search the whole corpus."""
+        if doc_ids is None:
+            return None
+        return self.backend.filter({"doc_id": list(doc_ids)})
+
+    def search_kwargs(self, doc_ids=None, k: int = 4) -> dict:
+        search_filter = self.filter(doc_ids)
+        return {"k": k, "filter": search_filter} if search_filter is not None else {"k": k}
+
+    def retriever(self, doc_ids=None, k: int = 4):
+        return self.store().as_retriever(search_kwargs=self.search_kwargs(doc_ids, k))
+
+    def search(self, query: str, doc_ids=None, k: int = 4):
+        return self.store().similarity_search(query, **self.search_kwargs(doc_ids, k))
+
+
+_corpora = {}
+_corpora_lock = threading.Lock()
+
+
+def get_corpus(name: str = None, **kwargs) -> PDFCorpus:
+    """Shared PDFCorpus per name and settings; ``name`` defaults to PDF_CORPUS (or "corpus").
+
+    Embedding models are usually unhashable, so an explicit ``embeddings``
+    is keyed by identity: the corpus keeps it alive, so its id is never
+    reused, and a different model never gets a corpus built for another.
+    """
+    name = name or os.getenv("PDF_CORPUS", "corpus")
+    embeddings = kwargs.get("embeddings")
+    options = tuple(sorted((k, v) for k, v in kwargs.items() if k != "embeddings"))
+    key = (name, options, None if embeddings is None else id(embeddings))
+    with _corpora_lock:
+        corpus = _corpora.get(key)
+        if corpus is None:
+            corpus = _corpora[key] = PDFCorpus(name, **kwargs)
+        return corpus
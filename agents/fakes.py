@@ -0,0 +1,352 @@
+import asyncio
+import hashlib
+import math
+import random
+import re
+import threading
+import time
+from typing import Any, List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from pydantic import PrivateAttr
+
+from agents.weather_cache import normalize_location
+
+LATENCY_KINDS = ("fixed", "uniform", "normal", "lognormal")
+
+
+class Latency:
+    """A seeded latency distribution in seconds.
+
+    Parsed from specs like ``"0.05"`` (fixed), ``"uniform:0.02:0.2"``,
+    ``"normal:0.1:0.03"`` (mean, stdev; clipped at zero) or
+    ``"lognormal:0.1:0.6"`` (median, sigma: a long tail like real APIs).
+    Thread-safe; the same seed gives the same sequence of delays.
+    """
+
+    def __init__(self, kind: str = "fixed", a: float = 0.0, b: float = 0.0, seed: int = 0):
+        if kind not in LATENCY_KINDS:
+            raise ValueError(f"Unknown latency distribution {kind!r}; expected one of {LATENCY_KINDS}")
+        self.kind = kind
+        self.a = a
+        self.b = b
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def parse(cls, spec, seed: int = 0) -> "Latency":
+        if isinstance(spec, Latency):
+            return spec
+        if isinstance(spec, (int, float)):
+            return cls("fixed", float(spec), seed=seed)
+        kind, *values = str(spec).split(":")
+        if not values:
+            return cls("fixed", float(kind), seed=seed)
+        return cls(kind, *(float(v) for v in values), seed=seed)
+
+    def sample(self) -> float:
+        with self._lock:
+            if self.kind == "fixed":
+                return self.a
+            if self.kind == "uniform":
+                return self._rng.uniform(self.a, self.b)
+            if self.kind == "normal":
+                return max(0.0, self._rng.gauss(self.a, self.b))
+            return self.a * math.exp(self._rng.gauss(0.0, self.b))
+
+    def __repr__(self):
+        return f"Latency({self.kind}:{self.a:g}" + (f":{self.b:g})" if self.kind != "fixed" else ")")
+
+
+def _stable_int(text: str) -> int:
+    return int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def fake_reply(prompt: str) -> str:
+    """A deterministic answer shaped like what each prompt in this repo expects."""
+    # ReAct agents (initialize_agent): call the first tool, then answer from its observation
+    tools = re.search(r"should be one of \[(.*?)\]", prompt)
+    if tools:
+        scratchpad = prompt.rsplit("\nQuestion:", 1)[-1]
+        observations = re.findall(r"Observation: (.*?)(?:\nThought:|$)", scratchpad, re.DOTALL)
+        if observations:
+            return f"I now know the final answer\nFinal Answer: {observations[-1].strip()[:300]}"
+        question = scratchpad.strip().splitlines()[0].strip()
+        return f"I should use a tool.\nAction: {tools.group(1).split(',')[0].strip()}\nAction Input: {question}"
+    # RetrievalQA stuff prompt: answer with the start of the retrieved context
+    context = re.search(r"(?:make up an answer\.\n\n|-{8,}\n)(.*?)(?:\n\nQuestion:|\Z)", prompt, re.DOTALL)
+    if context:
+        return "According to the document: " + " ".join(context.group(1).split())[:300]
+    # Anything else (session summaries, free-form prompts): echo the gist
+    return "Summary: " + " ".join(prompt.split())[-300:]
+
+
+class FakeChatModel(BaseChatModel):
+    """Offline chat model with sampled latency and prompt-shaped deterministic replies.
+
+    Speaks the ReAct format, answers RetrievalQA prompts from their context
+    and reports token usage (characters / 4), so agents, graphs and metrics
+    run end to end without a provider. ``token_latency`` paces streamed
+    tokens, and ``prompt_token_latency`` charges prefill per prompt token so
+    longer prompts answer slower.
+    """
+
+    latency: Any = "0.05"
+    token_latency: float = 0.0
+    prompt_token_latency: float = 0.0
+    seed: int = 0
+    calls: int = 0
+
+    _latency: Any = PrivateAttr(default=None)
+    _lock: Any = PrivateAttr(default_factory=threading.Lock)
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat"
+
+    def _delay(self, messages) -> float:
+        with self._lock:
+            if self._latency is None:
+                self._latency = Latency.parse(self.latency, self.seed)
+            self.calls += 1
+        return self._latency.sample() + self.prompt_token_latency * len(self._prompt(messages)) / 4
+
+    @staticmethod
+    def _prompt(messages) -> str:
+        return "\n".join(str(m.content) for m in messages)
+
+    def _message(self, messages) -> AIMessage:
+        prompt = self._prompt(messages)
+        text = fake_reply(prompt)
+        usage = {"input_tokens": len(prompt) // 4, "output_tokens": len(text) // 4, "total_tokens": (len(prompt) + len(text)) // 4}
+        return AIMessage(content=text, usage_metadata=usage)
+
+    def _generate(self, messages, stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> ChatResult:
+        time.sleep(self._delay(messages))
+        return ChatResult(generations=[ChatGeneration(message=self._message(messages))])
+
+    async def _agenerate(self, messages, stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> ChatResult:
+        await asyncio.sleep(self._delay(messages))
+        return ChatResult(generations=[ChatGeneration(message=self._message(messages))])
+
+    def _stream(self, messages, stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any):
+        time.sleep(self._delay(messages))
+        message = self._message(messages)
+        tokens = re.findall(r"\S+\s*", message.content)
+        for i, token in enumerate(tokens):
+            if self.token_latency:
+                time.sleep(self.token_latency)
+            last = i == len(tokens) - 1
+            chunk = AIMessageChunk(content=token, usage_metadata=message.usage_metadata if last else None)
+            if run_manager:
+                run_manager.on_llm_new_token(token, chunk=chunk)
+            yield ChatGenerationChunk(message=chunk)
+
+    async def _astream(self, messages, stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any):
+        await asyncio.sleep(self._delay(messages))
+        message = self._message(messages)
+        tokens = re.findall(r"\S+\s*", message.content)
+        for i, token in enumerate(tokens):
+            if self.token_latency:
+                await asyncio.sleep(self.token_latency)
+            last = i == len(tokens) - 1
+            chunk = AIMessageChunk(content=token, usage_metadata=message.usage_metadata if last else None)
+            if run_manager:
+                await run_manager.on_llm_new_token(token, chunk=chunk)
+            yield ChatGenerationChunk(message=chunk)
+
+
+class FakeEmbeddings(Embeddings):
+    """Deterministic hashed bag-of-words vectors, one sampled delay per request.
+
+    Texts sharing words get similar vectors, so retrieval over fake
+    embeddings still finds relevant chunks.
+    """
+
+    def __init__(self, size: int = 256, latency="0.01", seed: int = 0):
+        self.size = size
+        self.latency = Latency.parse(latency, seed)
+        self.calls = 0
+
+    def _embed(self, text: str):
+        vector = np.zeros(self.size, dtype=np.float32)
+        for word in re.findall(r"\w+", text.lower()):
+            vector[_stable_int(word) % self.size] += 1.0
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def embed_documents(self, texts, **kwargs):
+        self.calls += 1
+        time.sleep(self.latency.sample())
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text, **kwargs):
+        self.calls += 1
+        time.sleep(self.latency.sample())
+        return self._embed(text)
+
+    async def aembed_documents(self, texts, **kwargs):
+        self.calls += 1
+        await asyncio.sleep(self.latency.sample())
+        return [self._embed(text) for text in texts]
+
+    async def aembed_query(self, text, **kwargs):
+        self.calls += 1
+        await asyncio.sleep(self.latency.sample())
+        return self._embed(text)
+
+
+class FakeWeather:
+    """Offline OpenWeatherMap stand-in with the wrapper's ``run`` and the client's ``arun``.
+
+    Reports are derived from the location, so the same city always gets the
+    same weather. ``error_rate`` makes that share of calls fail like an
+    unavailable API.
+    """
+
+    STATUSES = ("clear sky", "few clouds", "scattered clouds", "light rain", "overcast clouds", "mist")
+
+    def __init__(self, latency="0.05", error_rate: float = 0.0, seed: int = 0):
+        self.latency = Latency.parse(latency, seed)
+        self.error_rate = error_rate
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.calls = 0
+
+    def _check(self, location: str):
+        with self._lock:
+            self.calls += 1
+            failed = self.error_rate and self._rng.random() < self.error_rate
+        if failed:
+            raise RuntimeError(f"Fake weather API unavailable for {location!r}")
+
+    def report(self, location: str) -> str:
+        h = _stable_int(normalize_location(location))
+        temp = (h % 400) / 10 - 5
+        return (
+            f"In {location}, the current weather is as follows:\n"
+            f"Detailed status: {self.STATUSES[h % len(self.STATUSES)]}\n"
+            f"Wind speed: {(h >> 8) % 120 / 10} m/s, direction: {(h >> 16) % 360}°\n"
+            f"Humidity: {(h >> 24) % 80 + 20}%\n"
+            "Temperature: \n"
+            f"  - Current: {temp:.1f}°C\n"
+            f"  - High: {temp + 2:.1f}°C\n"
+            f"  - Low: {temp - 3:.1f}°C\n"
+            f"  - Feels like: {temp - 1:.1f}°C\n"
+            "Rain: {}\n"
+            "Heat index: None\n"
+            f"Cloud cover: {(h >> 32) % 100}%"
+        )
+
+    def run(self, location: str) -> str:
+        time.sleep(self.latency.sample())
+        self._check(location)
+        return self.report(location)
+
+    async def arun(self, location: str) -> str:
+        await asyncio.sleep(self.latency.sample())
+        self._check(location)
+        return self.report(location)
+
+
+class FakeRateLimitError(Exception):
+    status_code = 429
+
+
+class FakeChatProvider(BaseChatModel):
+    """Chat model with a latency tail and scripted rate limits, for router tests.
+
+    Each call takes ``latency`` seconds, or ``tail_latency`` with probability
+    ``tail_rate``. The first ``rate_limited_calls`` calls fail immediately
+    with a 429, like a provider that is over quota.
+    """
+
+    name: str = "fake"
+    latency: float = 0.05
+    tail_latency: float = 0.0
+    tail_rate: float = 0.0
+    rate_limited_calls: int = 0
+    seed: int = 0
+    calls: int = 0
+
+    _rng: Any = PrivateAttr(default=None)
+    _lock: Any = PrivateAttr(default_factory=threading.Lock)
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat-provider"
+
+    def _next_delay(self) -> float:
+        with self._lock:
+            if self._rng is None:
+                self._rng = random.Random(self.seed)
+            self.calls += 1
+            if self.calls <= self.rate_limited_calls:
+                raise FakeRateLimitError(f"429 Too Many Requests from {self.name}")
+            return self.tail_latency if self._rng.random() < self.tail_rate else self.latency
+
+    def _text(self) -> str:
+        return f"answer from {self.name}"
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        time.sleep(self._next_delay())
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=self._text()))])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        await asyncio.sleep(self._next_delay())
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=self._text()))])
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        time.sleep(self._next_delay())
+        for token in re.findall(r"\S+\s*", self._text()):
+            yield ChatGenerationChunk(message=AIMessageChunk(content=token))
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        await asyncio.sleep(self._next_delay())
+        for token in re.findall(r"\S+\s*", self._text()):
+            yield ChatGenerationChunk(message=AIMessageChunk(content=token))
+
+
+def make_pdf(pages) -> bytes:
+    """A minimal text PDF, one page per list of lines, that PyPDFParser can read."""
+
+    def escape(text: str) -> str:
+        return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+    objects = []  # bodies; object n is objects[n - 1]
+
+    def add(body: bytes) -> int:
+        objects.append(body)
+        return len(objects)
+
+    catalog = add(b"")
+    tree = add(b"")
+    font = add(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+    kids = []
+    for lines in pages:
+        text = " T* ".join(f"({escape(line)}) Tj" for line in lines)
+        stream = f"BT /F1 10 Tf 14 TL 40 760 Td {text} ET".encode("latin-1", "replace")
+        content = add(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        kids.append(add(
+            b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 612 792] /Resources << /Font << /F1 %d 0 R >> >> "
+            b"/Contents %d 0 R >>" % (tree, font, content)
+        ))
+    objects[catalog - 1] = b"<< /Type /Catalog /Pages %d 0 R >>" % tree
+    objects[tree - 1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (
+        b" ".join(b"%d 0 R" % kid for kid in kids), len(kids)
+    )
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, catalog, xref)
+    return bytes(out)
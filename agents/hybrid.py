@@ -0,0 +1,462 @@
+import json
+import math
+import os
+import re
+import threading
+from typing import Any, Optional
+
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from pydantic import ConfigDict
+
+from agents.ingest_cache import CACHE_DIR
+from agents.vector_backends import NumpyVectorStore, metadata_matches
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+SENTENCE_PATTERN = re.compile(r"(?<=[.!?])\s+|\n+")
+STOPWORDS = frozenset(
+    "a an and are as at be by did do does for from has have he her his how i in is it its of on or she "
+    "that the their them they this to was were what when where which who whom why will with you your".split()
+)
+
+
+def tokenize(text: str):
+    return [token for token in TOKEN_PATTERN.findall(text.lower()) if token not in STOPWORDS]
+
+
+class BM25Index:
+    """In-process BM25 inverted index over the chunks of one collection.
+
+    It is filled at ingest time through ``sink()`` next to the vector
+    store, and kept as JSON under ``path`` so a reused collection does not
+    need re-tokenizing. Like NumpyVectorStore, ``save`` appends the chunks
+    added and removed since the last save to a journal next to that
+    snapshot, and rewrites the snapshot only once the journal outgrows it.
+    Search scores only the postings of the query terms.
+    Postings are also kept per ``doc_id``, so a search scoped to a few
+    documents of a corpus only touches their chunks; IDF and the average
+    length stay corpus-wide.
+    """
+
+    # Metadata kept per chunk, enough for filters, deletes and citations
+    METADATA_FIELDS = ("page", "doc_id", "source")
+
+    def __init__(self, path: str = None, k1: float = 1.5, b: float = 0.75):
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.RLock()
+        self._postings = {}
+        # doc_id -> token -> {chunk_id: tf}
+        self._doc_postings = {}
+        # doc_id -> chunk ids, for deleting a document without a scan
+        self._doc_chunks = {}
+        self._chunks = {}
+        self._total_length = 0
+        # Journal records not yet saved, and the chunks/lines already on disk
+        self._pending = []
+        self._snapshot_chunks = 0
+        self._journal_lines = 0
+        self.journal_path = os.path.splitext(path)[0] + ".journal.jsonl" if path else None
+        if path:
+            self._load()
+
+    def __len__(self):
+        return len(self._chunks)
+
+    def _load(self):
+        if os.path.exists(self.path):
+            with open(self.path, "r", encoding="utf-8") as f:
+                chunks = json.load(f)["chunks"]
+            for chunk_id, (text, metadata) in chunks.items():
+                self._add(chunk_id, text, metadata)
+            self._snapshot_chunks = len(chunks)
+        if not os.path.exists(self.journal_path):
+            return
+        with open(self.journal_path, "r", encoding="utf-8") as f:
+            lines = f.readlines()
+        for line in lines:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # A torn last line from an interrupted append
+                continue
+            if "add" in record:
+                self._add(*record["add"])
+            else:
+                for chunk_id in record["delete"]:
+                    if chunk_id in self._chunks:
+                        self._remove(chunk_id)
+        self._journal_lines = len(lines)
+
+    def save(self):
+        """Persist the changes since the last save: append them, or rewrite the snapshot if due."""
+        if not self.path:
+            self._pending = []
+            return
+        with self._lock:
+            pending, self._pending = self._pending, []
+            if not pending:
+                return
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            if self._journal_lines + len(pending) <= self._snapshot_chunks:
+                with open(self.journal_path, "a", encoding="utf-8") as f:
+                    f.writelines(json.dumps(record) + "\n" for record in pending)
+                self._journal_lines += len(pending)
+                return
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(json.dumps({"chunks": {i: [text, meta] for i, (text, meta, _) in self._chunks.items()}}))
+            os.replace(tmp_path, self.path)
+            if os.path.exists(self.journal_path):
+                os.remove(self.journal_path)
+            self._snapshot_chunks = len(self._chunks)
+            self._journal_lines = 0
+
+    def _add(self, chunk_id: str, text: str, metadata: dict):
+        if chunk_id in self._chunks:
+            self._remove(chunk_id)
+        tokens = tokenize(text)
+        counts = {}
+        for token in tokens:
+            counts[token] = counts.get(token, 0) + 1
+        doc_postings = self._doc_postings.setdefault(metadata.get("doc_id"), {})
+        for token, count in counts.items():
+            self._postings.setdefault(token, {})[chunk_id] = count
+            doc_postings.setdefault(token, {})[chunk_id] = count
+        self._chunks[chunk_id] = (text, metadata, len(tokens))
+        self._doc_chunks.setdefault(metadata.get("doc_id"), set()).add(chunk_id)
+        self._total_length += len(tokens)
+
+    def _remove(self, chunk_id: str):
+        text, metadata, length = self._chunks.pop(chunk_id)
+        doc_id = metadata.get("doc_id")
+        doc_postings = self._doc_postings.get(doc_id, {})
+        for token in set(tokenize(text)):
+            for index in (self._postings, doc_postings):
+                postings = index.get(token)
+                if postings is not None:
+                    postings.pop(chunk_id, None)
+                    if not postings:
+                        del index[token]
+        if not doc_postings:
+            self._doc_postings.pop(doc_id, None)
+        chunks = self._doc_chunks.get(doc_id, set())
+        chunks.discard(chunk_id)
+        if not chunks:
+            self._doc_chunks.pop(doc_id, None)
+        self._total_length -= length
+
+    def add(self, ids, texts, metadatas):
+        with self._lock:
+            for chunk_id, text, metadata in zip(ids, texts, metadatas):
+                kept = {field: metadata[field] for field in self.METADATA_FIELDS if field in metadata}
+                self._add(str(chunk_id), text, kept)
+                if self.path:
+                    self._pending.append({"add": [str(chunk_id), text, kept]})
+
+    def delete(self, filter: dict):
+        with self._lock:
+            if "doc_id" in filter:
+                # Only the named documents' chunks can match
+                doc_ids = filter["doc_id"] if isinstance(filter["doc_id"], (list, tuple, set)) else [filter["doc_id"]]
+                candidates = {i for doc_id in doc_ids for i in self._doc_chunks.get(doc_id, ())}
+            else:
+                candidates = self._chunks
+            drop = [i for i in candidates if metadata_matches(self._chunks[i][1], filter)]
+            for chunk_id in drop:
+                self._remove(chunk_id)
+            if drop and self.path:
+                self._pending.append({"delete": drop})
+
+    def idf(self, token: str) -> float:
+        n = len(self._chunks)
+        df = len(self._postings.get(token, ()))
+        return math.log(1 + (n - df + 0.5) / (df + 0.5))
+
+    def _scoped_postings(self, filter: dict):
+        """Postings indexes to score for ``filter``: the global one, or one per doc_id it names."""
+        if not filter or "doc_id" not in filter:
+            return [self._postings]
+        doc_ids = filter["doc_id"]
+        if not isinstance(doc_ids, (list, tuple, set)):
+            doc_ids = [doc_ids]
+        return [self._doc_postings[doc_id] for doc_id in doc_ids if doc_id in self._doc_postings]
+
+    def search(self, query: str, k: int = 4, filter: dict = None):
+        """Top ``k`` (Document, score) pairs for ``query``, optionally restricted by a metadata ``filter``.
+
+        A ``doc_id`` condition picks the per-document postings up front, so
+        only chunks in scope are scored; other conditions filter the ranking.
+        """
+        with self._lock:
+            if not self._chunks:
+                return []
+            average = self._total_length / len(self._chunks)
+            indexes = self._scoped_postings(filter)
+            scores = {}
+            for token in set(tokenize(query)):
+                postings = [index[token] for index in indexes if token in index]
+                if not postings:
+                    continue
+                idf = self.idf(token)
+                for chunk_id, tf in (item for p in postings for item in p.items()):
+                    length = self._chunks[chunk_id][2]
+                    norm = tf * (self.k1 + 1) / (tf + self.k1 * (1 - self.b + self.b * length / average))
+                    scores[chunk_id] = scores.get(chunk_id, 0.0) + idf * norm
+            ranked = sorted(scores.items(), key=lambda item: -item[1])
+            results = []
+            for chunk_id, score in ranked:
+                text, metadata, _ = self._chunks[chunk_id]
+                if filter and not metadata_matches(metadata, filter):
+                    continue
+                results.append((Document(page_content=text, metadata=dict(metadata), id=chunk_id), score))
+                if len(results) >= k:
+                    break
+            return results
+
+    def sink(self):
+        return KeywordSink(self)
+
+
+class KeywordSink:
+    """Ingest sink that feeds a BM25Index; use it next to a vector sink through MultiSink."""
+
+    def __init__(self, index: BM25Index):
+        self.index = index
+
+    def ensure(self, size: int):
+        pass
+
+    def upsert(self, ids, vectors, chunks):
+        self.index.add(ids, [c.page_content for c in chunks], [c.metadata for c in chunks])
+
+    def delete_pages(self, pages):
+        self.index.delete({"page": list(pages)})
+
+    def delete_documents(self, doc_ids):
+        self.index.delete({"doc_id": list(doc_ids)})
+
+    def flush(self):
+        self.index.save()
+
+
+class MultiSink:
+    """Writes every ingest operation to several sinks (e.g. vectors plus keywords)."""
+
+    def __init__(self, sinks):
+        self.sinks = list(sinks)
+
+    def ensure(self, size: int):
+        for sink in self.sinks:
+            sink.ensure(size)
+
+    def upsert(self, ids, vectors, chunks):
+        for sink in self.sinks:
+            sink.upsert(ids, vectors, chunks)
+
+    def delete_pages(self, pages):
+        for sink in self.sinks:
+            sink.delete_pages(pages)
+
+    def delete_documents(self, doc_ids):
+        for sink in self.sinks:
+            sink.delete_documents(doc_ids)
+
+    def flush(self):
+        for sink in self.sinks:
+            sink.flush()
+
+
+def _store_chunks(store):
+    """(id, text, metadata) of every chunk in a vector store, to rebuild a missing keyword index."""
+    if isinstance(store, NumpyVectorStore):
+        yield from zip(store._ids, store._texts, store._metadatas)
+        return
+    offset = None
+    while True:
+        points, offset = store.client.scroll(store.collection_name, limit=256, offset=offset, with_payload=True)
+        for point in points:
+            payload = point.payload or {}
+            yield str(point.id), payload.get("page_content", ""), payload.get("metadata") or {}
+        if offset is None:
+            return
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def _keyword_index_path(collection_name: str):
+    root = os.getenv("KEYWORD_INDEX_DIR", os.path.join(CACHE_DIR, "keyword_index"))
+    return None if root == ":memory:" else os.path.join(root, f"{collection_name}.json")
+
+
+def get_keyword_index(collection_name: str, store=None) -> BM25Index:
+    """Shared BM25Index for a collection, under KEYWORD_INDEX_DIR (default .cache/keyword_index).
+
+    A collection ingested before keyword indexing existed is indexed once
+    from ``store``.
+    """
+    with _indexes_lock:
+        index = _indexes.get(collection_name)
+        if index is None:
+            index = _indexes[collection_name] = BM25Index(_keyword_index_path(collection_name))
+    if store is not None and not len(index):
+        with index._lock:
+            if not len(index):
+                ids, texts, metadatas = [], [], []
+                for chunk_id, text, metadata in _store_chunks(store):
+                    ids.append(chunk_id)
+                    texts.append(text)
+                    metadatas.append(metadata)
+                if ids:
+                    print(f"Building keyword index for {collection_name} ({len(ids)} chunks)")
+                    index.add(ids, texts, metadatas)
+                    index.save()
+    return index
+
+
+def drop_keyword_index(collection_name: str):
+    """Forget a collection's keyword index and delete its snapshot and journal."""
+    with _indexes_lock:
+        _indexes.pop(collection_name, None)
+        path = _keyword_index_path(collection_name)
+        if path is None:
+            return
+        for name in (path, os.path.splitext(path)[0] + ".journal.jsonl"):
+            if os.path.exists(name):
+                os.remove(name)
+
+
+def chunk_id(doc: Document):
+    return doc.id or doc.metadata.get("_id") or (doc.metadata.get("page"), doc.page_content)
+
+
+def reciprocal_rank_fusion(result_lists, rrf_k: int = 60):
+    """Fuse ranked Document lists: score(d) = sum of 1 / (rrf_k + rank) over the lists containing d."""
+    scores = {}
+    docs = {}
+    for results in result_lists:
+        for rank, doc in enumerate(results):
+            key = chunk_id(doc)
+            docs.setdefault(key, doc)
+            scores[key] = scores.get(key, 0.0) + 1.0 / (rrf_k + rank + 1)
+    return [docs[key] for key in sorted(scores, key=lambda key: -scores[key])]
+
+
+class OverlapReranker:
+    """Local reranker: share of the query's IDF weight whose terms occur in the chunk.
+
+    Cheap and dependency-free; it favours chunks that contain the rare
+    words of the question (names, organizations) over loosely related ones.
+    """
+
+    def __init__(self, index: BM25Index):
+        self.index = index
+
+    def score(self, query: str, docs):
+        terms = set(tokenize(query))
+        weights = {term: self.index.idf(term) for term in terms}
+        total = sum(weights.values()) or 1.0
+        return [sum(weights[t] for t in terms & set(tokenize(doc.page_content))) / total for doc in docs]
+
+
+class CrossEncoderReranker:
+    """Cross-encoder reranker from sentence-transformers (an optional dependency), run locally."""
+
+    def __init__(self, model_name: str = "cross-encoder/ms-marco-MiniLM-L-6-v2"):
+        try:
+            from sentence_transformers import CrossEncoder
+        except ImportError as e:
+            raise ImportError("RERANKER=cross-encoder needs `pip install sentence-transformers`") from e
+        self.model = CrossEncoder(model_name)
+
+    def score(self, query: str, docs):
+        return [float(s) for s in self.model.predict([(query, doc.page_content) for doc in docs])]
+
+
+def compress(query: str, doc: Document, max_chars: int) -> Document:
+    """Keep the sentences of ``doc`` that share terms with ``query``, up to ``max_chars``.
+
+    Sentences keep their original order. A chunk with no matching sentence
+    keeps its opening instead.
+    """
+    if not max_chars or len(doc.page_content) <= max_chars:
+        return doc
+    terms = set(tokenize(query))
+    sentences = [s.strip() for s in SENTENCE_PATTERN.split(doc.page_content) if s.strip()]
+    ranked = sorted(range(len(sentences)), key=lambda i: -len(terms & set(tokenize(sentences[i]))))
+    keep = []
+    used = 0
+    for i in ranked:
+        if not terms & set(tokenize(sentences[i])) and keep:
+            break
+        if used + len(sentences[i]) > max_chars and keep:
+            continue
+        keep.append(i)
+        used += len(sentences[i]) + 1
+    text = " ".join(sentences[i] for i in sorted(keep))[:max_chars]
+    return Document(page_content=text, metadata=doc.metadata, id=doc.id)
+
+
+class HybridRetriever(BaseRetriever):
+    """Vector and BM25 retrieval fused with reciprocal rank fusion, then reranked and compressed.
+
+    Each side returns ``fetch_k`` candidates; after fusion the optional
+    ``reranker`` reorders them (ties keep the fused order), the best ``k``
+    are kept and each is cut to the sentences relevant to the question
+    (``compress_chars``), so the prompt gets fewer, shorter chunks. With an
+    ``assembler`` (agents.chunking.ContextAssembler) the candidates are
+    instead packed best first into its token budget, skipping near
+    duplicates. ``vector_filter`` is the vector store's native filter and
+    ``keyword_filter`` the same scope as a metadata dict.
+    """
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    vector_store: Any
+    keyword_index: Any
+    k: int = 3
+    fetch_k: int = 20
+    rrf_k: int = 60
+    reranker: Any = None
+    compress_chars: int = 600
+    vector_filter: Any = None
+    keyword_filter: Optional[dict] = None
+    assembler: Any = None
+
+    def vector_search(self, query: str):
+        kwargs = {"filter": self.vector_filter} if self.vector_filter is not None else {}
+        return self.vector_store.similarity_search(query, k=self.fetch_k, **kwargs)
+
+    def fuse(self, query: str, vector_docs):
+        """Fuse already retrieved vector candidates with keyword hits for ``query``."""
+        keyword_docs = [doc for doc, _ in self.keyword_index.search(query, self.fetch_k, self.keyword_filter)]
+        fused = reciprocal_rank_fusion([vector_docs, keyword_docs], self.rrf_k)
+        if self.reranker is not None and fused:
+            scores = self.reranker.score(query, fused)
+            order = sorted(range(len(fused)), key=lambda i: (-scores[i], i))
+            fused = [fused[i] for i in order]
+        if self.assembler is not None:
+            # Compressed lazily: packing usually stops after the first few candidates
+            return self.assembler.assemble(compress(query, doc, self.compress_chars) for doc in fused)
+        return [compress(query, doc, self.compress_chars) for doc in fused[: self.k]]
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun):
+        return self.fuse(query, self.vector_search(query))
+
+
+RETRIEVERS = ("vector", "hybrid")
+RERANKERS = ("none", "overlap", "cross-encoder")
+
+
+def make_reranker(name: str, index: BM25Index):
+    if name == "none":
+        return None
+    if name == "overlap":
+        return OverlapReranker(index)
+    if name == "cross-encoder":
+        return CrossEncoderReranker(os.getenv("RERANKER_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2"))
+    raise ValueError(f"Unknown reranker {name!r}; expected one of {RERANKERS}")
@@ -0,0 +1,175 @@
+import hashlib
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from agents.metrics import get_metrics
+
+# Fixed namespace so the same page/chunk always maps to the same point id
+POINT_NAMESPACE = uuid.UUID("6f0c54d2-9b1e-4d7a-8c43-2f1b7d9e5a10")
+
+
+def page_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def load_pdf_pages(source, content_hash: str):
+    """Lazily parse pages from a PDF path, or from an in-memory PDF without touching disk."""
+    from agents.ingest_cache import is_path, source_bytes
+
+    if is_path(source):
+        from langchain_community.document_loaders import PyPDFLoader
+
+        return PyPDFLoader(source).lazy_load()
+    from langchain_community.document_loaders.parsers.pdf import PyPDFParser
+    from langchain_core.documents.base import Blob
+
+    blob = Blob.from_data(
+        source_bytes(source),
+        mime_type="application/pdf",
+        metadata={"source": f"upload:{content_hash[:16]}"},
+    )
+    return PyPDFParser().lazy_parse(blob)
+
+
+class IngestJob:
+    """Progress handle for one (possibly background) ingestion run."""
+
+    def __init__(self):
+        self.first_batch = threading.Event()
+        self.finished = threading.Event()
+        self.error = None
+        self.stats = {
+            "pages": 0,
+            "pages_embedded": 0,
+            "pages_skipped": 0,
+            "chunks": 0,
+            "batches": 0,
+            "first_batch_seconds": None,
+            "seconds": None,
+        }
+        self.started_at = time.perf_counter()
+
+    @property
+    def done(self) -> bool:
+        return self.finished.is_set()
+
+    def wait(self, timeout: float = None) -> dict:
+        if not self.finished.wait(timeout):
+            raise TimeoutError("Ingestion still running")
+        if self.error is not None:
+            raise self.error
+        return self.stats
+
+    def run(self, fn):
+        try:
+            return fn()
+        except Exception as e:
+            self.error = e
+            raise
+        finally:
+            self.stats["seconds"] = time.perf_counter() - self.started_at
+            # Never leave a caller blocked on the first batch
+            self.first_batch.set()
+            self.finished.set()
+
+
+class StreamingIngestor:
+    """Page-by-page PDF ingestion with bounded, concurrent embedding batches.
+
+    Pages are split as they are read, chunks are grouped into batches of
+    ``batch_size`` and embedded on up to ``max_concurrency`` workers, and
+    each batch is upserted as soon as its vectors are back. At most
+    ``max_concurrency`` batches are in flight, so memory is bounded by batch
+    size rather than document size. Pages whose content hash matches
+    ``previous_pages`` are skipped, so re-ingesting an edited PDF only
+    embeds the pages that changed. Writes go through a backend sink (see
+    agents.vector_backends). With ``doc_id`` set, every chunk is tagged with
+    it and point ids are scoped to it, so many documents can share one
+    collection (see agents.corpus).
+    """
+
+    def __init__(self, sink, embeddings, text_splitter, batch_size: int = 64, max_concurrency: int = 4, doc_id: str = None):
+        self.sink = sink
+        self.embeddings = embeddings
+        self.text_splitter = text_splitter
+        self.batch_size = batch_size
+        self.max_concurrency = max_concurrency
+        self.doc_id = doc_id
+        self._lock = threading.Lock()
+
+    def point_id(self, page: int, digest: str, index: int) -> str:
+        scope = f"{self.doc_id}:" if self.doc_id else ""
+        return str(uuid.uuid5(POINT_NAMESPACE, f"{scope}{page}:{digest}:{index}"))
+
+    def run(self, pages, previous_pages: dict, job: IngestJob) -> dict:
+        """Ingest ``pages`` (an iterator of page Documents); return the new page map."""
+        new_pages = {}
+        batch = []
+        futures = []
+        slots = threading.BoundedSemaphore(self.max_concurrency)
+        executor = ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix="ingest")
+
+        def submit(items):
+            slots.acquire()
+            future = executor.submit(self._embed_and_upsert, items, job)
+            future.add_done_callback(lambda _: slots.release())
+            futures.append(future)
+
+        metrics = get_metrics()
+        try:
+            for position, page in enumerate(metrics.timed_iter(pages, "pdf_load")):
+                number = page.metadata.get("page", position)
+                digest = page_hash(page.page_content)
+                new_pages[str(number)] = digest
+                job.stats["pages"] += 1
+                if previous_pages.get(str(number)) == digest:
+                    job.stats["pages_skipped"] += 1
+                    continue
+                if str(number) in previous_pages:
+                    self.sink.delete_pages([number])
+                job.stats["pages_embedded"] += 1
+
+                with metrics.timer("split"):
+                    chunks = self.text_splitter.split_documents([page])
+                for index, chunk in enumerate(chunks):
+                    chunk.metadata["page_hash"] = digest
+                    if self.doc_id:
+                        chunk.metadata["doc_id"] = self.doc_id
+                    batch.append((self.point_id(number, digest, index), chunk))
+                    if len(batch) >= self.batch_size:
+                        submit(batch)
+                        batch = []
+                # Surface worker errors early instead of after the whole PDF
+                for future in futures:
+                    if future.done() and future.exception() is not None:
+                        raise future.exception()
+            if batch:
+                submit(batch)
+            for future in futures:
+                future.result()
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+        removed = [int(n) for n in previous_pages if n not in new_pages]
+        if removed:
+            self.sink.delete_pages(removed)
+        self.sink.flush()
+        return new_pages
+
+    def _embed_and_upsert(self, items, job: IngestJob):
+        metrics = get_metrics()
+        texts = [chunk.page_content for _, chunk in items]
+        with metrics.timer("embed"):
+            vectors = self.embeddings.embed_documents(texts)
+        with metrics.timer("vector_upsert", type(self.sink).__name__):
+            self.sink.ensure(len(vectors[0]))
+            self.sink.upsert([point_id for point_id, _ in items], vectors, [chunk for _, chunk in items])
+        with self._lock:
+            job.stats["chunks"] += len(items)
+            job.stats["batches"] += 1
+            if not job.first_batch.is_set():
+                job.stats["first_batch_seconds"] = time.perf_counter() - job.started_at
+                job.first_batch.set()
+
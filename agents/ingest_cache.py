@@ -0,0 +1,291 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: writers in one process are still serialized by the lock
+    fcntl = None
+
+CACHE_DIR = os.getenv("AGENT_CACHE_DIR", ".cache")
+
+
+def file_sha256(path: str, block_size: int = 1 << 20) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def is_path(source) -> bool:
+    return isinstance(source, (str, os.PathLike))
+
+
+def source_bytes(source) -> bytes:
+    """The bytes of an in-memory source: bytes, bytearray, memoryview or a binary file-like.
+
+    ``bytes`` are returned as-is and ``BytesIO``-style objects (including
+    Streamlit uploads) through ``getvalue()``, which shares the buffer, so
+    the common cases hold a single copy of the upload.
+    """
+    if isinstance(source, bytes):
+        return source
+    if isinstance(source, (bytearray, memoryview)):
+        return bytes(source)
+    if hasattr(source, "getvalue"):
+        return source.getvalue()
+    if hasattr(source, "read"):
+        if source.seekable():
+            source.seek(0)
+        return source.read()
+    raise TypeError(f"Expected a PDF path, bytes or a binary file-like object, got {type(source).__name__}")
+
+
+def read_source(source):
+    """A PDF path (or None) as it is; any in-memory source read into ``bytes``.
+
+    Called once where a source enters (PDFAgent, the registry, a corpus,
+    the fan-out helpers), so hashing and parsing downstream share those
+    bytes: a non-seekable stream is read exactly once and a memoryview is
+    copied once, not at every step.
+    """
+    return source if source is None or is_path(source) else source_bytes(source)
+
+
+def content_sha256(source) -> str:
+    """Content hash of a path or an in-memory source; the document's identity."""
+    if is_path(source):
+        return file_sha256(source)
+    return hashlib.sha256(source_bytes(source)).hexdigest()
+
+
+def ingest_key(
+    content_hash: str,
+    chunk_size: int,
+    chunk_overlap: int,
+    embedding_model: str,
+    backend: str = "qdrant",
+    chunker: str = "character",
+) -> str:
+    # Anything that changes the stored vectors, or where they live, must be part of the key
+    raw = f"{content_hash}|{chunk_size}|{chunk_overlap}|{embedding_model}|{backend}"
+    if chunker != "character":
+        # Keys from before the chunker was configurable stay valid
+        raw += f"|{chunker}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class IngestCache:
+    """Persistent manifest of vector collections that finished ingesting.
+
+    An entry is only written after the upload completed, so a crashed or
+    partial ingestion is never mistaken for a reusable collection. Share
+    one instance per manifest through get_ingest_cache(). On disk the
+    manifest is a JSON snapshot plus an append-only journal of puts and
+    discards. Every write first catches up with what other writers
+    appended, then appends its own line under the lock (a file lock across
+    processes), so concurrent writers never lose each other's entries and
+    a write costs one line, not the whole manifest. Once the journal holds
+    more lines than there are entries, it is folded into a new snapshot
+    written through a unique temp file.
+    """
+
+    def __init__(self, path: str = None):
+        self.path = path or os.path.join(CACHE_DIR, "ingest_manifest.json")
+        self.journal_path = os.path.splitext(self.path)[0] + ".journal.jsonl"
+        self._lock = threading.Lock()
+        self._entries = {}
+        # What has been read from disk: the snapshot's identity and how far into the journal
+        self._snapshot = None
+        self._journal_offset = 0
+        self._journal_lines = 0
+        self._rewrite = False
+        self._refresh()
+
+    def _load(self):
+        """The snapshot on disk; {} when there is none, None when it is unreadable."""
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            print(f"Ignoring unreadable ingest manifest at {self.path}")
+            return None
+
+    def _snapshot_id(self):
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+    def _refresh(self):
+        """Catch up with the manifest on disk: reload after a compaction, else apply new journal lines."""
+        snapshot = self._snapshot_id()
+        try:
+            journal_size = os.path.getsize(self.journal_path)
+        except FileNotFoundError:
+            journal_size = 0
+        if snapshot != self._snapshot or journal_size < self._journal_offset:
+            entries = self._load()
+            if entries is None:
+                # Keep what we have; the next write replaces the unreadable snapshot
+                self._rewrite = True
+            else:
+                self._entries = entries
+            self._snapshot = snapshot
+            self._journal_offset = self._journal_lines = 0
+        if journal_size <= self._journal_offset:
+            return
+        with open(self.journal_path, "rb") as f:
+            f.seek(self._journal_offset)
+            data = f.read(journal_size - self._journal_offset)
+        # Whole lines only; one still being appended is read next time
+        end = data.rfind(b"\n") + 1
+        for line in data[:end].splitlines():
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # A torn line from an interrupted append
+                continue
+            if record["entry"] is None:
+                self._entries.pop(record["key"], None)
+            else:
+                self._entries[record["key"]] = record["entry"]
+            self._journal_lines += 1
+        self._journal_offset += end
+
+    @contextmanager
+    def _file_lock(self):
+        # Serializes writes across processes sharing the manifest
+        if fcntl is None:
+            yield
+            return
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.path + ".lock", "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _write(self, key: str, entry):
+        """Put ``entry`` under ``key`` (discard it when None) and persist that one change."""
+        # Caller holds the lock
+        with self._file_lock():
+            self._refresh()
+            if entry is None:
+                if self._entries.pop(key, None) is None:
+                    return
+            else:
+                self._entries[key] = entry
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            if self._rewrite or self._journal_lines >= len(self._entries):
+                self._compact()
+                return
+            line = (json.dumps({"key": key, "entry": entry}, sort_keys=True, separators=(",", ":")) + "\n").encode("utf-8")
+            with open(self.journal_path, "ab") as f:
+                f.write(line)
+            self._journal_offset += len(line)
+            self._journal_lines += 1
+
+    def _compact(self):
+        # Caller holds both locks. Until the journal is removed, replaying it
+        # over the new snapshot gives the same entries, so a crash in between is harmless
+        directory = os.path.dirname(self.path) or "."
+        fd, tmp_path = tempfile.mkstemp(prefix=f".{os.path.basename(self.path)}.", suffix=".tmp", dir=directory)
+        try:
+            # A corpus adds one entry per document; without indent, json uses its C encoder
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(json.dumps(self._entries, sort_keys=True, separators=(",", ":")))
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+        if os.path.exists(self.journal_path):
+            os.remove(self.journal_path)
+        self._snapshot = self._snapshot_id()
+        self._journal_offset = self._journal_lines = 0
+        self._rewrite = False
+
+    @staticmethod
+    def collection_name(base: str, key: str) -> str:
+        return f"{base}_{key[:16]}"
+
+    def get(self, key: str):
+        with self._lock:
+            return self._entries.get(key)
+
+    def put(self, key: str, **entry):
+        entry.setdefault("created_at", time.time())
+        with self._lock:
+            self._write(key, entry)
+
+    def find(self, **fields):
+        """(key, entry) pairs whose entry has all of ``fields``."""
+        with self._lock:
+            return [
+                (key, dict(entry))
+                for key, entry in self._entries.items()
+                if all(entry.get(name) == value for name, value in fields.items())
+            ]
+
+    def discard(self, key: str):
+        with self._lock:
+            self._write(key, None)
+
+    def touch(self, key: str):
+        """Mark an entry as used now; idle collections are evicted least-recently-used first."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._write(key, dict(entry, last_used=time.time()))
+
+    def idle_collections(self, vector_backend: str, max_collections: int, ttl_seconds: float, keep=()) -> list:
+        """Per-PDF collections on ``vector_backend`` to evict, least recently used first.
+
+        Those idle for longer than ``ttl_seconds``, then the oldest beyond
+        ``max_collections``. Corpus collections are managed through
+        PDFCorpus and never listed, nor is anything in ``keep``.
+        """
+        now = time.time()
+        with self._lock:
+            last_used = {}
+            for entry in self._entries.values():
+                if entry.get("vector_backend") != vector_backend or "corpus" in entry:
+                    continue
+                used = entry.get("last_used", entry.get("created_at", 0))
+                name = entry["collection_name"]
+                last_used[name] = max(used, last_used.get(name, used))
+        ranked = sorted(last_used, key=last_used.get)
+        kept = [name for name in ranked if name in keep]
+        ranked = [name for name in ranked if name not in keep]
+        expired = [name for name in ranked if now - last_used[name] > ttl_seconds]
+        overflow = len(ranked) + len(kept) - max(max_collections, len(kept))
+        return ranked[: max(len(expired), overflow, 0)]
+
+    def discard_collection(self, collection_name: str):
+        """Drop every entry that points at ``collection_name``."""
+        for key, _ in self.find(collection_name=collection_name):
+            self.discard(key)
+
+
+_ingest_caches = {}
+_ingest_caches_lock = threading.Lock()
+
+
+def get_ingest_cache(path: str = None) -> IngestCache:
+    """Process-wide IngestCache per manifest path (default: .cache/ingest_manifest.json)."""
+    path = os.path.abspath(path or os.path.join(CACHE_DIR, "ingest_manifest.json"))
+    with _ingest_caches_lock:
+        cache = _ingest_caches.get(path)
+        if cache is None:
+            cache = _ingest_caches[path] = IngestCache(path)
+        return cache
@@ -0,0 +1,476 @@
+import asyncio
+import contextvars
+import itertools
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, List, Optional
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.outputs import ChatResult
+from pydantic import PrivateAttr
+
+import agents.metrics_handler  # noqa: F401  (installs the metrics callback handler)
+from agents.metrics import get_metrics
+
+FAILOVER_STATUS_CODES = (408, 429, 500, 502, 503, 504)
+FAILOVER_MARKERS = (
+    "429",
+    "rate limit",
+    "ratelimit",
+    "resource exhausted",
+    "resourceexhausted",
+    "quota",
+    "timeout",
+    "timed out",
+    "deadline",
+    "unavailable",
+    "overloaded",
+)
+
+
+def is_failover_error(error: Exception) -> bool:
+    """True for errors another provider might not have: rate limits, timeouts, 5xx."""
+    if isinstance(error, (TimeoutError, asyncio.TimeoutError)):
+        return True
+    status = getattr(error, "status_code", None) or getattr(getattr(error, "response", None), "status_code", None)
+    if status in FAILOVER_STATUS_CODES:
+        return True
+    text = f"{type(error).__name__} {error}".lower()
+    return any(marker in text for marker in FAILOVER_MARKERS)
+
+
+class Provider:
+    """One chat model behind the router, with its circuit and latency state."""
+
+    def __init__(self, name: str, model: BaseChatModel):
+        self.name = name
+        self.model = model
+        self.latency = None  # EWMA of call seconds, None until the first success
+        self.failures = 0  # consecutive failover errors
+        self.open_until = 0.0
+        self.calls = 0
+        self.errors = 0
+
+
+class LLMRouter(BaseChatModel):
+    """Chat model that spreads each call over several providers.
+
+    Providers are tried fastest first by an EWMA of their call latency
+    (unmeasured providers keep their listed order and are tried early once,
+    so they get a measurement). A rate limit, timeout or 5xx fails the call
+    over to the next provider and opens that provider's circuit for an
+    exponentially growing backoff; other errors are raised as is. With
+    ``hedge_after`` set, a call that has not answered (or, when streaming,
+    not produced its first token) within that many seconds is also sent to
+    the next provider and the first to respond wins; a losing stream is
+    closed. Hedged sync calls run on this router's ``hedge_threads`` pool.
+    When every thread is busy a call runs in the caller's thread without a
+    hedge instead of queueing behind the others.
+    """
+
+    providers: List[Any]
+    hedge_after: Optional[float] = None
+    hedge_threads: int = 16
+    ewma_alpha: float = 0.3
+    backoff_seconds: float = 5.0
+    max_backoff_seconds: float = 120.0
+    streaming: bool = False
+    clock: Any = time.monotonic
+
+    _lock: Any = PrivateAttr(default_factory=threading.Lock)
+    _counters: dict = PrivateAttr(
+        default_factory=lambda: {"failovers": 0, "hedges": 0, "hedge_wins": 0, "hedges_skipped": 0}
+    )
+    _executor: Any = PrivateAttr(default=None)
+    _in_flight: int = PrivateAttr(default=0)
+
+    @property
+    def _llm_type(self) -> str:
+        return "llm-router"
+
+    @property
+    def _identifying_params(self) -> dict:
+        return {"providers": [p.name for p in self.providers], "hedge_after": self.hedge_after}
+
+    def _should_stream(self, *, async_api: bool, run_manager=None, **kwargs) -> bool:
+        # Mirror the providers' ``streaming=True``: always take the token path
+        if self.streaming and "stream" not in kwargs:
+            return True
+        return super()._should_stream(async_api=async_api, run_manager=run_manager, **kwargs)
+
+    # -- provider selection and bookkeeping --------------------------------
+
+    def _candidates(self) -> List[Provider]:
+        now = self.clock()
+        with self._lock:
+            ranked = sorted(
+                enumerate(self.providers),
+                key=lambda item: (item[1].latency if item[1].latency is not None else 0.0, item[0]),
+            )
+            closed = [p for _, p in ranked if p.open_until <= now]
+            # Every circuit open: still try them, soonest to recover first
+            tripped = sorted((p for _, p in ranked if p.open_until > now), key=lambda p: p.open_until)
+            return closed + tripped
+
+    def _record_success(self, provider: Provider, seconds: float):
+        get_metrics().observe("llm_provider", seconds, provider.name)
+        with self._lock:
+            provider.calls += 1
+            provider.failures = 0
+            provider.open_until = 0.0
+            if provider.latency is None:
+                provider.latency = seconds
+            else:
+                provider.latency = self.ewma_alpha * seconds + (1 - self.ewma_alpha) * provider.latency
+
+    def _record_failure(self, provider: Provider, error: Exception):
+        with self._lock:
+            provider.calls += 1
+            provider.errors += 1
+            get_metrics().incr("llm_provider_errors", provider=provider.name, error=type(error).__name__)
+            if not is_failover_error(error):
+                return
+            provider.failures += 1
+            backoff = min(self.max_backoff_seconds, self.backoff_seconds * 2 ** (provider.failures - 1))
+            provider.open_until = self.clock() + backoff
+        print(f"{provider.name} failed ({type(error).__name__}); circuit open for {backoff:g}s")
+
+    def _count(self, name: str):
+        with self._lock:
+            self._counters[name] += 1
+        get_metrics().incr("llm_router", event=name)
+
+    def _reserve(self) -> bool:
+        """Claim a hedge thread, or False when all ``hedge_threads`` are busy."""
+        with self._lock:
+            if self._in_flight >= self.hedge_threads:
+                return False
+            self._in_flight += 1
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.hedge_threads, thread_name_prefix="llm-hedge")
+            return True
+
+    def _in_slot(self, fn, *args):
+        # Free the thread before the future resolves, so a failover can reuse it
+        try:
+            return fn(*args)
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+
+    def metrics(self) -> dict:
+        now = self.clock()
+        with self._lock:
+            metrics = dict(self._counters)
+            metrics["providers"] = {
+                p.name: {
+                    "calls": p.calls,
+                    "errors": p.errors,
+                    "latency_ewma": p.latency,
+                    "circuit": "open" if p.open_until > now else "closed",
+                }
+                for p in self.providers
+            }
+            return metrics
+
+    # -- sync path ---------------------------------------------------------
+
+    def _call(self, provider: Provider, messages, stop, kwargs) -> ChatResult:
+        start = time.perf_counter()
+        try:
+            result = provider.model._generate(messages, stop=stop, **kwargs)
+        except Exception as e:
+            self._record_failure(provider, e)
+            raise
+        self._record_success(provider, time.perf_counter() - start)
+        return result
+
+    def _first_chunk(self, provider: Provider, messages, stop, kwargs):
+        start = time.perf_counter()
+        try:
+            iterator = iter(provider.model._stream(messages, stop=stop, **kwargs))
+            chunk = next(iterator, None)
+        except Exception as e:
+            self._record_failure(provider, e)
+            raise
+        return start, chunk, iterator
+
+    @staticmethod
+    def _close_stream(result):
+        # A losing stream would hold its provider connection open until garbage collected
+        _, _, iterator = result
+        close = getattr(iterator, "close", None)
+        if close is not None:
+            close()
+
+    def _failover(self, candidates, fn, messages, stop, kwargs, last_error=None):
+        """Try ``candidates`` one after another in this thread."""
+        for provider in candidates:
+            try:
+                return provider, fn(provider, messages, stop, kwargs)
+            except Exception as e:
+                if not is_failover_error(e):
+                    raise
+                last_error = e
+                self._count("failovers")
+        raise last_error
+
+    def _race(self, fn, messages, stop, kwargs, discard=None):
+        """Run ``fn(provider, ...)`` with failover and optional hedging.
+
+        ``discard`` is called with the result of every call that finishes
+        after another one won.
+        """
+        candidates = iter(self._candidates())
+        if self.hedge_after is None:
+            return self._failover(candidates, fn, messages, stop, kwargs)
+        if not self._reserve():
+            self._count("hedges_skipped")
+            return self._failover(candidates, fn, messages, stop, kwargs)
+
+        last_error = None
+        pending = {}
+        hedged = False
+        launched = []
+
+        def submit(provider):
+            launched.append(provider)
+            # Keep tracing/callback context vars in the worker thread
+            context = contextvars.copy_context()
+            future = self._executor.submit(context.run, self._in_slot, fn, provider, messages, stop, kwargs)
+            pending[future] = provider
+
+        def discard_later(future):
+            if discard is not None and not future.cancelled() and future.exception() is None:
+                discard(future.result())
+
+        submit(next(candidates))
+        try:
+            while pending:
+                timeout = None if hedged else self.hedge_after
+                done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+                if not done:
+                    hedged = True
+                    provider = next(candidates, None)
+                    if provider is None:
+                        continue
+                    if self._reserve():
+                        submit(provider)
+                        self._count("hedges")
+                    else:
+                        # Keep waiting on the first call; the provider is still there for failover
+                        self._count("hedges_skipped")
+                        candidates = itertools.chain([provider], candidates)
+                    continue
+                for future in done:
+                    provider = pending.pop(future)
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        if not is_failover_error(e):
+                            raise
+                        last_error = e
+                        continue
+                    if hedged and provider is not launched[0]:
+                        self._count("hedge_wins")
+                    return provider, result
+                if not pending:
+                    provider = next(candidates, None)
+                    if provider is None:
+                        break
+                    self._count("failovers")
+                    if not self._reserve():
+                        return self._failover(itertools.chain([provider], candidates), fn, messages, stop, kwargs, last_error)
+                    submit(provider)
+            raise last_error
+        finally:
+            # Calls still running (or finished alongside the winner) cannot be cancelled; drop their results
+            for future in pending:
+                future.add_done_callback(discard_later)
+
+    def _generate(self, messages, stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> ChatResult:
+        _, result = self._race(self._call, messages, stop, kwargs)
+        return result
+
+    def _stream(self, messages, stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any):
+        # Failover and hedging only until the first token; after that we are committed
+        provider, (start, chunk, iterator) = self._race(
+            self._first_chunk, messages, stop, kwargs, discard=self._close_stream
+        )
+        if chunk is None:
+            return
+        try:
+            yield chunk
+            yield from iterator
+        except Exception as e:
+            self._record_failure(provider, e)
+            raise
+        self._record_success(provider, time.perf_counter() - start)
+
+    # -- async path --------------------------------------------------------
+
+    async def _acall(self, provider: Provider, messages, stop, kwargs) -> ChatResult:
+        start = time.perf_counter()
+        try:
+            result = await provider.model._agenerate(messages, stop=stop, **kwargs)
+        except Exception as e:
+            self._record_failure(provider, e)
+            raise
+        self._record_success(provider, time.perf_counter() - start)
+        return result
+
+    async def _afirst_chunk(self, provider: Provider, messages, stop, kwargs):
+        start = time.perf_counter()
+        try:
+            iterator = provider.model._astream(messages, stop=stop, **kwargs).__aiter__()
+            try:
+                chunk = await iterator.__anext__()
+            except StopAsyncIteration:
+                chunk = None
+            except asyncio.CancelledError:
+                # A losing hedge: close its stream, not just the task waiting on it
+                await self._aclose_stream((start, None, iterator))
+                raise
+        except Exception as e:
+            self._record_failure(provider, e)
+            raise
+        return start, chunk, iterator
+
+    @staticmethod
+    async def _aclose_stream(result):
+        _, _, iterator = result
+        aclose = getattr(iterator, "aclose", None)
+        if aclose is not None:
+            await aclose()
+
+    async def _arace(self, fn, messages, stop, kwargs, discard=None):
+        candidates = iter(self._candidates())
+        last_error = None
+        pending = {}
+        hedged = self.hedge_after is None  # no hedging: plain sequential failover
+        launched = []
+
+        def launch() -> bool:
+            provider = next(candidates, None)
+            if provider is None:
+                return False
+            launched.append(provider)
+            pending[asyncio.ensure_future(fn(provider, messages, stop, kwargs))] = provider
+            return True
+
+        launch()
+        try:
+            while pending:
+                timeout = None if hedged else self.hedge_after
+                done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    hedged = True
+                    if launch():
+                        self._count("hedges")
+                    continue
+                for task in done:
+                    provider = pending.pop(task)
+                    try:
+                        result = task.result()
+                    except Exception as e:
+                        if not is_failover_error(e):
+                            raise
+                        last_error = e
+                        if not pending and launch():
+                            self._count("failovers")
+                        continue
+                    if self.hedge_after is not None and hedged and provider is not launched[0]:
+                        self._count("hedge_wins")
+                    return provider, result
+            raise last_error
+        finally:
+            # Losing hedges are cancelled rather than left running; streams that already started are closed
+            for task in pending:
+                if not task.done():
+                    task.cancel()
+                elif discard is not None and not task.cancelled() and task.exception() is None:
+                    await discard(task.result())
+
+    async def _agenerate(self, messages, stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> ChatResult:
+        _, result = await self._arace(self._acall, messages, stop, kwargs)
+        return result
+
+    async def _astream(self, messages, stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any):
+        provider, (start, chunk, iterator) = await self._arace(
+            self._afirst_chunk, messages, stop, kwargs, discard=self._aclose_stream
+        )
+        if chunk is None:
+            return
+        try:
+            yield chunk
+            async for chunk in iterator:
+                yield chunk
+        except Exception as e:
+            self._record_failure(provider, e)
+            raise
+        self._record_success(provider, time.perf_counter() - start)
+
+
+_router = None
+_router_lock = threading.Lock()
+
+
+def _env_float(name: str, default):
+    value = os.getenv(name, "")
+    return float(value) if value.strip() else default
+
+
+def build_default_providers() -> List[Provider]:
+    from langchain_google_genai import ChatGoogleGenerativeAI
+    from langchain_groq import ChatGroq
+
+    timeout = _env_float("LLM_TIMEOUT", 60.0)
+    return [
+        Provider(
+            "gemini",
+            ChatGoogleGenerativeAI(
+                model="gemini-2.5-flash",
+                api_key=os.getenv("GOOGLE_API_KEY"),
+                temperature=0.0,
+                streaming=True,
+                timeout=timeout,
+                # The router fails over instead of retrying a rate-limited provider
+                max_retries=1,
+            ),
+        ),
+        Provider(
+            "groq",
+            ChatGroq(
+                model="llama-3.3-70b-versatile",
+                api_key=os.getenv("GROQ_API_KEY"),
+                temperature=0.0,
+                streaming=True,
+                timeout=timeout,
+                max_retries=0,
+            ),
+        ),
+    ]
+
+
+def get_llm_router() -> LLMRouter:
+    """Return the process-wide Gemini/Groq router, built on first use.
+
+    Shared so that circuit state and latency estimates from one agent
+    inform every other agent in the process. ``LLM_HEDGE_AFTER`` (seconds,
+    empty disables hedging), ``LLM_HEDGE_THREADS``, ``LLM_TIMEOUT``,
+    ``LLM_BACKOFF`` and ``LLM_MAX_BACKOFF`` tune it.
+    """
+    global _router
+    with _router_lock:
+        if _router is None:
+            _router = LLMRouter(
+                providers=build_default_providers(),
+                hedge_after=_env_float("LLM_HEDGE_AFTER", None),
+                hedge_threads=int(os.getenv("LLM_HEDGE_THREADS", "16")),
+                backoff_seconds=_env_float("LLM_BACKOFF", 5.0),
+                max_backoff_seconds=_env_float("LLM_MAX_BACKOFF", 120.0),
+                streaming=True,
+            )
+        return _router
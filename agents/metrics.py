@@ -0,0 +1,223 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Upper bounds (seconds) of the latency histogram buckets
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class _Series:
+    def __init__(self, samples: int):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets = [0] * len(BUCKETS)
+        self.recent = deque(maxlen=samples)
+
+    def observe(self, seconds: float):
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        self.recent.append(seconds)
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                self.buckets[i] += 1
+                break
+
+
+class JsonlSink:
+    """Appends every observation as one JSON line, for offline analysis."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+    def __call__(self, event: dict):
+        line = json.dumps(event, sort_keys=True)
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+
+
+class MetricsRegistry:
+    """In-process stage timings and counters.
+
+    Timings are keyed on ``(stage, name, status)``, e.g. ``("llm",
+    "LLMRouter", "ok")`` or ``("embed", "", "ok")``, and keep a Prometheus
+    histogram plus the most recent ``samples`` values for percentiles.
+    Counters (tokens, cache lookups) take free-form labels. Sinks are
+    callables that receive every observation as a dict.
+    """
+
+    def __init__(self, samples: int = 1024, clock=time.time):
+        self.samples = samples
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._timings = {}
+        self._counters = {}
+        self._sinks = []
+
+    def add_sink(self, sink):
+        self._sinks.append(sink)
+
+    def _emit(self, event: dict):
+        for sink in self._sinks:
+            try:
+                sink(event)
+            except Exception as e:
+                print(f"Metrics sink {sink!r} failed: {e}")
+
+    def observe(self, stage: str, seconds: float, name: str = "", status: str = "ok"):
+        key = (stage, name, status)
+        with self._lock:
+            series = self._timings.get(key)
+            if series is None:
+                series = self._timings[key] = _Series(self.samples)
+            series.observe(seconds)
+        if self._sinks:
+            self._emit({"ts": self._clock(), "type": "timing", "stage": stage, "name": name, "status": status, "seconds": seconds})
+
+    def incr(self, metric: str, value: float = 1, **labels):
+        key = (metric, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+        if self._sinks:
+            self._emit({"ts": self._clock(), "type": "counter", "metric": metric, "value": value, **labels})
+
+    @contextmanager
+    def timer(self, stage: str, name: str = ""):
+        start = time.perf_counter()
+        status = "ok"
+        try:
+            yield
+        except BaseException:
+            status = "error"
+            raise
+        finally:
+            self.observe(stage, time.perf_counter() - start, name, status)
+
+    def timed_iter(self, iterable, stage: str, name: str = ""):
+        # Times each next() separately, e.g. one lazily loaded PDF page at a time
+        iterator = iter(iterable)
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            self.observe(stage, time.perf_counter() - start, name)
+            yield item
+
+    def summary(self) -> list:
+        """One row per timing series with count, mean, p50, p95, p99 and max in ms."""
+        with self._lock:
+            items = [(key, series.count, series.total, series.max, sorted(series.recent)) for key, series in self._timings.items()]
+        rows = []
+        for (stage, name, status), count, total, slowest, recent in sorted(items):
+            rows.append(
+                {
+                    "stage": stage,
+                    "name": name,
+                    "status": status,
+                    "count": count,
+                    "mean_ms": 1000 * total / count,
+                    "p50_ms": 1000 * recent[len(recent) // 2],
+                    "p95_ms": 1000 * recent[min(len(recent) - 1, int(0.95 * len(recent)))],
+                    "p99_ms": 1000 * recent[min(len(recent) - 1, int(0.99 * len(recent)))],
+                    "max_ms": 1000 * slowest,
+                }
+            )
+        return rows
+
+    def counters(self) -> dict:
+        with self._lock:
+            items = list(self._counters.items())
+        counters = {}
+        for (metric, labels), value in sorted(items):
+            label_text = ",".join(f"{k}={v}" for k, v in labels)
+            counters[f"{metric}{{{label_text}}}" if label_text else metric] = value
+        return counters
+
+    def to_prometheus(self) -> str:
+        """Prometheus text exposition format."""
+        with self._lock:
+            timings = [(key, series.count, series.total, list(series.buckets)) for key, series in self._timings.items()]
+            counters = list(self._counters.items())
+
+        lines = [
+            "# HELP agent_stage_seconds Time spent per pipeline stage.",
+            "# TYPE agent_stage_seconds histogram",
+        ]
+        for (stage, name, status), count, total, buckets in sorted(timings):
+            labels = f'stage="{_escape(stage)}",name="{_escape(name)}",status="{status}"'
+            cumulative = 0
+            for bound, n in zip(BUCKETS, buckets):
+                cumulative += n
+                lines.append(f'agent_stage_seconds_bucket{{{labels},le="{bound:g}"}} {cumulative}')
+            lines.append(f'agent_stage_seconds_bucket{{{labels},le="+Inf"}} {count}')
+            lines.append(f"agent_stage_seconds_sum{{{labels}}} {total}")
+            lines.append(f"agent_stage_seconds_count{{{labels}}} {count}")
+
+        seen = set()
+        for (metric, labels), value in sorted(counters):
+            name = f"agent_{metric}_total"
+            if name not in seen:
+                seen.add(name)
+                lines.append(f"# TYPE {name} counter")
+            label_text = ",".join(f'{k}="{_escape(str(v))}"' for k, v in labels)
+            lines.append(f"{name}{{{label_text}}} {value}" if label_text else f"{name} {value}")
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path: str):
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(self.to_prometheus())
+        os.replace(tmp_path, path)
+
+    def reset(self):
+        with self._lock:
+            self._timings.clear()
+            self._counters.clear()
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class _PrometheusHandler(BaseHTTPRequestHandler):
+    registry = None
+
+    def do_GET(self):
+        body = self.registry.to_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve_prometheus(registry: MetricsRegistry, port: int, host: str = "0.0.0.0"):
+    """Serve ``registry`` as Prometheus text on ``host:port`` from a daemon thread."""
+    handler = type("PrometheusHandler", (_PrometheusHandler,), {"registry": registry})
+    server = ThreadingHTTPServer((host, port), handler)
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    return server
+
+
+_metrics = MetricsRegistry()
+if os.getenv("METRICS_JSONL"):
+    _metrics.add_sink(JsonlSink(os.getenv("METRICS_JSONL")))
+if os.getenv("METRICS_PORT"):
+    serve_prometheus(_metrics, int(os.getenv("METRICS_PORT")))
+
+
+def get_metrics() -> MetricsRegistry:
+    return _metrics
@@ -0,0 +1,124 @@
+import os
+import threading
+import time
+from contextvars import ContextVar
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.tracers.context import register_configure_hook
+
+from agents.metrics import MetricsRegistry, get_metrics
+
+
+def _usage(response):
+    """(prompt, completion) token counts reported in an LLMResult, or None."""
+    usage = (response.llm_output or {}).get("token_usage") or (response.llm_output or {}).get("usage") or {}
+    prompt = usage.get("prompt_tokens") or usage.get("input_tokens")
+    completion = usage.get("completion_tokens") or usage.get("output_tokens")
+    if prompt is None:
+        for generations in response.generations:
+            for generation in generations:
+                metadata = getattr(getattr(generation, "message", None), "usage_metadata", None)
+                if metadata:
+                    prompt = (prompt or 0) + metadata.get("input_tokens", 0)
+                    completion = (completion or 0) + metadata.get("output_tokens", 0)
+    return prompt, completion
+
+
+class MetricsCallbackHandler(BaseCallbackHandler):
+    """Records LLM calls, tool calls, retrievals and LangGraph nodes.
+
+    Importing this module installs it for every run through a LangChain
+    configure hook, so no caller has to pass it in. Providers that do not
+    report usage get token counts estimated as characters / 4.
+    """
+
+    def __init__(self, registry: MetricsRegistry):
+        self.registry = registry
+        self._starts = {}
+        self._lock = threading.Lock()
+
+    def _start(self, run_id, stage: str, name: str, prompt_chars: int = 0):
+        with self._lock:
+            self._starts[run_id] = (time.perf_counter(), stage, name, prompt_chars)
+
+    def _end(self, run_id, status: str = "ok"):
+        with self._lock:
+            entry = self._starts.pop(run_id, None)
+        if entry is None:
+            return None
+        start, stage, name, prompt_chars = entry
+        self.registry.observe(stage, time.perf_counter() - start, name, status)
+        return name, prompt_chars
+
+    @staticmethod
+    def _name(serialized, kwargs, default: str) -> str:
+        if kwargs.get("name"):
+            return kwargs["name"]
+        serialized = serialized or {}
+        return serialized.get("name") or (serialized.get("id") or [default])[-1]
+
+    def on_llm_start(self, serialized, prompts, *, run_id, **kwargs):
+        self._start(run_id, "llm", self._name(serialized, kwargs, "llm"), sum(len(p) for p in prompts))
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        chars = sum(len(str(m.content)) for batch in messages for m in batch)
+        self._start(run_id, "llm", self._name(serialized, kwargs, "chat_model"), chars)
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        ended = self._end(run_id)
+        if ended is None:
+            return
+        name, prompt_chars = ended
+        prompt, completion = _usage(response)
+        source = "provider"
+        if prompt is None:
+            source = "estimate"
+            prompt = prompt_chars // 4
+            completion = sum(len(g.text) for gens in response.generations for g in gens) // 4
+        self.registry.incr("llm_calls", model=name)
+        self.registry.incr("llm_tokens", prompt, model=name, kind="prompt", source=source)
+        self.registry.incr("llm_tokens", completion or 0, model=name, kind="completion", source=source)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, "error")
+
+    def on_tool_start(self, serialized, input_str, *, run_id, **kwargs):
+        self._start(run_id, "tool", self._name(serialized, kwargs, "tool"))
+
+    def on_tool_end(self, output, *, run_id, **kwargs):
+        self._end(run_id)
+
+    def on_tool_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, "error")
+
+    def on_retriever_start(self, serialized, query, *, run_id, **kwargs):
+        self._start(run_id, "retrieval", self._name(serialized, kwargs, "retriever"))
+
+    def on_retriever_end(self, documents, *, run_id, **kwargs):
+        self._end(run_id)
+
+    def on_retriever_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, "error")
+
+    def on_chain_start(self, serialized, inputs, *, run_id, metadata=None, **kwargs):
+        # A LangGraph node's own run is named after the node
+        node = (metadata or {}).get("langgraph_node")
+        if node is not None and kwargs.get("name") == node:
+            self._start(run_id, "graph_node", node)
+
+    def on_chain_end(self, outputs, *, run_id, **kwargs):
+        self._end(run_id)
+
+    def on_chain_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, "error")
+
+
+def _enabled() -> bool:
+    return os.getenv("AGENT_METRICS", "true").lower() not in ("", "0", "false", "no")
+
+
+# A ContextVar default is visible from every thread, including Streamlit's
+metrics_handler_var = ContextVar(
+    "agent_metrics_handler", default=MetricsCallbackHandler(get_metrics()) if _enabled() else None
+)
+register_configure_hook(metrics_handler_var, inheritable=True)
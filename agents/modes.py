@@ -0,0 +1,45 @@
+import os
+import re
+
+AGENT_MODES = ("auto", "direct", "react")
+
+# Cues that a question needs more than one lookup plus an answer
+MULTI_STEP_PATTERN = re.compile(
+    r"\b(compare|comparison|differences?|versus|vs|calculate|compute|total|average|sum of|"
+    r"combined|step by step|how many years|how long)\b",
+    re.IGNORECASE,
+)
+
+
+def default_mode() -> str:
+    return os.getenv("AGENT_MODE", "auto")
+
+
+def validate_mode(mode: str) -> str:
+    if mode not in AGENT_MODES:
+        raise ValueError(f"Unknown agent mode {mode!r}; expected one of {AGENT_MODES}")
+    return mode
+
+
+def needs_reasoning(question: str) -> bool:
+    return bool(MULTI_STEP_PATTERN.search(question))
+
+
+def resolve_mode(mode: str, question: str) -> str:
+    """Pick "direct" or "react" for one question.
+
+    "direct" calls the agent's single tool itself (RetrievalQA: one LLM call;
+    weather: none). "react" runs the ReAct agent loop. "auto" uses direct
+    unless the question looks multi-step.
+    """
+    if mode == "auto":
+        return "react" if needs_reasoning(question) else "direct"
+    return mode
+
+
+def with_context(question: str, context: str = "") -> str:
+    """The question as the LLM sees it: earlier conversation first, when there is any.
+
+    Only for prompts; retrieval and cache keys use the bare question.
+    """
+    return f"{context}\n\nCurrent question: {question}" if context else question
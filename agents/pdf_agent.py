@@ -1,99 +1,311 @@
+import asyncio
+import copy
 import os
 import sys
-from dotenv import load_dotenv
+import threading
+import time
+from langchain_core.runnables import RunnableLambda
 from langchain.agents import AgentType, Tool, initialize_agent
-from langchain_community.agent_toolkits.load_tools import load_tools
 from langchain.chains import RetrievalQA
-from langchain_google_genai import GoogleGenerativeAIEmbeddings
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_groq import ChatGroq
-from langchain.text_splitter import CharacterTextSplitter
-from langchain_qdrant import QdrantVectorStore
-from langchain_community.document_loaders import PyPDFLoader
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from agents import load_environment
+from agents.answer_cache import AnswerCache, get_answer_cache, normalize_question
+from agents.chunking import AssembledRetriever, ContextAssembler, chunking_params, context_budget, make_text_splitter
+from agents.corpus import get_corpus
+from agents.hybrid import RETRIEVERS, HybridRetriever, MultiSink, drop_keyword_index, get_keyword_index, make_reranker
+from agents.backends import embed_queries, get_backends
+from agents.metrics import get_metrics
+from agents.modes import default_mode, resolve_mode, validate_mode, with_context
+from agents.streaming import stream_agent
+from agents.ingest import IngestJob, StreamingIngestor, load_pdf_pages
+from agents.ingest_cache import IngestCache, content_sha256, get_ingest_cache, ingest_key, is_path, read_source
+from agents.vector_backends import get_vector_backend, search_many
 
 
 class PDFAgent:
-    def __init__(self, pdf_path: str, collection_name: str = "test"):
-        self.pdf_path = pdf_path
-        self.collection_name = collection_name
+    """ReAct/RetrievalQA agent over one PDF.
+
+    ``pdf_path`` is a file path, or the PDF itself as bytes, a memoryview
+    or a binary file-like object (e.g. a Streamlit upload). In-memory PDFs
+    are parsed straight from the buffer, never written to disk, and are
+    identified by their content hash.
+
+    With ``corpus`` (a PDFCorpus, or a corpus name; PDF_CORPUS sets a
+    default) the PDF is added to that shared collection instead of its own,
+    and retrieval is filtered to it plus any other ``doc_ids``. A corpus
+    agent without a PDF answers from ``doc_ids``, or the whole corpus.
+
+    ``chunker`` (PDF_CHUNKER) is "structured" (default: token-sized chunks
+    on heading/paragraph/sentence boundaries, see agents.chunking) or
+    "character" (the former fixed-size splitter). ``chunk_size`` and
+    ``chunk_overlap`` are in that chunker's units and default to its
+    CHUNK_DEFAULTS.
+    """
+
+    def __init__(
+        self,
+        pdf_path=None,
+        collection_name: str = "test",
+        chunk_size: int = None,
+        chunk_overlap: int = None,
+        embedding_model: str = "gemini-embedding-001",
+        ingest_cache: IngestCache = None,
+        answer_cache: AnswerCache = None,
+        semantic_cache: bool = True,
+        embed_batch_size: int = 64,
+        embed_concurrency: int = 4,
+        background_ingest: bool = False,
+        vector_backend: str = None,
+        mode: str = None,
+        corpus=None,
+        doc_ids=None,
+        retriever: str = None,
+        llm=None,
+        embeddings=None,
+        chunker: str = None,
+    ):
+        # Before any setting is read: the defaults below come from the environment
         self._load_environment()
-        self.llm = self._initialize_llm()
-        self.embeddings = self._initialize_embeddings()
-        self.vector_store = self._initialize_vector_store()
+        # llm and embeddings override the configured backends (see agents.backends)
+        # An upload is read once here; hashing and parsing share the bytes
+        pdf_path = read_source(pdf_path)
+        self.pdf_path = pdf_path if is_path(pdf_path) else None
+        self.corpus = corpus or os.getenv("PDF_CORPUS") or None
+        self.doc_ids = list(doc_ids) if doc_ids else None
+        self.search_filter = None
+        self.keyword_filter = None
+        self.retriever = retriever or os.getenv("PDF_RETRIEVER", "hybrid")
+        if self.retriever not in RETRIEVERS:
+            raise ValueError(f"Unknown retriever {self.retriever!r}; expected one of {RETRIEVERS}")
+        self.collection_name = collection_name
+        self.chunker, self.chunk_size, self.chunk_overlap = chunking_params(chunker, chunk_size, chunk_overlap)
+        self.embedding_model = embedding_model
+        self.ingest_cache = ingest_cache or get_ingest_cache()
+        self.answer_cache = answer_cache or get_answer_cache()
+        self.semantic_cache = semantic_cache
+        self.embed_batch_size = embed_batch_size
+        self.embed_concurrency = embed_concurrency
+        self.background_ingest = background_ingest
+        self.ingest_job = None
+        self.vector_backend = vector_backend or get_backends().vector_backend()
+        self.mode = validate_mode(mode or default_mode())
+        self.ingest_stats = {}
+        self.batch_stats = {}
+        self.llm = llm or self._initialize_llm()
+        self.embeddings = embeddings or self._initialize_embeddings()
+        self.vector_store = self._initialize_vector_store(pdf_path)
         self.qa_chain = self._initialize_qa_chain()
         self.tools = self._initialize_tools()
         self.agent = self._initialize_agent()
 
     def _load_environment(self):
-        load_dotenv(override=True)
-        os.environ["GROQ_API_KEY"] = os.getenv("GROQ_API_KEY")
-        os.environ["GOOGLE_API_KEY"] = os.getenv("GOOGLE_API_KEY")
-        os.environ["QDRANT_API_KEY"] = os.getenv("QDRANT_API_KEY")
-        os.environ["QDRANT_URL"] = os.getenv("QDRANT_URL")
-        os.environ["LANGSMITH_TRACING"]= "true"
-        os.environ["LANGSMITH_API_KEY"] = os.getenv("LANGSMITH_API_KEY")
+        # Fake and replayed backends run without any keys
+        load_environment()
 
     def _initialize_llm(self):
-        try:
-            return ChatGoogleGenerativeAI(
-                model="gemini-2.5-flash",
-                api_key=os.getenv("GOOGLE_API_KEY"),
-                temperature=0.0,
+        # Live: the shared Gemini/Groq router, with per-call failover on 429s and timeouts
+        return get_backends().llm()
+
+    def _initialize_embeddings(self):
+        return get_backends().embeddings(self.embedding_model)
+
+    def _initialize_vector_store(self, source):
+        if self.corpus is not None:
+            return self._initialize_corpus_store(source)
+        if source is None:
+            raise ValueError("PDFAgent needs a pdf_path unless it answers from a corpus")
+        start = time.perf_counter()
+        self.content_hash = content_sha256(source)
+        params = (self.chunk_size, self.chunk_overlap, self.embedding_model, self.vector_backend, self.chunker)
+        key = ingest_key(self.content_hash, *params)
+        # Answers depend on the document and how it was chunked/embedded
+        self.ingest_key = key
+        backend = get_vector_backend(self.vector_backend)
+
+        # Reuse any collection that finished ingesting this exact content/params combination
+        entry = self.ingest_cache.get(key)
+        if entry and backend.exists(entry["collection_name"]):
+            self.ingest_cache.touch(key)
+            self._record_ingest("hit", key, entry["collection_name"], start)
+            self.vector_collection = entry["collection_name"]
+            return backend.open_store(entry["collection_name"], self.embeddings)
+
+        # Otherwise (re)ingest into this file's own collection, embedding only changed pages.
+        # An upload has no path, so its content hash is its identity
+        source_id = os.path.abspath(source) if is_path(source) else f"upload:{self.content_hash}"
+        source_key = ingest_key(f"source:{source_id}", *params)
+        collection_name = IngestCache.collection_name(self.collection_name, source_key)
+        source_entry = self.ingest_cache.get(source_key) or {}
+        previous_pages = source_entry.get("pages", {}) if backend.exists(collection_name) else {}
+
+        sink = backend.sink(collection_name)
+        if self.retriever == "hybrid":
+            # The keyword index is built from the same chunks as they are upserted
+            sink = MultiSink([sink, get_keyword_index(collection_name).sink()])
+        ingestor = StreamingIngestor(
+            sink,
+            self.embeddings,
+            make_text_splitter(self.chunker, self.chunk_size, self.chunk_overlap),
+            batch_size=self.embed_batch_size,
+            max_concurrency=self.embed_concurrency,
+        )
+        job = self.ingest_job = IngestJob()
+
+        def ingest():
+            pages = ingestor.run(load_pdf_pages(source, self.content_hash), previous_pages, job)
+            old_key = source_entry.get("content_key")
+            old_entry = self.ingest_cache.get(old_key) if old_key else None
+            # The collection no longer holds the old content
+            if old_entry and old_entry["collection_name"] == collection_name:
+                self.ingest_cache.discard(old_key)
+            seconds = self._record_ingest("incremental" if previous_pages else "miss", key, collection_name, start)
+            self.ingest_cache.put(
+                source_key,
+                collection_name=collection_name,
+                vector_backend=self.vector_backend,
+                content_key=key,
+                pages=pages,
             )
-        
-        except Exception as e:
-            if hasattr(e, "status_code") and e.status_code == 429:
-                print("Google Gemini rate limited. Falling back to Groq...")
-            elif "429" in str(e):
-                print("Rate limit detected in error message. Falling back to Groq...")
-            else:
-                raise  # re-raise other exceptions
+            self.ingest_cache.put(
+                key,
+                collection_name=collection_name,
+                vector_backend=self.vector_backend,
+                content_hash=self.content_hash,
+                chunks=job.stats["chunks"],
+                build_seconds=seconds,
+            )
+            self._evict_collections(backend, keep=(collection_name,))
+
+        if self.background_ingest:
+            # Return as soon as the first batch is searchable; the rest lands in the background
+            threading.Thread(target=job.run, args=(ingest,), name="pdf-ingest", daemon=True).start()
+            job.first_batch.wait()
+            if job.error is not None:
+                raise job.error
+        else:
+            job.run(ingest)
+        self.vector_collection = collection_name
+        return backend.open_store(collection_name, self.embeddings)
 
-            return ChatGroq(
-                model="llama-3.3-70b-versatile",
-                api_key=os.getenv("GROQ_API_KEY"),
-                temperature=0.0,
+    def _evict_collections(self, backend, keep=()):
+        """Drop idle per-PDF collections and their manifest entries (INGEST_MAX_COLLECTIONS, INGEST_COLLECTION_TTL)."""
+        max_collections = int(os.getenv("INGEST_MAX_COLLECTIONS", "32"))
+        ttl_seconds = float(os.getenv("INGEST_COLLECTION_TTL", str(7 * 24 * 60 * 60)))
+        for collection_name in self.ingest_cache.idle_collections(self.vector_backend, max_collections, ttl_seconds, keep):
+            # Collection first: an entry without its collection is already treated as a miss
+            backend.drop(collection_name)
+            drop_keyword_index(collection_name)
+            self.ingest_cache.discard_collection(collection_name)
+            get_metrics().incr("collection_evictions", backend=self.vector_backend)
+            print(f"Evicted idle collection {collection_name}")
+
+    def _initialize_corpus_store(self, source):
+        start = time.perf_counter()
+        if isinstance(self.corpus, str):
+            self.corpus = get_corpus(
+                self.corpus,
+                embeddings=self.embeddings,
+                ingest_cache=self.ingest_cache,
+                vector_backend=self.vector_backend,
+                chunk_size=self.chunk_size,
+                chunk_overlap=self.chunk_overlap,
+                embedding_model=self.embedding_model,
+                chunker=self.chunker,
             )
+        doc_ids = list(self.doc_ids or [])
+        if source is not None:
+            self.content_hash = self.corpus.add(source)
+            if self.content_hash not in doc_ids:
+                doc_ids.append(self.content_hash)
+        self.doc_ids = doc_ids or None
+        # Answers depend on which documents are in scope; None is the whole corpus as it is now
+        scope = doc_ids or [entry["doc_id"] for entry in self.corpus.documents()]
+        self.ingest_key = ingest_key(f"corpus:{','.join(sorted(scope))}", *self.corpus.params)
+        self.search_filter = self.corpus.filter(self.doc_ids)
+        self.keyword_filter = {"doc_id": self.doc_ids} if self.doc_ids else None
+        self.vector_collection = self.corpus.collection_name
+        self.ingest_stats = {
+            "outcome": "corpus",
+            "collection_name": self.corpus.collection_name,
+            "doc_ids": self.doc_ids,
+            "seconds": time.perf_counter() - start,
+        }
+        return self.corpus.store()
 
-    def _initialize_embeddings(self):
-        return GoogleGenerativeAIEmbeddings(model="gemini-embedding-001")
-
-    def _initialize_vector_store(self):
-        loader = PyPDFLoader(self.pdf_path)
-        documents = loader.load()
-
-        text_splitter = CharacterTextSplitter(chunk_size=1000, chunk_overlap=0)
-        split_texts = text_splitter.split_documents(documents)
-
-        return QdrantVectorStore.from_documents(
-            documents=split_texts,
-            embedding=self.embeddings,
-            collection_name=self.collection_name,
-            api_key=os.getenv("QDRANT_API_KEY"),
-            url=os.getenv("QDRANT_URL"),
-            force_recreate=True
+    def _search_kwargs(self) -> dict:
+        return {"filter": self.search_filter} if self.search_filter is not None else {}
+
+    def _record_ingest(self, outcome: str, key: str, collection_name: str, start: float) -> float:
+        seconds = time.perf_counter() - start
+        self.ingest_stats = dict(self.ingest_job.stats) if self.ingest_job is not None else {}
+        self.ingest_stats.update(
+            outcome=outcome,
+            key=key,
+            collection_name=collection_name,
+            seconds=seconds,
+        )
+        get_metrics().incr("cache_lookups", cache="ingest", result=outcome)
+        get_metrics().observe("ingest", seconds, outcome)
+        print(f"Ingestion cache {outcome} for {collection_name} ({seconds:.3f}s)")
+        return seconds
+
+    def _initialize_retriever(self):
+        # Context tokens per answer for this LLM; 0 stuffs the top k chunks as they are
+        budget = context_budget(self.llm)
+        if self.retriever == "vector":
+            k = int(os.getenv("RETRIEVER_K", "4"))
+            if not budget:
+                self.answer_key = f"{self.ingest_key}|vector|k={k}"
+                return self.vector_store.as_retriever(search_kwargs={"k": k, **self._search_kwargs()})
+            fetch_k = int(os.getenv("RETRIEVER_FETCH_K", "20"))
+            self.answer_key = f"{self.ingest_key}|vector|k={k}|fetch_k={fetch_k}|budget={budget}"
+            return AssembledRetriever(
+                retriever=self.vector_store.as_retriever(search_kwargs={"k": fetch_k, **self._search_kwargs()}),
+                assembler=ContextAssembler(budget, max_chunks=k),
+                fetch_k=fetch_k,
+            )
+        keyword_index = get_keyword_index(self.vector_collection, self.vector_store)
+        settings = {
+            "k": int(os.getenv("RETRIEVER_K", "3")),
+            "fetch_k": int(os.getenv("RETRIEVER_FETCH_K", "20")),
+            "reranker": os.getenv("RERANKER", "overlap"),
+            "compress_chars": int(os.getenv("RETRIEVER_COMPRESS_CHARS", "600")),
+            "budget": budget,
+        }
+        # Answers depend on the context the retriever assembles, so its settings are part of their key
+        self.answer_key = f"{self.ingest_key}|hybrid|" + "|".join(f"{name}={value}" for name, value in settings.items())
+        return HybridRetriever(
+            vector_store=self.vector_store,
+            keyword_index=keyword_index,
+            k=settings["k"],
+            fetch_k=settings["fetch_k"],
+            reranker=make_reranker(settings["reranker"], keyword_index),
+            compress_chars=settings["compress_chars"],
+            vector_filter=self.search_filter,
+            keyword_filter=self.keyword_filter,
+            assembler=ContextAssembler(budget, max_chunks=settings["k"]) if budget else None,
         )
 
     def _initialize_qa_chain(self):
         return RetrievalQA.from_chain_type(
             llm=self.llm,
             chain_type="stuff",
-            retriever=self.vector_store.as_retriever()
+            retriever=self._initialize_retriever()
         )
 
     def _initialize_tools(self):
-        tools = load_tools([], llm=self.llm)
-        tools.append(
+        return [
             Tool(
                 name="State of Union QA System",
-                func=self.qa_chain.run,
+                func=self._answer_from_pdf,
+                coroutine=self._aanswer_from_pdf,
                 description=(
                     "Useful for answering questions from the uploaded PDF. "
                     "Input should be a fully formed question."
                 ),
             )
-        )
-        return tools
+        ]
 
     def _initialize_agent(self):
         return initialize_agent(
@@ -103,13 +315,290 @@ class PDFAgent:
             verbose=True,
         )
 
-    def ask(self, question: str):
+    def _cache_embeddings(self):
+        return self.embeddings if self.semantic_cache else None
+
+    def _ingest_complete(self) -> bool:
+        # Answers from a partly ingested PDF must not be cached under its final ingest key
+        job = self.ingest_job
+        return job is None or (job.done and job.error is None)
+
+    def _retriever_k(self) -> int:
+        """Chunks per answer of the QA chain's retriever."""
+        retriever = self.qa_chain.retriever
+        if isinstance(retriever, HybridRetriever):
+            return retriever.k
+        if isinstance(retriever, AssembledRetriever):
+            return retriever.assembler.max_chunks
+        return retriever.search_kwargs["k"]
+
+    def _batch_retriever(self, k: int = None):
+        """The QA chain's retriever, or a copy that keeps ``k`` chunks per answer."""
+        retriever = self.qa_chain.retriever
+        if k is None or k == self._retriever_k():
+            return retriever
+        if isinstance(retriever, HybridRetriever):
+            assembler = retriever.assembler
+            if assembler is not None:
+                assembler = copy.copy(assembler)
+                assembler.max_chunks = k
+            return retriever.model_copy(update={"k": k, "assembler": assembler})
+        if isinstance(retriever, AssembledRetriever):
+            assembler = copy.copy(retriever.assembler)
+            assembler.max_chunks = k
+            return retriever.model_copy(update={"assembler": assembler})
+        return retriever
+
+    def _batch_answer_key(self, k: int = None) -> str:
+        # A different number of chunks gives different answers than ask() caches
+        return self.answer_key if k is None or k == self._retriever_k() else f"{self.answer_key}|batch_k={k}"
+
+    def _search_by_vectors(self, questions, vectors, k: int = None):
+        """Retrieve for already embedded ``questions`` the way the QA chain's retriever would, keeping ``k`` chunks."""
+        retriever = self._batch_retriever(k)
+        hybrid = isinstance(retriever, HybridRetriever)
+        assembled = isinstance(retriever, AssembledRetriever)
+        if hybrid or assembled:
+            # Candidates for fusion/packing, which keep k of them
+            fetch_k = retriever.fetch_k
+        else:
+            fetch_k = k or retriever.search_kwargs["k"]
+        retrieved = search_many(self.vector_store, vectors, fetch_k, filter=self.search_filter)
+        if hybrid:
+            return [retriever.fuse(question, docs) for question, docs in zip(questions, retrieved)]
+        if assembled:
+            return [retriever.assembler.assemble(docs) for docs in retrieved]
+        return retrieved
+
+    def _qa(self, vector=None, context: str = ""):
+        """The QA chain over ``{"question": ...}``, retrieving for the question alone.
+
+        Retrieval uses an already computed question ``vector`` when there is
+        one; ``context`` (earlier conversation) reaches only the LLM prompt.
+        """
+
+        def retrieve(inputs, config):
+            question = inputs["question"]
+            if vector is None:
+                docs = self.qa_chain.retriever.invoke(question, config=config)
+            else:
+                with get_metrics().timer("retrieval", "vector"):
+                    docs = self._search_by_vectors([question], [vector])[0]
+            return {"input_documents": docs, "question": with_context(question, context)}
+
+        return RunnableLambda(retrieve) | self.qa_chain.combine_documents_chain
+
+    def _run_qa(self, question: str, vector=None, context: str = ""):
+        # A semantic cache miss already embedded the question; don't embed it again to retrieve
+        if vector is None and not context:
+            return self.qa_chain.run(question)
+        output_key = self.qa_chain.combine_documents_chain.output_key
+        return self._qa(vector, context).invoke({"question": question})[output_key]
+
+    async def _arun_qa(self, question: str, vector=None, context: str = ""):
+        if vector is None and not context:
+            return await self.qa_chain.arun(question)
+        output_key = self.qa_chain.combine_documents_chain.output_key
+        return (await self._qa(vector, context).ainvoke({"question": question}))[output_key]
+
+    def _cached(self, namespace: str, question: str, compute):
+        """Answer from the cache, or ``compute(vector)`` with the question vector the lookup embedded."""
+        answer, vector = self.answer_cache.lookup(namespace, self.answer_key, question, self._cache_embeddings())
+        if answer is not None:
+            return answer
+        complete = self._ingest_complete()
+        start = time.perf_counter()
+        answer = compute(vector)
+        if complete:
+            self.answer_cache.store(namespace, self.answer_key, question, answer, time.perf_counter() - start, vector)
+        return answer
+
+    def _answer_from_pdf(self, question: str, context: str = ""):
+        return self._cached("qa", question, lambda vector: self._run_qa(question, vector, context))
+
+    async def _acached(self, namespace: str, question: str, compute):
+        # Semantic lookups embed the question, so keep cache I/O off the event loop
+        answer, vector = await asyncio.to_thread(
+            self.answer_cache.lookup, namespace, self.answer_key, question, self._cache_embeddings()
+        )
+        if answer is not None:
+            return answer
+        complete = self._ingest_complete()
+        start = time.perf_counter()
+        answer = await compute(vector)
+        if complete:
+            await asyncio.to_thread(
+                self.answer_cache.store, namespace, self.answer_key, question, answer, time.perf_counter() - start, vector
+            )
+        return answer
+
+    async def _aanswer_from_pdf(self, question: str, context: str = ""):
+        return await self._acached("qa", question, lambda vector: self._arun_qa(question, vector, context))
+
+    def ask(self, question: str, context: str = ""):
+        """Answer ``question``; ``context`` is earlier conversation for the LLM prompt.
+
+        Retrieval, the answer cache and the auto mode choice see only the
+        question itself.
+        """
         print("Asking:", question)
-        result = self.agent.run(question)
+        if resolve_mode(self.mode, question) == "direct":
+            # One RetrievalQA call instead of the ReAct loop around it
+            result = self._answer_from_pdf(question, context)
+        else:
+            result = self._cached("agent", question, lambda vector: self.agent.run(with_context(question, context)))
         print("Result:", result)
         return result
 
+    def stream(self, question: str, context: str = ""):
+        # Yields "step"/"token" events, then a "final" event with ttft/total timings
+        print("Streaming:", question)
+        direct = resolve_mode(self.mode, question) == "direct"
+        namespace = "qa" if direct else "agent"
+        start = time.perf_counter()
+        answer, vector = self.answer_cache.lookup(namespace, self.answer_key, question, self._cache_embeddings())
+        if answer is not None:
+            elapsed = time.perf_counter() - start
+            yield {"type": "final", "text": answer, "ttft": elapsed, "total": elapsed, "cached": True}
+            return
+        complete = self._ingest_complete()
+        if direct:
+            yield {"type": "step", "text": "Searching the PDF (direct)"}
+            if vector is None and not context:
+                events = stream_agent(self.qa_chain, {"query": question}, output_key="result", marker=None)
+            else:
+                events = stream_agent(
+                    self._qa(vector, context),
+                    {"question": question},
+                    output_key=self.qa_chain.combine_documents_chain.output_key,
+                    marker=None,
+                )
+        else:
+            events = stream_agent(self.agent, {"input": with_context(question, context)})
+        for event in events:
+            if event["type"] == "final" and complete:
+                self.answer_cache.store(namespace, self.answer_key, question, event["text"], event["total"], vector)
+            yield event
 
+    async def aask(self, question: str, context: str = ""):
+        print("Asking:", question)
+        if resolve_mode(self.mode, question) == "direct":
+            result = await self._aanswer_from_pdf(question, context)
+        else:
+            result = await self._acached("agent", question, lambda vector: self.agent.arun(with_context(question, context)))
+        print("Result:", result)
+        return result
+
+
+    def _prepare_batch(self, questions, k: int):
+        """Cache lookups, one embedding batch and bulk retrieval for ask_many."""
+        start = time.perf_counter()
+        answer_key = self._batch_answer_key(k)
+        complete = self._ingest_complete()
+        results = [None] * len(questions)
+        groups = {}
+        for i, question in enumerate(questions):
+            groups.setdefault(normalize_question(question), []).append(i)
+        texts = list(groups)
+        with get_metrics().timer("embed", "queries"):
+            vectors = embed_queries(self.embeddings, texts)
+
+        misses = []
+        for text, vector in zip(texts, vectors):
+            question = questions[groups[text][0]]
+            answer, _ = self.answer_cache.lookup(
+                "qa", answer_key, question, vector=vector if self.semantic_cache else None
+            )
+            if answer is None:
+                misses.append((text, question, vector))
+                continue
+            for i in groups[text]:
+                results[i] = {"question": questions[i], "answer": answer, "cached": True, "seconds": time.perf_counter() - start}
+
+        retrieved = []
+        if misses:
+            with get_metrics().timer("retrieval", "batch"):
+                retrieved = self._search_by_vectors(
+                    [question for _, question, _ in misses], [vector for _, _, vector in misses], k
+                )
+        # Questions that retrieve the same chunk share one Document instead of a copy each
+        chunks = {}
+        jobs = []
+        for (text, question, vector), docs in zip(misses, retrieved):
+            unique = {}
+            for doc in docs:
+                doc_key = doc.id or doc.metadata.get("_id") or (doc.metadata.get("page"), doc.page_content)
+                unique.setdefault(doc_key, chunks.setdefault(doc_key, doc))
+            jobs.append((text, question, vector, list(unique.values())))
+        self.batch_stats = {
+            "questions": len(questions),
+            "unique_questions": len(texts),
+            "cached": len(texts) - len(misses),
+            "retrieved_chunks": sum(len(docs) for docs in retrieved),
+            "unique_chunks": len(chunks),
+            "ingest_complete": complete,
+            "k": k or self._retriever_k(),
+        }
+        return start, groups, results, jobs
+
+    def _batch_inputs(self, jobs):
+        return [{"input_documents": docs, "question": question} for _, question, _, docs in jobs]
+
+    def _timed_chain(self):
+        # Stamp each answer as it finishes, for per-question timings out of batch()
+        return self.qa_chain.combine_documents_chain | RunnableLambda(lambda output: (output, time.perf_counter()))
+
+    def _finish_batch(self, questions, start, groups, results, jobs, outputs):
+        output_key = self.qa_chain.combine_documents_chain.output_key
+        stored = []
+        for (text, question, vector, docs), (output, finished) in zip(jobs, outputs):
+            answer = output[output_key]
+            seconds = finished - start
+            stored.append((question, answer, seconds, vector))
+            for i in groups[text]:
+                results[i] = {
+                    "question": questions[i],
+                    "answer": answer,
+                    "cached": False,
+                    "seconds": seconds,
+                    "sources": len(docs),
+                }
+        if stored and self.batch_stats["ingest_complete"]:
+            self.answer_cache.store_many("qa", self._batch_answer_key(self.batch_stats["k"]), stored)
+        self.batch_stats["seconds"] = time.perf_counter() - start
+        return results
+
+    def ask_many(self, questions, max_concurrency: int = 4, k: int = None):
+        """Answer a list of questions about this PDF, in order.
+
+        All questions are embedded in one request and retrieved in bulk;
+        repeated questions and overlapping chunks are shared, and answers are
+        generated with ``batch`` on up to ``max_concurrency`` LLM calls at
+        once. Each result has the answer, whether it came from the answer
+        cache, and ``seconds`` from the start of the batch until it was ready.
+        Questions are answered directly with RetrievalQA, never the ReAct loop.
+        ``k`` chunks go into each prompt, the retriever's own number by
+        default; for hybrid or budgeted retrieval they are the best k after
+        fusion or packing.
+        """
+        questions = list(questions)
+        start, groups, results, jobs = self._prepare_batch(questions, k)
+        outputs = (
+            self._timed_chain().batch(self._batch_inputs(jobs), config={"max_concurrency": max_concurrency})
+            if jobs
+            else []
+        )
+        return self._finish_batch(questions, start, groups, results, jobs, outputs)
+
+    async def aask_many(self, questions, max_concurrency: int = 4, k: int = None):
+        questions = list(questions)
+        start, groups, results, jobs = await asyncio.to_thread(self._prepare_batch, questions, k)
+        outputs = (
+            await self._timed_chain().abatch(self._batch_inputs(jobs), config={"max_concurrency": max_concurrency})
+            if jobs
+            else []
+        )
+        return await asyncio.to_thread(self._finish_batch, questions, start, groups, results, jobs, outputs)
 
 if __name__ == "__main__":
     print("Starting PDF Agent...")
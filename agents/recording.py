@@ -0,0 +1,224 @@
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Any, List, Optional
+
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+from agents.answer_cache import _decode_vector, _encode_vector
+from agents.backends import embed_queries
+from agents.weather_cache import normalize_location
+
+RECORDING_MODES = ("record", "replay")
+
+
+class CassetteMiss(KeyError):
+    """Replay found no recorded response for a request."""
+
+
+class Cassette:
+    """Append-only JSONL file of recorded responses keyed on a request hash.
+
+    Recording appends one line per new request, so an interrupted run keeps
+    everything captured so far. Later lines win when a key repeats.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._entries = {}
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self._entries[entry["key"]] = entry
+
+    @staticmethod
+    def key(*parts) -> str:
+        raw = json.dumps(parts, sort_keys=True, default=str)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key: str):
+        with self._lock:
+            return self._entries.get(key)
+
+    def put(self, key: str, value, seconds: float, **info):
+        entry = {"key": key, "value": value, "seconds": seconds, **info}
+        line = json.dumps(entry, sort_keys=True, separators=(",", ":"))
+        with self._lock:
+            self._entries[key] = entry
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+
+    def replay(self, key: str, what: str, replay_latency: bool = False):
+        entry = self.get(key)
+        if entry is None:
+            raise CassetteMiss(
+                f"No recorded {what} in {self.path}; re-record with AGENT_BACKENDS=record"
+            )
+        if replay_latency:
+            time.sleep(entry["seconds"])
+        return entry["value"]
+
+    async def areplay(self, key: str, what: str, replay_latency: bool = False):
+        entry = self.get(key)
+        if entry is None:
+            raise CassetteMiss(
+                f"No recorded {what} in {self.path}; re-record with AGENT_BACKENDS=record"
+            )
+        if replay_latency:
+            await asyncio.sleep(entry["seconds"])
+        return entry["value"]
+
+
+def _check_mode(mode: str) -> str:
+    if mode not in RECORDING_MODES:
+        raise ValueError(f"Unknown recording mode {mode!r}; expected one of {RECORDING_MODES}")
+    return mode
+
+
+class RecordingChatModel(BaseChatModel):
+    """Chat model that records another model's replies, or replays them offline.
+
+    Requests are keyed on the messages and stop words. Replay raises
+    CassetteMiss for anything not recorded; with ``replay_latency`` it also
+    waits as long as the recorded call took.
+    """
+
+    cassette: Any
+    inner: Any = None
+    mode: str = "replay"
+    replay_latency: bool = False
+
+    @property
+    def _llm_type(self) -> str:
+        return f"{self.mode}-chat"
+
+    def _key(self, messages, stop) -> str:
+        return Cassette.key("chat", [(m.type, m.content) for m in messages], stop)
+
+    def _result(self, text: str) -> ChatResult:
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=text))])
+
+    def _generate(self, messages, stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> ChatResult:
+        key = self._key(messages, stop)
+        if _check_mode(self.mode) == "replay":
+            return self._result(self.cassette.replay(key, "LLM reply", self.replay_latency))
+        start = time.perf_counter()
+        text = self.inner.invoke(messages, stop=stop).content
+        self.cassette.put(key, text, time.perf_counter() - start)
+        return self._result(text)
+
+    async def _agenerate(self, messages, stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> ChatResult:
+        key = self._key(messages, stop)
+        if _check_mode(self.mode) == "replay":
+            return self._result(await self.cassette.areplay(key, "LLM reply", self.replay_latency))
+        start = time.perf_counter()
+        text = (await self.inner.ainvoke(messages, stop=stop)).content
+        self.cassette.put(key, text, time.perf_counter() - start)
+        return self._result(text)
+
+
+class RecordingEmbeddings(Embeddings):
+    """Embeddings recorded per text from another model, or replayed offline.
+
+    ``embed_queries`` records each text as the ``embed_query`` call it
+    stands for, so batched and single query lookups share recordings.
+    """
+
+    def __init__(
+        self,
+        cassette: Cassette,
+        inner=None,
+        mode: str = "replay",
+        model: str = "",
+        replay_latency: bool = False,
+    ):
+        self.cassette = cassette
+        self.inner = inner
+        self.mode = _check_mode(mode)
+        self.model = model
+        self.replay_latency = replay_latency
+
+    def _key(self, kind: str, text: str, kwargs) -> str:
+        return Cassette.key(kind, self.model, text, kwargs)
+
+    def embed_documents(self, texts, **kwargs):
+        keys = [self._key("documents", text, kwargs) for text in texts]
+        if self.mode == "record":
+            missing = [i for i, key in enumerate(keys) if self.cassette.get(key) is None]
+            if missing:
+                start = time.perf_counter()
+                vectors = self.inner.embed_documents([texts[i] for i in missing], **kwargs)
+                seconds = time.perf_counter() - start
+                for i, vector in zip(missing, vectors):
+                    self.cassette.put(keys[i], _encode_vector(vector), seconds)
+        vectors = [_decode_vector(self.cassette.replay(key, "embedding")).tolist() for key in keys]
+        if self.mode == "replay" and self.replay_latency and keys:
+            # One wait for the batch, as long as the slowest recorded request it was part of
+            time.sleep(max(self.cassette.get(key)["seconds"] for key in keys))
+        return vectors
+
+    def embed_queries(self, texts):
+        keys = [self._key("query", text, {}) for text in texts]
+        if self.mode == "record":
+            missing = [i for i, key in enumerate(keys) if self.cassette.get(key) is None]
+            if missing:
+                start = time.perf_counter()
+                vectors = embed_queries(self.inner, [texts[i] for i in missing])
+                seconds = time.perf_counter() - start
+                for i, vector in zip(missing, vectors):
+                    self.cassette.put(keys[i], _encode_vector(vector), seconds)
+        vectors = [_decode_vector(self.cassette.replay(key, "query embedding")).tolist() for key in keys]
+        if self.mode == "replay" and self.replay_latency and keys:
+            time.sleep(max(self.cassette.get(key)["seconds"] for key in keys))
+        return vectors
+
+    def embed_query(self, text, **kwargs):
+        key = self._key("query", text, kwargs)
+        if self.mode == "record" and self.cassette.get(key) is None:
+            start = time.perf_counter()
+            vector = self.inner.embed_query(text, **kwargs)
+            self.cassette.put(key, _encode_vector(vector), time.perf_counter() - start)
+        replay_latency = self.replay_latency and self.mode == "replay"
+        return _decode_vector(self.cassette.replay(key, "query embedding", replay_latency)).tolist()
+
+
+class RecordingWeather:
+    """Weather lookups (``run``/``arun``) recorded from the live API, or replayed offline."""
+
+    def __init__(self, cassette: Cassette, inner=None, ainner=None, mode: str = "replay", replay_latency: bool = False):
+        self.cassette = cassette
+        self.inner = inner
+        self.ainner = ainner
+        self.mode = _check_mode(mode)
+        self.replay_latency = replay_latency
+
+    def run(self, location: str) -> str:
+        key = Cassette.key("weather", normalize_location(location))
+        if self.mode == "replay":
+            return self.cassette.replay(key, f"weather for {location!r}", self.replay_latency)
+        start = time.perf_counter()
+        report = self.inner.run(location)
+        self.cassette.put(key, report, time.perf_counter() - start, location=location)
+        return report
+
+    async def arun(self, location: str) -> str:
+        key = Cassette.key("weather", normalize_location(location))
+        if self.mode == "replay":
+            return await self.cassette.areplay(key, f"weather for {location!r}", self.replay_latency)
+        start = time.perf_counter()
+        report = await self.ainner.arun(location)
+        self.cassette.put(key, report, time.perf_counter() - start, location=location)
+        return report
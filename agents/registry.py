@@ -0,0 +1,146 @@
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from agents.ingest_cache import content_sha256, read_source
+from agents.metrics import get_metrics
+
+
+class AgentRegistry:
+    """Process-wide pool of warm agents.
+
+    Agents are built once per key and handed out to every caller (Streamlit
+    sessions, graph nodes, drivers). Entries are evicted least-recently-used
+    once ``max_agents`` is exceeded, or when idle for longer than
+    ``ttl_seconds``.
+    """
+
+    def __init__(self, max_agents: int = 8, ttl_seconds: float = 30 * 60, clock=time.monotonic):
+        self.max_agents = max_agents
+        self.ttl_seconds = ttl_seconds
+        self._clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._build_locks = {}
+        self._stats = {
+            "hits": 0,
+            "misses": 0,
+            "coalesced": 0,
+            "builds": 0,
+            "build_errors": 0,
+            "evictions": 0,
+            "build_seconds_total": 0.0,
+            "build_seconds_max": 0.0,
+        }
+
+    def get(self, key, factory):
+        with self._lock:
+            self._evict_expired()
+            agent = self._touch(key)
+            if agent is not None:
+                self._count("hits")
+                return agent
+            build_lock = self._build_locks.setdefault(key, threading.Lock())
+
+        # Build outside the registry lock so one slow ingestion does not block
+        # other agent types; the per-key lock stops duplicate builds.
+        with build_lock:
+            with self._lock:
+                agent = self._touch(key)
+                if agent is not None:
+                    # Another caller finished building it while we waited
+                    self._count("coalesced")
+                    return agent
+                # Each lookup is counted once: a hit, a miss (this caller builds) or coalesced
+                self._count("misses")
+            start = time.perf_counter()
+            try:
+                agent = factory()
+            except Exception:
+                with self._lock:
+                    self._stats["build_errors"] += 1
+                    self._build_locks.pop(key, None)
+                raise
+            seconds = time.perf_counter() - start
+            with self._lock:
+                self._stats["builds"] += 1
+                self._stats["build_seconds_total"] += seconds
+                self._stats["build_seconds_max"] = max(self._stats["build_seconds_max"], seconds)
+                self._entries[key] = [agent, self._clock()]
+                self._entries.move_to_end(key)
+                self._build_locks.pop(key, None)
+                while len(self._entries) > self.max_agents:
+                    self._entries.popitem(last=False)
+                    self._stats["evictions"] += 1
+            get_metrics().observe("agent_build", seconds, key[0])
+            print(f"Built agent {key[0]} in {seconds:.3f}s")
+            return agent
+
+    def get_pdf_agent(self, pdf_path, **kwargs):
+        from agents.pdf_agent import PDFAgent
+
+        # A path or an in-memory PDF (read once, then shared); either way the content hash is the key
+        pdf_path = read_source(pdf_path)
+        key = ("pdf", content_sha256(pdf_path), tuple(sorted(kwargs.items())))
+        return self.get(key, lambda: PDFAgent(pdf_path=pdf_path, **kwargs))
+
+    def get_corpus_agent(self, doc_ids=None, corpus: str = None, **kwargs):
+        from agents.pdf_agent import PDFAgent
+
+        # Scoped to doc_ids of the shared corpus (all of it when None); nothing is ingested
+        scope = tuple(sorted(doc_ids)) if doc_ids else None
+        key = ("pdf_corpus", corpus, scope, tuple(sorted(kwargs.items())))
+        return self.get(key, lambda: PDFAgent(corpus=corpus or os.getenv("PDF_CORPUS", "corpus"), doc_ids=scope, **kwargs))
+
+    def get_weather_agent(self):
+        from agents.weather_agent import WeatherAgent
+
+        return self.get(("weather",), WeatherAgent)
+
+    def _count(self, result: str):
+        # Caller holds the lock
+        self._stats[result] += 1
+        get_metrics().incr("cache_lookups", cache="agent_registry", result=result)
+
+    def _touch(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        entry[1] = self._clock()
+        self._entries.move_to_end(key)
+        return entry[0]
+
+    def _evict_expired(self):
+        if self.ttl_seconds is None:
+            return
+        now = self._clock()
+        expired = [key for key, (_, last_used) in self._entries.items() if now - last_used > self.ttl_seconds]
+        for key in expired:
+            del self._entries[key]
+            self._stats["evictions"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["size"] = len(self._entries)
+            lookups = stats["hits"] + stats["misses"] + stats["coalesced"]
+            stats["hit_rate"] = (stats["hits"] + stats["coalesced"]) / lookups if lookups else 0.0
+            stats["build_seconds_avg"] = stats["build_seconds_total"] / stats["builds"] if stats["builds"] else 0.0
+            return stats
+
+
+_registry = AgentRegistry(
+    max_agents=int(os.getenv("AGENT_REGISTRY_MAX", "8")),
+    ttl_seconds=float(os.getenv("AGENT_REGISTRY_TTL", str(30 * 60))),
+)
+
+
+def get_registry() -> AgentRegistry:
+    return _registry
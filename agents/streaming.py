@@ -0,0 +1,100 @@
+import queue
+import threading
+import time
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+FINAL_ANSWER_MARKER = "Final Answer:"
+
+
+class AgentStreamHandler(BaseCallbackHandler):
+    """Turns AgentExecutor callbacks into stream events on a queue.
+
+    Events are dicts with a ``type`` of "step" (tool calls and observations)
+    or "token" (final-answer text as the LLM produces it). ReAct output only
+    becomes the answer after "Final Answer:", so each LLM run's tokens are
+    buffered until that marker shows up. With ``marker=None`` (a plain chain
+    whose LLM output is the answer) every token is emitted as it arrives.
+    """
+
+    def __init__(self, events: queue.Queue, marker: str = FINAL_ANSWER_MARKER):
+        self.events = events
+        self.marker = marker
+        self._buffers = {}
+        self._emitted = {}
+
+    def on_llm_start(self, serialized, prompts, *, run_id, **kwargs):
+        self._buffers[run_id] = ""
+        self._emitted[run_id] = 0
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        self.on_llm_start(serialized, [], run_id=run_id, **kwargs)
+
+    def on_llm_new_token(self, token, *, run_id, **kwargs):
+        if self.marker is None:
+            if token:
+                self.events.put({"type": "token", "text": token})
+            return
+        buffer = self._buffers.get(run_id, "") + token
+        self._buffers[run_id] = buffer
+        marker = buffer.find(self.marker)
+        if marker < 0:
+            return
+        start = max(marker + len(self.marker), self._emitted[run_id])
+        text = buffer[start:]
+        if self._emitted[run_id] == 0:
+            text = text.lstrip()
+        if text:
+            self._emitted[run_id] = len(buffer)
+            self.events.put({"type": "token", "text": text})
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        self._buffers.pop(run_id, None)
+        self._emitted.pop(run_id, None)
+
+    def on_agent_action(self, action, **kwargs):
+        self.events.put({"type": "step", "text": f"Calling {action.tool} with: {action.tool_input}"})
+
+    def on_tool_end(self, output, **kwargs):
+        self.events.put({"type": "step", "text": f"Observation: {str(output)[:500]}"})
+
+
+def stream_agent(executor, inputs: dict, output_key: str = "output", marker: str = FINAL_ANSWER_MARKER):
+    """Run an AgentExecutor (or any chain) in a worker thread and yield its events live.
+
+    Yields "step" and "token" events while the agent runs, then one "final"
+    event carrying the full answer together with ``ttft`` (seconds to the
+    first answer token, or to the answer if the model did not stream) and
+    ``total`` seconds. ``output_key`` and ``marker`` adapt it to chains
+    such as RetrievalQA ("result", no marker).
+    """
+    events = queue.Queue()
+    handler = AgentStreamHandler(events, marker)
+    done = object()
+
+    def worker():
+        try:
+            result = executor.invoke(inputs, config={"callbacks": [handler]})
+            events.put({"type": "final", "text": result[output_key]})
+        except Exception as e:
+            events.put({"type": "error", "error": e})
+        finally:
+            events.put(done)
+
+    start = time.perf_counter()
+    threading.Thread(target=worker, name="agent-stream", daemon=True).start()
+    ttft = None
+    while True:
+        event = events.get()
+        if event is done:
+            return
+        if event["type"] == "error":
+            raise event["error"]
+        now = time.perf_counter() - start
+        if ttft is None and event["type"] in ("token", "final"):
+            ttft = now
+        if event["type"] == "final":
+            event["ttft"] = ttft
+            event["total"] = now
+        yield event
+
@@ -0,0 +1,563 @@
+import base64
+import contextlib
+import json
+import os
+import shutil
+import threading
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.vectorstores import VectorStore
+
+CACHE_DIR = os.getenv("AGENT_CACHE_DIR", ".cache")
+
+
+class NumpyVectorStore(VectorStore):
+    """In-process vector index backed by one normalized float32 matrix.
+
+    Search is a single matrix-vector product plus ``argpartition`` for the
+    top k. On disk there is a snapshot, the matrix as ``.npy`` next to a
+    JSON sidecar, plus a journal: ``save`` appends only the rows added and
+    the ids deleted since the last save, and rewrites the snapshot once the
+    journal outgrows it, so persisting one document of a large corpus costs
+    that document, amortized. Reopening memory-maps the matrix and replays
+    the journal, so a large index costs page cache rather than heap until
+    it is written to again. Deletes move the last rows into the freed ones
+    instead of copying the matrix. Metadata fields in ``indexed_fields``
+    are indexed, so a filter on them (e.g. one document of a corpus) only
+    scores that document's rows.
+    """
+
+    def __init__(self, embedding=None, path: str = None, indexed_fields=("doc_id",)):
+        self.embedding = embedding
+        self.path = path
+        self.indexed_fields = tuple(indexed_fields)
+        self._lock = threading.RLock()
+        self._ids = []
+        self._texts = []
+        self._metadatas = []
+        self._positions = {}
+        self._field_rows = {field: {} for field in self.indexed_fields}
+        self._matrix = np.zeros((0, 0), dtype=np.float32)
+        self._size = 0
+        # Journal records not yet saved, and the rows/lines already on disk
+        self._pending = []
+        self._snapshot_rows = 0
+        self._journal_lines = 0
+        if path and os.path.exists(os.path.join(path, "vectors.npy")):
+            self._load()
+
+    @property
+    def embeddings(self):
+        return self.embedding
+
+    def __len__(self):
+        return self._size
+
+    def _load(self):
+        with open(os.path.join(self.path, "meta.json"), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        self._ids, self._texts, self._metadatas = meta["ids"], meta["texts"], meta["metadatas"]
+        self._positions = {point_id: i for i, point_id in enumerate(self._ids)}
+        self._matrix = np.load(os.path.join(self.path, "vectors.npy"), mmap_mode="r")
+        self._size = self._snapshot_rows = len(self._ids)
+        self._reindex()
+        journal = os.path.join(self.path, "journal.jsonl")
+        if not os.path.exists(journal):
+            return
+        with open(journal, "r", encoding="utf-8") as f:
+            lines = f.readlines()
+        for line in lines:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # A torn last line from an interrupted append
+                continue
+            if record["op"] == "add":
+                vector = np.frombuffer(base64.b64decode(record["vector"]), dtype=np.float32)
+                self._add_rows(vector[None, :], [record["text"]], [record["metadata"]], [record["id"]])
+            else:
+                self._drop_rows([self._positions[i] for i in record["ids"] if i in self._positions])
+        self._journal_lines = len(lines)
+
+    def _index_row(self, row: int, metadata: dict, remove: bool = False):
+        for field, rows_by_value in self._field_rows.items():
+            value = metadata.get(field)
+            if value is None:
+                continue
+            if remove:
+                rows_by_value.get(value, set()).discard(row)
+            else:
+                rows_by_value.setdefault(value, set()).add(row)
+
+    def _reindex(self):
+        self._field_rows = {field: {} for field in self.indexed_fields}
+        for row, metadata in enumerate(self._metadatas):
+            self._index_row(row, metadata)
+
+    def _candidate_rows(self, conditions: dict):
+        """Rows that can match ``conditions`` according to the field index, or None for all rows."""
+        rows = None
+        for field, expected in conditions.items():
+            if field not in self._field_rows:
+                continue
+            values = expected if isinstance(expected, (list, tuple, set)) else [expected]
+            matched = set()
+            for value in values:
+                matched |= self._field_rows[field].get(value, set())
+            rows = matched if rows is None else rows & matched
+        return None if rows is None else np.fromiter(sorted(rows), dtype=np.int64, count=len(rows))
+
+    def save(self):
+        """Persist the changes since the last save: append them, or rewrite the snapshot if due."""
+        if not self.path:
+            self._pending = []
+            return
+        with self._lock:
+            pending, self._pending = self._pending, []
+            if not pending:
+                return
+            os.makedirs(self.path, exist_ok=True)
+            journal = os.path.join(self.path, "journal.jsonl")
+            # Rewriting costs the whole index, so only once the journal holds more records than the snapshot rows
+            if self._journal_lines + len(pending) <= self._snapshot_rows:
+                with open(journal, "a", encoding="utf-8") as f:
+                    f.writelines(json.dumps(record) + "\n" for record in pending)
+                self._journal_lines += len(pending)
+                return
+            # Write to temp names first; the matrix may be memory-mapped from the old file
+            np.save(os.path.join(self.path, "vectors.tmp.npy"), np.asarray(self._matrix[: self._size]))
+            with open(os.path.join(self.path, "meta.tmp.json"), "w", encoding="utf-8") as f:
+                json.dump({"ids": self._ids, "texts": self._texts, "metadatas": self._metadatas}, f)
+            os.replace(os.path.join(self.path, "vectors.tmp.npy"), os.path.join(self.path, "vectors.npy"))
+            os.replace(os.path.join(self.path, "meta.tmp.json"), os.path.join(self.path, "meta.json"))
+            if os.path.exists(journal):
+                os.remove(journal)
+            self._snapshot_rows = self._size
+            self._journal_lines = 0
+
+    def _reserve(self, extra: int, dim: int):
+        # Grow geometrically so batched upserts stay amortized O(n)
+        capacity = self._matrix.shape[0]
+        if self._matrix.shape[1] not in (0, dim):
+            raise ValueError(f"Vector size {dim} does not match index size {self._matrix.shape[1]}")
+        if self._size + extra <= capacity and isinstance(self._matrix, np.ndarray) and self._matrix.flags.writeable:
+            return
+        new_capacity = max(self._size + extra, capacity * 2, 64)
+        matrix = np.zeros((new_capacity, dim), dtype=np.float32)
+        if self._size:
+            matrix[: self._size] = self._matrix[: self._size]
+        self._matrix = matrix
+
+    def add_vectors(self, vectors, texts, metadatas=None, ids=None):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        vectors = vectors / (np.linalg.norm(vectors, axis=1, keepdims=True) + 1e-12)
+        metadatas = metadatas or [{} for _ in texts]
+        ids = ids or [str(len(self._ids) + i) for i in range(len(texts))]
+        with self._lock:
+            self._add_rows(vectors, texts, metadatas, ids)
+            if self.path:
+                self._pending.extend(
+                    {
+                        "op": "add",
+                        "id": point_id,
+                        "text": text,
+                        "metadata": metadata,
+                        "vector": base64.b64encode(vector.tobytes()).decode("ascii"),
+                    }
+                    for point_id, vector, text, metadata in zip(ids, vectors, texts, metadatas)
+                )
+        return ids
+
+    def _add_rows(self, vectors, texts, metadatas, ids):
+        # Caller holds the lock (or is loading); vectors are normalized
+        self._reserve(len(texts), vectors.shape[1])
+        for point_id, vector, text, metadata in zip(ids, vectors, texts, metadatas):
+            row = self._positions.get(point_id)
+            if row is None:
+                row = self._size
+                self._size += 1
+                self._positions[point_id] = row
+                self._ids.append(point_id)
+                self._texts.append(text)
+                self._metadatas.append(metadata)
+            else:
+                self._index_row(row, self._metadatas[row], remove=True)
+                self._texts[row] = text
+                self._metadatas[row] = metadata
+            self._index_row(row, metadata)
+            self._matrix[row] = vector
+
+    def add_texts(self, texts, metadatas=None, ids=None, **kwargs):
+        texts = list(texts)
+        return self.add_vectors(self.embedding.embed_documents(texts), texts, metadatas, ids)
+
+    def delete(self, ids=None, where=None, filter=None, **kwargs):
+        """Delete by ``ids``, a ``where(metadata) -> bool`` predicate or a metadata ``filter`` dict."""
+        with self._lock:
+            drop = set(self._positions[i] for i in (ids or []) if i in self._positions)
+            if where is not None:
+                drop.update(row for row in range(self._size) if where(self._metadatas[row]))
+            if filter:
+                rows = self._candidate_rows(filter)
+                rows = range(self._size) if rows is None else rows.tolist()
+                drop.update(row for row in rows if metadata_matches(self._metadatas[row], filter))
+            if not drop:
+                return False
+            if self.path:
+                self._pending.append({"op": "delete", "ids": [self._ids[row] for row in drop]})
+            self._drop_rows(drop)
+            return True
+
+    def _drop_rows(self, rows):
+        """Remove ``rows`` by moving the last rows into their place: O(rows), not O(index)."""
+        if not rows:
+            return
+        self._reserve(0, self._matrix.shape[1])
+        for row in sorted(rows, reverse=True):
+            last = self._size - 1
+            self._index_row(row, self._metadatas[row], remove=True)
+            del self._positions[self._ids[row]]
+            if row != last:
+                self._index_row(last, self._metadatas[last], remove=True)
+                self._matrix[row] = self._matrix[last]
+                self._ids[row], self._texts[row], self._metadatas[row] = self._ids[last], self._texts[last], self._metadatas[last]
+                self._positions[self._ids[row]] = row
+                self._index_row(row, self._metadatas[row])
+            self._ids.pop()
+            self._texts.pop()
+            self._metadatas.pop()
+            self._size -= 1
+
+    def similarity_search_with_score_by_vector(self, embedding, k: int = 4, filter=None, **kwargs):
+        with self._lock:
+            if self._size == 0:
+                return []
+            query = np.asarray(embedding, dtype=np.float32)
+            query = query / (np.linalg.norm(query) + 1e-12)
+            # filter: dict of metadata equality constraints (a list value means "any of")
+            rows = self._candidate_rows(filter) if filter else None
+            if rows is None:
+                rows = np.arange(self._size)
+                scores = self._matrix[: self._size] @ query
+            else:
+                # Indexed fields narrow the search to their rows, however large the store
+                scores = self._matrix[rows] @ query
+            if filter:
+                mask = np.array([metadata_matches(self._metadatas[row], filter) for row in rows], dtype=bool)
+                scores = np.where(mask, scores, -np.inf)
+            if not len(rows):
+                return []
+            k = min(k, len(rows))
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+            return [
+                (Document(page_content=self._texts[row], metadata=self._metadatas[row], id=self._ids[row]), float(scores[i]))
+                for i, row in zip(top, rows[top])
+                if np.isfinite(scores[i])
+            ]
+
+    def similarity_search_by_vector(self, embedding, k: int = 4, **kwargs):
+        return [doc for doc, _ in self.similarity_search_with_score_by_vector(embedding, k, **kwargs)]
+
+    def similarity_search_by_vectors(self, embeddings, k: int = 4, filter=None):
+        """Top ``k`` documents for each query vector, from one matrix product."""
+        if filter:
+            return [self.similarity_search_by_vector(vector, k, filter=filter) for vector in embeddings]
+        with self._lock:
+            if self._size == 0:
+                return [[] for _ in embeddings]
+            queries = np.asarray(embeddings, dtype=np.float32)
+            queries = queries / (np.linalg.norm(queries, axis=1, keepdims=True) + 1e-12)
+            scores = queries @ self._matrix[: self._size].T
+            k = min(k, self._size)
+            top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+            results = []
+            for row_scores, rows in zip(scores, top):
+                rows = rows[np.argsort(-row_scores[rows])]
+                results.append(
+                    [Document(page_content=self._texts[r], metadata=self._metadatas[r], id=self._ids[r]) for r in rows]
+                )
+            return results
+
+    def similarity_search_with_score(self, query: str, k: int = 4, **kwargs):
+        return self.similarity_search_with_score_by_vector(self.embedding.embed_query(query), k, **kwargs)
+
+    def similarity_search(self, query: str, k: int = 4, **kwargs):
+        return [doc for doc, _ in self.similarity_search_with_score(query, k, **kwargs)]
+
+    def _select_relevance_score_fn(self):
+        return lambda score: (score + 1.0) / 2.0
+
+    @classmethod
+    def from_texts(cls, texts, embedding, metadatas=None, ids=None, path: str = None, **kwargs):
+        store = cls(embedding=embedding, path=path)
+        store.add_texts(texts, metadatas=metadatas, ids=ids)
+        store.save()
+        return store
+
+
+def metadata_matches(metadata: dict, conditions: dict) -> bool:
+    for key, expected in conditions.items():
+        value = metadata.get(key)
+        if isinstance(expected, (list, tuple, set)):
+            if value not in expected:
+                return False
+        elif value != expected:
+            return False
+    return True
+
+
+def search_many(store, vectors, k: int = 4, filter=None):
+    """Run one top-``k`` search per query vector in as few round trips as the store allows.
+
+    ``filter`` is in the store's native form (see the backends' ``filter``).
+    """
+    if isinstance(store, NumpyVectorStore):
+        return store.similarity_search_by_vectors(vectors, k, filter=filter)
+    from langchain_qdrant import QdrantVectorStore
+    from qdrant_client import models
+
+    if isinstance(store, QdrantVectorStore):
+        responses = store.client.query_batch_points(
+            store.collection_name,
+            requests=[
+                models.QueryRequest(
+                    query=list(vector), using=store.vector_name or None, filter=filter, limit=k, with_payload=True
+                )
+                for vector in vectors
+            ],
+        )
+        return [
+            [
+                QdrantVectorStore._document_from_point(
+                    point, store.collection_name, store.content_payload_key, store.metadata_payload_key
+                )
+                for point in response.points
+            ]
+            for response in responses
+        ]
+    kwargs = {"filter": filter} if filter is not None else {}
+    return [store.similarity_search_by_vector(vector, k=k, **kwargs) for vector in vectors]
+
+
+class QdrantSink:
+    """Write side of a Qdrant collection, as used by StreamingIngestor.
+
+    Embedded (local) Qdrant is not safe for concurrent writes, so ``local``
+    sinks upsert one batch at a time; embedding still runs concurrently.
+    """
+
+    def __init__(self, client, collection_name: str, local: bool = False):
+        self.client = client
+        self.collection_name = collection_name
+        self.local = local
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock() if local else None
+        self._ready = False
+
+    def ensure(self, size: int):
+        from qdrant_client import models
+
+        with self._lock:
+            if self._ready:
+                return
+            if not self.client.collection_exists(self.collection_name):
+                self.client.create_collection(
+                    self.collection_name,
+                    vectors_config=models.VectorParams(size=size, distance=models.Distance.COSINE),
+                )
+                if not self.local:
+                    # Page-filtered deletes and per-document (corpus) search; local mode has no payload indexes
+                    self.client.create_payload_index(
+                        self.collection_name,
+                        field_name="metadata.page",
+                        field_schema=models.PayloadSchemaType.INTEGER,
+                    )
+                    self.client.create_payload_index(
+                        self.collection_name,
+                        field_name="metadata.doc_id",
+                        field_schema=models.PayloadSchemaType.KEYWORD,
+                    )
+            self._ready = True
+
+    def upsert(self, ids, vectors, chunks):
+        if self._write_lock is None:
+            self._upsert(ids, vectors, chunks)
+            return
+        with self._write_lock:
+            self._upsert(ids, vectors, chunks)
+
+    def _upsert(self, ids, vectors, chunks):
+        from qdrant_client import models
+
+        self.client.upsert(
+            self.collection_name,
+            points=[
+                models.PointStruct(
+                    id=point_id,
+                    vector=vector,
+                    # Same payload layout QdrantVectorStore writes and reads
+                    payload={"page_content": chunk.page_content, "metadata": chunk.metadata},
+                )
+                for point_id, vector, chunk in zip(ids, vectors, chunks)
+            ],
+        )
+
+    def delete_pages(self, pages):
+        self._delete_where("page", list(pages))
+
+    def delete_documents(self, doc_ids):
+        self._delete_where("doc_id", list(doc_ids))
+
+    def _delete_where(self, field: str, values):
+        from qdrant_client import models
+
+        if not self.client.collection_exists(self.collection_name):
+            return
+        with self._write_lock or contextlib.nullcontext():
+            self.client.delete(
+                self.collection_name,
+                points_selector=models.FilterSelector(
+                    filter=models.Filter(
+                        must=[models.FieldCondition(key=f"metadata.{field}", match=models.MatchAny(any=values))]
+                    )
+                ),
+            )
+
+    def flush(self):
+        pass
+
+
+class NumpySink:
+    def __init__(self, store: NumpyVectorStore):
+        self.store = store
+
+    def ensure(self, size: int):
+        pass
+
+    def upsert(self, ids, vectors, chunks):
+        self.store.add_vectors(vectors, [c.page_content for c in chunks], [c.metadata for c in chunks], list(ids))
+
+    def delete_pages(self, pages):
+        pages = set(pages)
+        self.store.delete(where=lambda metadata: metadata.get("page") in pages)
+
+    def delete_documents(self, doc_ids):
+        self.store.delete(filter={"doc_id": list(doc_ids)})
+
+    def flush(self):
+        self.store.save()
+
+
+class QdrantBackend:
+    def __init__(self, client, local: bool = False):
+        self.client = client
+        self.local = local
+
+    def exists(self, collection_name: str) -> bool:
+        return self.client.collection_exists(collection_name)
+
+    def sink(self, collection_name: str):
+        return QdrantSink(self.client, collection_name, local=self.local)
+
+    def drop(self, collection_name: str):
+        if self.client.collection_exists(collection_name):
+            self.client.delete_collection(collection_name)
+
+    @staticmethod
+    def filter(conditions: dict):
+        """Qdrant filter for metadata equality ``conditions`` (a list value means "any of")."""
+        from qdrant_client import models
+
+        return models.Filter(
+            must=[
+                models.FieldCondition(
+                    key=f"metadata.{field}",
+                    match=models.MatchAny(any=list(value)) if isinstance(value, (list, tuple, set)) else models.MatchValue(value=value),
+                )
+                for field, value in conditions.items()
+            ]
+        )
+
+    def open_store(self, collection_name: str, embeddings):
+        from langchain_qdrant import QdrantVectorStore
+
+        return QdrantVectorStore(
+            client=self.client,
+            collection_name=collection_name,
+            embedding=embeddings,
+            validate_collection_config=False,
+        )
+
+
+class NumpyBackend:
+    def __init__(self, root: str):
+        self.root = root
+        self._stores = {}
+        self._lock = threading.Lock()
+
+    def _store(self, collection_name: str) -> NumpyVectorStore:
+        with self._lock:
+            store = self._stores.get(collection_name)
+            if store is None:
+                path = os.path.join(self.root, collection_name) if self.root != ":memory:" else None
+                store = self._stores[collection_name] = NumpyVectorStore(path=path)
+            return store
+
+    def exists(self, collection_name: str) -> bool:
+        return len(self._store(collection_name)) > 0
+
+    def sink(self, collection_name: str):
+        return NumpySink(self._store(collection_name))
+
+    def drop(self, collection_name: str):
+        with self._lock:
+            self._stores.pop(collection_name, None)
+            if self.root != ":memory:":
+                shutil.rmtree(os.path.join(self.root, collection_name), ignore_errors=True)
+
+    @staticmethod
+    def filter(conditions: dict):
+        return dict(conditions)
+
+    def open_store(self, collection_name: str, embeddings):
+        store = self._store(collection_name)
+        store.embedding = embeddings
+        return store
+
+
+VECTOR_BACKENDS = ("qdrant", "qdrant_local", "numpy")
+_backends = {}
+_backends_lock = threading.Lock()
+
+
+def get_vector_backend(name: str = "qdrant"):
+    """Return the shared backend instance for ``name``.
+
+    - "qdrant": the remote server at QDRANT_URL (the default).
+    - "qdrant_local": Qdrant's embedded mode, on disk at QDRANT_PATH
+      (default .cache/qdrant) or in memory when QDRANT_PATH=":memory:".
+    - "numpy": NumpyVectorStore indexes under NUMPY_INDEX_DIR (default
+      .cache/numpy_index), or in memory when set to ":memory:".
+    """
+    with _backends_lock:
+        backend = _backends.get(name)
+        if backend is not None:
+            return backend
+        if name in ("qdrant", "qdrant_local"):
+            # Only Qdrant users pay for importing its client
+            from qdrant_client import QdrantClient
+        if name == "qdrant":
+            backend = QdrantBackend(QdrantClient(url=os.getenv("QDRANT_URL"), api_key=os.getenv("QDRANT_API_KEY")))
+        elif name == "qdrant_local":
+            path = os.getenv("QDRANT_PATH", os.path.join(CACHE_DIR, "qdrant"))
+            # Embedded Qdrant locks its directory, so one client per process
+            client = QdrantClient(location=":memory:") if path == ":memory:" else QdrantClient(path=path)
+            backend = QdrantBackend(client, local=True)
+        elif name == "numpy":
+            backend = NumpyBackend(os.getenv("NUMPY_INDEX_DIR", os.path.join(CACHE_DIR, "numpy_index")))
+        else:
+            raise ValueError(f"Unknown vector backend {name!r}; expected one of {VECTOR_BACKENDS}")
+        _backends[name] = backend
+        return backend
@@ -1,58 +1,49 @@
 import os
 import sys
-from langchain_community.utilities import OpenWeatherMapAPIWrapper
-from dotenv import load_dotenv
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_groq import ChatGroq
+import time
 from langchain.agents import AgentType, Tool, initialize_agent
 
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from agents import load_environment
+from agents.backends import get_backends
+from agents.metrics import get_metrics
+from agents.modes import default_mode, resolve_mode, validate_mode, with_context
+from agents.streaming import stream_agent
+from agents.weather_cache import WeatherCache, get_weather_cache, match_location
+from agents.weather_client import AsyncWeatherClient
+
 class WeatherAgent:
-    def __init__(self):
+    def __init__(self, weather_cache: WeatherCache = None, mode: str = None, llm=None, weather=None):
+        # Before any setting is read: the mode and backends come from the environment
         self._load_environment()
-        self.weather_tool = self._initialize_weather_tool()
-        self.llm = self._initialize_llm()
+        # llm and weather override the configured backends (see agents.backends)
+        self.mode = validate_mode(mode or default_mode())
+        self.weather_tool = weather or self._initialize_weather_tool()
+        # Fakes and recordings are async already; the live wrapper needs the httpx client
+        self.weather_client = self.weather_tool if hasattr(self.weather_tool, "arun") else AsyncWeatherClient(self.weather_tool)
+        self.weather_cache = weather_cache or get_weather_cache()
+        self.llm = llm or self._initialize_llm()
         self.tools = self._initialize_tools()
         self.agent = self._initialize_agent()
 
     def _load_environment(self):
-        load_dotenv(override=True)
-        os.environ["GROQ_API_KEY"] = os.getenv("GROQ_API_KEY")
-        os.environ["GOOGLE_API_KEY"] = os.getenv("GOOGLE_API_KEY")
-        os.environ["OPENWEATHERMAP_API_KEY"] = os.getenv("OPENWEATHERMAP_API_KEY")
-        os.environ["LANGSMITH_TRACING"]= "true"
-        os.environ["LANGSMITH_API_KEY"] = os.getenv("LANGSMITH_API_KEY")
+        # Fake and replayed backends run without any keys
+        load_environment()
 
     def _initialize_weather_tool(self):
-        return OpenWeatherMapAPIWrapper()
+        return get_backends().weather()
 
     def _initialize_llm(self):
-        try:
-            return ChatGoogleGenerativeAI(
-                model="gemini-2.5-flash",
-                api_key=os.getenv("GOOGLE_API_KEY"),
-                temperature=0.0,
-            )
-        
-        except Exception as e:
-            if hasattr(e, "status_code") and e.status_code == 429:
-                print("Google Gemini rate limited. Falling back to Groq...")
-            elif "429" in str(e):
-                print("Rate limit detected in error message. Falling back to Groq...")
-            else:
-                raise 
-
-            return ChatGroq(
-                model="llama-3.3-70b-versatile",
-                api_key=os.getenv("GROQ_API_KEY"),
-                temperature=0.0,
-            )
+        # Live: the shared Gemini/Groq router, with per-call failover on 429s and timeouts
+        return get_backends().llm()
 
 
     def _initialize_tools(self):
         return [
             Tool(
                 name="weather",
-                func=self.weather_tool.run,
+                func=self.get_weather,
+                coroutine=self.aget_weather,
                 description="Use this tool to get the current weather in a specified location."
             )
         ]
@@ -65,17 +56,83 @@ class WeatherAgent:
             verbose=True,
         )
 
-    def ask(self, location: str):
-        prompt = f"What's the weather like in {location}?"
+    def get_weather(self, location: str):
+        # Direct, cached OpenWeatherMap lookup without the LLM
+        return self.weather_cache.get_or_fetch(location, lambda: self._fetch(location))
+
+    async def aget_weather(self, location: str):
+        return await self.weather_cache.aget_or_fetch(location, lambda: self._afetch(location))
+
+    def _fetch(self, location: str):
+        with get_metrics().timer("weather", "fetch"):
+            return self.weather_tool.run(location)
+
+    async def _afetch(self, location: str):
+        with get_metrics().timer("weather", "fetch"):
+            return await self.weather_client.arun(location)
+
+    def stream_weather(self, location: str):
+        # Event-stream shape of get_weather, for callers that consume stream()
+        start = time.perf_counter()
+        yield {"type": "step", "text": f"Looking up weather for {location} (no LLM)"}
+        report = self.get_weather(location)
+        elapsed = time.perf_counter() - start
+        yield {"type": "final", "text": report, "ttft": elapsed, "total": elapsed}
+
+    def _plan(self, question: str, context: str):
+        # Direct only for a location pulled cleanly out of "weather in <location>";
+        # anything else is a question for the ReAct agent, history included
+        location = match_location(question)
+        if location is None:
+            return None, with_context(question, context)
+        direct = resolve_mode(self.mode, question) == "direct"
+        return (location if direct else None), f"What's the weather like in {location}?"
+
+    def ask(self, question: str, context: str = ""):
+        """Answer a weather question, e.g. "weather in Avignon"; ``context`` is earlier conversation.
+
+        A question naming its location is answered by the cached lookup (no
+        LLM) unless the mode says otherwise; other input goes to the agent.
+        """
+        location, prompt = self._plan(question, context)
+        if location:
+            # The tool output is the answer; no LLM call at all
+            try:
+                return self.get_weather(location)
+            except Exception as e:
+                print(f"Direct weather lookup for {location!r} failed ({e}); using the agent")
         print("Asking:", prompt)
         result = self.agent.run(prompt)
         print("Result:", result)
         return result
 
+    def stream(self, question: str, context: str = ""):
+        # Yields "step"/"token" events, then a "final" event with ttft/total timings
+        location, prompt = self._plan(question, context)
+        if location:
+            try:
+                yield from self.stream_weather(location)
+                return
+            except Exception as e:
+                print(f"Direct weather lookup for {location!r} failed ({e}); using the agent")
+        print("Streaming:", prompt)
+        yield from stream_agent(self.agent, {"input": prompt})
+
+    async def aask(self, question: str, context: str = ""):
+        location, prompt = self._plan(question, context)
+        if location:
+            try:
+                return await self.aget_weather(location)
+            except Exception as e:
+                print(f"Direct weather lookup for {location!r} failed ({e}); using the agent")
+        print("Asking:", prompt)
+        result = await self.agent.arun(prompt)
+        print("Result:", result)
+        return result
+
 if __name__ == "__main__":
     print("Starting Weather Agent...")
     weather_agent = WeatherAgent()
     print("Agent initialized.")
-    location = "Avignon"  # Example location
-    response = weather_agent.ask(location)
+    response = weather_agent.ask("weather in Avignon")
     print("Response:", response)
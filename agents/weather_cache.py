@@ -0,0 +1,143 @@
+import asyncio
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+from agents.metrics import get_metrics
+
+
+def normalize_location(location: str) -> str:
+    location = re.sub(r"[?!.]+$", "", location.strip().lower())
+    location = re.sub(r"\s*,\s*", ",", location)
+    return " ".join(location.split())
+
+
+def match_location(question: str):
+    """The location of a "weather in <location>" question, or None when it names none."""
+    match = re.search(r"weather in ([\w\s,]+)", question, re.IGNORECASE)
+    return match.group(1).strip() if match else None
+
+
+class WeatherCache:
+    """Short-TTL cache of weather reports keyed on normalized location.
+
+    Concurrent requests for the same location share one in-flight fetch:
+    threads wait on a Future, coroutines await the same task.
+    """
+
+    def __init__(self, ttl_seconds: float = 300, max_entries: int = 512, clock=time.monotonic):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._inflight = {}
+        self._ainflight = {}
+        self._metrics = {"hits": 0, "misses": 0, "coalesced": 0, "errors": 0}
+
+    def _count(self, result: str):
+        # Caller holds the lock
+        self._metrics[result] += 1
+        get_metrics().incr("cache_lookups", cache="weather", result=result)
+
+    def _cached(self, key: str):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        report, fetched_at = entry
+        if self._clock() - fetched_at > self.ttl_seconds:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return report
+
+    def _remember(self, key: str, report: str):
+        with self._lock:
+            self._entries[key] = (report, self._clock())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get_or_fetch(self, location: str, fetch) -> str:
+        key = normalize_location(location)
+        with self._lock:
+            report = self._cached(key)
+            if report is not None:
+                self._count("hits")
+                return report
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                self._count("misses")
+                future = self._inflight[key] = Future()
+            else:
+                self._count("coalesced")
+        if not owner:
+            return future.result()
+
+        try:
+            report = fetch()
+            self._remember(key, report)
+            future.set_result(report)
+            return report
+        except BaseException as e:
+            # Including KeyboardInterrupt/SystemExit: waiters must never be left on an unresolved Future
+            with self._lock:
+                self._metrics["errors"] += 1
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    async def aget_or_fetch(self, location: str, afetch) -> str:
+        key = normalize_location(location)
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            report = self._cached(key)
+            if report is not None:
+                self._count("hits")
+                return report
+            task = self._ainflight.get((loop, key))
+            if task is not None:
+                self._count("coalesced")
+            else:
+                self._count("misses")
+                task = loop.create_task(self._afetch(loop, key, afetch))
+                self._ainflight[(loop, key)] = task
+        # shield: one cancelled waiter must not cancel the fetch for the others
+        return await asyncio.shield(task)
+
+    async def _afetch(self, loop, key: str, afetch) -> str:
+        try:
+            report = await afetch()
+            self._remember(key, report)
+            return report
+        except Exception:
+            with self._lock:
+                self._metrics["errors"] += 1
+            raise
+        finally:
+            with self._lock:
+                self._ainflight.pop((loop, key), None)
+
+    def metrics(self) -> dict:
+        with self._lock:
+            metrics = dict(self._metrics)
+            metrics["size"] = len(self._entries)
+            lookups = metrics["hits"] + metrics["misses"] + metrics["coalesced"]
+            metrics["hit_rate"] = (metrics["hits"] + metrics["coalesced"]) / lookups if lookups else 0.0
+            return metrics
+
+
+_weather_cache = WeatherCache(
+    ttl_seconds=float(os.getenv("WEATHER_CACHE_TTL", "300")),
+    max_entries=int(os.getenv("WEATHER_CACHE_MAX", "512")),
+)
+
+
+def get_weather_cache() -> WeatherCache:
+    return _weather_cache
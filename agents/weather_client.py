@@ -0,0 +1,40 @@
+import asyncio
+import os
+import weakref
+
+import httpx
+from pyowm.weatherapi30.observation import Observation
+
+OWM_WEATHER_URL = "https://api.openweathermap.org/data/2.5/weather"
+
+
+class AsyncWeatherClient:
+    """Non-blocking counterpart of ``OpenWeatherMapAPIWrapper.run``.
+
+    Hits the same OpenWeatherMap endpoint as PyOWM and formats the
+    observation with the wrapper, so sync and async answers are identical.
+    """
+
+    def __init__(self, wrapper, api_key: str = None, timeout: float = 5.0):
+        self.wrapper = wrapper
+        self.api_key = api_key or os.getenv("OPENWEATHERMAP_API_KEY")
+        self.timeout = timeout
+        # httpx clients are bound to the loop they were first used on
+        self._clients = weakref.WeakKeyDictionary()
+
+    def _client(self) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        client = self._clients.get(loop)
+        if client is None:
+            client = httpx.AsyncClient(timeout=self.timeout)
+            self._clients[loop] = client
+        return client
+
+    async def arun(self, location: str) -> str:
+        response = await self._client().get(
+            OWM_WEATHER_URL,
+            params={"q": location, "appid": self.api_key, "lang": "en"},
+        )
+        response.raise_for_status()
+        weather = Observation.from_dict(response.json()).weather
+        return self.wrapper._format_weather_info(location, weather)
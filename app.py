@@ -1,14 +1,10 @@
 import asyncio
 import streamlit as st
-import tempfile
 import sys
 import os
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from agents.pdf_agent import PDFAgent
-from agents.weather_agent import WeatherAgent
-
 # Ensure an event loop exists for async libraries (fix for Google Generative AI Embeddings)
 try:
     asyncio.get_event_loop()
@@ -18,6 +14,51 @@ except RuntimeError:
 st.set_page_config(page_title="Langchain Agents Demo", layout="wide")
 st.title("LangGraph Agents Demo")
 
+def render_stream(events):
+    # Show ReAct steps in an expander and write answer tokens as they arrive
+    steps = st.expander("Agent steps")
+    final = {}
+
+    def answer_tokens():
+        streamed = False
+        for event in events:
+            if event["type"] == "step":
+                steps.write(event["text"])
+            elif event["type"] == "token":
+                streamed = True
+                yield event["text"]
+            elif event["type"] == "final":
+                final.update(event)
+                if not streamed:
+                    yield event["text"]
+
+    st.write_stream(answer_tokens())
+    if final:
+        st.caption(f"Time to first token: {final['ttft']:.2f}s | Total: {final['total']:.2f}s")
+    return final.get("text")
+
+
+# Agents (and the langchain/Gemini/Qdrant imports behind them) load on first
+# use per agent type and are then shared by every rerun and session. Only the
+# registry is cached here; it bounds and evicts the agents itself
+@st.cache_resource
+def load_registry():
+    from agents.registry import get_registry
+
+    return get_registry()
+
+
+def load_weather_agent():
+    with st.spinner("Loading the weather agent..."):
+        return load_registry().get_weather_agent()
+
+
+def load_pdf_agent(pdf_data: bytes):
+    # Parsed from memory; the upload's content hash identifies the document
+    with st.spinner("Indexing the PDF..."):
+        return load_registry().get_pdf_agent(pdf_data)
+
+
 tab1, tab2, tab3 = st.tabs(["PDF Agent", "Weather Agent", "Multi-Agent QA"])
 
 with tab1:
@@ -36,15 +77,9 @@ with tab1:
 
     if 'uploaded_pdf_data' in st.session_state and question:
         try:
-            with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp_file:
-                tmp_file.write(st.session_state.uploaded_pdf_data)
-                tmp_path = tmp_file.name
-            st.info(f"Saved PDF to temp file: {tmp_path}")
-            pdf_agent = PDFAgent(pdf_path=tmp_path)
-            with st.spinner("Processing..."):
-                answer = pdf_agent.ask(question)
+            pdf_agent = load_pdf_agent(st.session_state.uploaded_pdf_data)
             st.success("Answer:")
-            st.write(answer)
+            render_stream(pdf_agent.stream(question))
         except Exception as e:
             st.error(f"Error processing PDF: {e}")
             import traceback
@@ -55,12 +90,11 @@ with tab2:
     st.header("Weather Agent")
     location = st.text_input("Enter a location for weather info: e.g. Mumbai")
     if location:
-        weather_agent = WeatherAgent()
+        weather_agent = load_weather_agent()
         with st.spinner("Fetching weather..."):
             try:
-                result = weather_agent.ask(location)
                 st.success("Weather Info:")
-                st.write(result)  # This might be None or a dict
+                result = render_stream(weather_agent.stream(f"weather in {location}"))
                 # Try to extract the answer if it's a dict or object
                 # if isinstance(result, dict):
                 #     # Try common keys
@@ -82,38 +116,45 @@ with tab3:
     user_input = st.text_area("Ask multiple questions (e.g. 'What organizations has Sharath worked for and tell me the weather in Mumbai'):")
     uploaded_pdf = st.file_uploader("Upload a PDF for PDF Agent (optional)", type=["pdf"], key="multi_pdf")
     if st.button("Ask Multi-Agent"):
-        from nodes.node import split_questions, classify_question
-        from langchain_core.messages import HumanMessage
-        import tempfile
-        messages = []
-        # If PDF uploaded, save and use it
-        pdf_path = None
-        if uploaded_pdf:
-            with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp_file:
-                tmp_file.write(uploaded_pdf.read())
-                pdf_path = tmp_file.name
-        # Split and process each question
+        from nodes.node import split_questions
+        from nodes.fanout import stream_questions_parallel
+        agent_labels = {"pdf_agent": "PDF Agent", "weather_agent": "Weather Agent"}
+        # If a PDF was uploaded, its bytes go to the PDF agent as-is
+        pdf_data = uploaded_pdf.getvalue() if uploaded_pdf else None
+        # Split and answer the independent questions concurrently
         questions = split_questions(user_input)
-        for question in questions:
-            agent_name = classify_question(question)
-            if agent_name == "pdf_agent":
-                if pdf_path:
-                    pdf_agent = PDFAgent(pdf_path=pdf_path)
-                else:
-                    pdf_agent = PDFAgent(pdf_path="Sharath_OnePage.pdf")
-                result = pdf_agent.agent.invoke({"input": question})
-                if isinstance(result, dict):
-                    text_result = result.get("output") or result.get("text") or str(result)
+        st.subheader("Results:")
+        placeholders = [st.empty() for _ in questions]
+        answers = [""] * len(questions)
+        for event in stream_questions_parallel(questions, pdf_path=pdf_data):
+            index = event["index"]
+            label = agent_labels[event["agent"]]
+            if event["type"] == "token":
+                answers[index] += event["text"]
+            elif event["type"] == "final":
+                answers[index] = event["text"]
+                if "total" in event:
+                    answers[index] += f"\n\n_First token {event['ttft']:.2f}s | Total {event['total']:.2f}s_"
                 else:
-                    text_result = str(result)
-                messages.append(("PDF Agent", text_result))
+                    answers[index] += f"\n\n_{event['status']}_"
             else:
-                weather_agent = WeatherAgent()
-                import re
-                match = re.search(r"weather in ([\w\s,]+)", question, re.IGNORECASE)
-                location = match.group(1).strip() if match else question
-                result = weather_agent.ask(location)
-                messages.append(("Weather Agent", str(result)))
-        st.subheader("Results:")
-        for agent, answer in messages:
-            st.markdown(f"**{agent}:** {answer}")
\ No newline at end of file
+                continue
+            placeholders[index].markdown(f"**{label}:** {answers[index]}")
+
+with st.sidebar.expander("Agent registry"):
+    st.json(load_registry().stats())
+
+with st.sidebar.expander("Answer cache"):
+    from agents.answer_cache import get_answer_cache
+    st.json(get_answer_cache().metrics())
+
+with st.sidebar.expander("Weather cache"):
+    from agents.weather_cache import get_weather_cache
+    st.json(get_weather_cache().metrics())
+
+with st.sidebar.expander("Latency by stage"):
+    from agents.metrics import get_metrics
+    metrics = get_metrics()
+    st.dataframe(metrics.summary(), hide_index=True)
+    st.json(metrics.counters())
+    st.download_button("Prometheus metrics", metrics.to_prometheus(), file_name="metrics.prom")
@@ -0,0 +1,77 @@
+"""Requests/sec of the sync and async agent paths under N concurrent users.
+
+LLM and tool backends are stubbed with fixed latencies, so the numbers show
+how well each path overlaps waiting rather than model speed.
+
+    python benchmarks/bench_async.py --users 1 10 50 100 --requests 5
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from agents.fakes import FakeChatModel, FakeWeather
+from agents.weather_agent import WeatherAgent
+from agents.weather_cache import WeatherCache
+
+
+def build_stub_weather_agent(llm_latency: float, tool_latency: float) -> WeatherAgent:
+    agent = WeatherAgent(
+        # Zero TTL so every request pays for the stubbed backend
+        weather_cache=WeatherCache(ttl_seconds=0),
+        # The ReAct loop is what this benchmark overlaps
+        mode="react",
+        llm=FakeChatModel(latency=llm_latency),
+        weather=FakeWeather(latency=tool_latency),
+    )
+    agent.agent.verbose = False
+    return agent
+
+
+def bench_threads(agent, users: int, requests: int, max_threads: int) -> float:
+    def user(u):
+        for i in range(requests):
+            agent.ask(f"weather in City {u}-{i}")
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=min(users, max_threads)) as pool:
+        list(pool.map(user, range(users)))
+    return users * requests / (time.perf_counter() - start)
+
+
+async def bench_async(agent, users: int, requests: int) -> float:
+    async def user(u):
+        for i in range(requests):
+            await agent.aask(f"weather in City {u}-{i}")
+
+    start = time.perf_counter()
+    await asyncio.gather(*(user(u) for u in range(users)))
+    return users * requests / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, nargs="+", default=[1, 10, 50, 100])
+    parser.add_argument("--requests", type=int, default=5, help="requests per user")
+    parser.add_argument("--llm-latency", type=float, default=0.05)
+    parser.add_argument("--tool-latency", type=float, default=0.05)
+    parser.add_argument("--max-threads", type=int, default=8, help="thread pool size for the sync path")
+    args = parser.parse_args()
+
+    agent = build_stub_weather_agent(args.llm_latency, args.tool_latency)
+    print(f"{'users':>6} {'sync req/s':>12} {'async req/s':>12}")
+    for users in args.users:
+        # The agents print every question and answer; keep the table readable
+        with contextlib.redirect_stdout(io.StringIO()):
+            sync_rps = bench_threads(agent, users, args.requests, args.max_threads)
+            async_rps = asyncio.run(bench_async(agent, users, args.requests))
+        print(f"{users:>6} {sync_rps:>12.1f} {async_rps:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+"""Prompt tokens, answer latency and hit rate: character vs structured chunking.
+
+A synthetic annual report is rendered to a PDF (agents.fakes.make_pdf)
+and parsed back with the same loader ingestion uses, so the splitters see
+real extracted text: wrapped lines, numbered and all-caps headings, a
+running header and a disclaimer repeated on every page, and no blank
+lines. Each section holds one fact naming a region and a product line, and
+each question asks for one of them; ``--repeat`` of the sections are
+restated word for word in an appendix, as summaries and appendices do. A
+hit means the fact sentence reached the prompt. The current splitter
+(``CharacterTextSplitter(1000, 0)``) cannot split text without blank
+lines, so it stores whole pages. The structured splitter's context is
+packed into ``--budget`` tokens (default: the per-model budget for the
+fake LLM). The fake LLM charges ``--prefill`` seconds per prompt token on
+top of its base latency.
+
+    python benchmarks/bench_chunking.py --pages 40 --questions 50
+"""
+import argparse
+import contextlib
+import io
+import logging
+import os
+import random
+import sys
+import tempfile
+import textwrap
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+os.environ.setdefault("KEYWORD_INDEX_DIR", ":memory:")
+from agents.chunking import chunking_params, estimate_tokens, make_text_splitter
+from agents.fakes import FakeChatModel, FakeEmbeddings, make_pdf
+from agents.ingest import load_pdf_pages
+from agents.ingest_cache import content_sha256
+from agents.metrics import get_metrics
+from benchmarks.bench_modes import UsageCounter, build_stub_pdf_agent
+
+PRODUCTS = ["cloud storage", "analytics", "payments", "logistics", "security", "hardware"]
+# Filler sentences are drawn from these parts, so sections share vocabulary but not text
+SUBJECTS = ["The regional team", "Local management", "The sales group", "Our delivery staff", "The support desk", "Finance"]
+ACTIONS = [
+    "expanded the partner network", "held operating costs flat", "renegotiated supplier contracts",
+    "automated manual processing", "improved customer retention", "consolidated long running projects",
+    "hired for sales and delivery roles", "shortened onboarding for new customers",
+]
+CONTEXTS = [
+    "during the first half", "after the spring pricing changes", "despite higher support volumes",
+    "ahead of contract renewals", "across its largest cities", "with no change in headcount",
+]
+DISCLAIMER = (
+    "This report contains forward-looking statements that involve risks and uncertainties. Actual results "
+    "may differ materially from those expressed or implied, and the company undertakes no obligation to "
+    "update these statements."
+)
+
+
+def region_name(i: int) -> str:
+    return f"Region{chr(65 + i % 26)}{i // 26}"
+
+
+def make_report(pages: int, sections_per_page: int = 4, repeat: float = 0.25, seed: int = 0):
+    """Lines per page and the (region, product, fact) behind every section."""
+    rng = random.Random(seed)
+    sections, facts = [], []
+    for i in range(pages * sections_per_page):
+        region, product = region_name(i), rng.choice(PRODUCTS)
+        fact = f"In {region}, the {product} line earned {rng.randint(5, 95)} million dollars in 2023."
+        sentences = [f"{rng.choice(SUBJECTS)} {rng.choice(ACTIONS)} {rng.choice(CONTEXTS)}." for _ in range(8)]
+        sentences.insert(rng.randrange(len(sentences)), fact)
+        body = [line for paragraph in (sentences[:4], sentences[4:]) for line in textwrap.wrap(" ".join(paragraph), 95)]
+        sections.append([f"{i + 1}. {region} Operations"] + body)
+        facts.append((region, product, fact))
+    repeated = rng.sample(sections, int(repeat * len(sections)))
+    appendix = [[f"A.{section[0]}"] + section[1:] for section in repeated]
+
+    lines = []
+    body = [sections[i : i + sections_per_page] for i in range(0, len(sections), sections_per_page)]
+    body += [appendix[i : i + sections_per_page] for i in range(0, len(appendix), sections_per_page)]
+    for page, page_sections in enumerate(body):
+        page_lines = ["NORTHWIND TRADERS ANNUAL REPORT 2023"]
+        for section in page_sections:
+            page_lines += section
+        page_lines.append("Forward-looking statements")
+        page_lines += textwrap.wrap(DISCLAIMER, 95)
+        page_lines.append(f"Page {page + 1} of {len(body)}")
+        lines.append(page_lines)
+    return lines, facts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, default=40)
+    parser.add_argument("--repeat", type=float, default=0.25, help="share of sections restated in the appendix")
+    parser.add_argument("--questions", type=int, default=50)
+    parser.add_argument("--budget", help="context tokens for the structured runs (default: per-model)")
+    parser.add_argument("--llm-latency", type=float, default=0.05)
+    parser.add_argument("--prefill", type=float, default=0.0002, help="seconds per prompt token")
+    args = parser.parse_args()
+    # The character splitter warns about every oversized page
+    logging.getLogger("langchain_text_splitters.base").setLevel(logging.ERROR)
+
+    report, facts = make_report(args.pages, repeat=args.repeat)
+    pdf = make_pdf(report)
+    pages = list(load_pdf_pages(pdf, content_sha256(pdf)))
+    rng = random.Random(1)
+    asked = [facts[rng.randrange(len(facts))] for _ in range(args.questions)]
+
+    setups = [
+        ("character, vector k=4", "character", "vector", "0"),
+        ("structured, vector", "structured", "vector", args.budget),
+        ("character, hybrid", "character", "hybrid", "0"),
+        ("structured, hybrid", "structured", "hybrid", args.budget),
+    ]
+    print(f"{len(pages)} pages, {len(facts)} sections, {sum(estimate_tokens(p.page_content) for p in pages)} tokens")
+    print(f"{'setup':>22} {'chunks':>7} {'split ms':>9} {'hit rate':>9} {'ctx tok/q':>10} {'max ctx':>8} "
+          f"{'dups/q':>7} {'~prompt tok/q':>14} {'ms/q':>8}")
+    previous = os.environ.get("CONTEXT_TOKEN_BUDGET")
+    with tempfile.TemporaryDirectory() as cache_dir:
+        for label, chunker, retriever, budget in setups:
+            splitter = make_text_splitter(*chunking_params(chunker))
+            start = time.perf_counter()
+            chunks = splitter.split_documents(pages)
+            split_ms = 1000 * (time.perf_counter() - start)
+
+            if budget is None:
+                os.environ.pop("CONTEXT_TOKEN_BUDGET", None)
+            else:
+                os.environ["CONTEXT_TOKEN_BUDGET"] = budget
+            counter = UsageCounter()
+            llm = FakeChatModel(latency=args.llm_latency, prompt_token_latency=args.prefill, callbacks=[counter])
+            with contextlib.redirect_stdout(io.StringIO()):
+                agent = build_stub_pdf_agent(
+                    llm, "direct", cache_dir, retriever=retriever, pdf=pdf, chunker=chunker, embeddings=FakeEmbeddings(latency="0")
+                )
+
+            get_metrics().reset()
+            hits = context = largest = 0
+            for i, (region, product, fact) in enumerate(asked):
+                docs = agent.qa_chain.retriever.invoke(f"How much did the {product} line earn in {region}? ({i})")
+                tokens = sum(estimate_tokens(doc.page_content) for doc in docs)
+                context += tokens
+                largest = max(largest, tokens)
+                # PDF text wraps lines mid-sentence
+                hits += any(fact in " ".join(doc.page_content.split()) for doc in docs)
+            dropped = get_metrics().counters().get("context_chunks{result=duplicate}", 0)
+
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                for i, (region, product, _) in enumerate(asked):
+                    agent.ask(f"How much did the {product} line earn in {region}? [{i}]")
+            n = len(asked)
+            ms = 1000 * (time.perf_counter() - start) / n
+            print(f"{label:>22} {len(chunks):>7} {split_ms:>9.1f} {hits / n:>9.0%} {context / n:>10.0f} {largest:>8} "
+                  f"{dropped / n:>7.2f} {counter.tokens / n:>14.0f} {ms:>8.1f}")
+    if previous is None:
+        os.environ.pop("CONTEXT_TOKEN_BUDGET", None)
+    else:
+        os.environ["CONTEXT_TOKEN_BUDGET"] = previous
+
+
+if __name__ == "__main__":
+    main()
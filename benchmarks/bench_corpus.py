@@ -0,0 +1,112 @@
+"""Scoped query, add and remove latency as a shared PDF corpus grows.
+
+Synthetic documents (``--pages`` pages each, deterministic fake
+embeddings, ``--words`` words per page from a shared vocabulary) are added
+to one PDFCorpus until it holds each of ``--docs`` documents. At every size
+the benchmark times a vector query scoped to one document, an unscoped one
+over the whole corpus, the BM25 and hybrid (vector + BM25) queries scoped
+to the same document, and adding and removing one more document.
+
+    python benchmarks/bench_corpus.py --docs 10 100 1000 3000 --backend numpy
+"""
+import argparse
+import contextlib
+import io
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from agents.corpus import PDFCorpus
+from agents.hybrid import HybridRetriever, get_keyword_index
+from agents.ingest_cache import IngestCache
+
+# Every page draws from the same words, so each query term has postings in most documents
+VOCABULARY = [f"term{i}" for i in range(500)]
+
+
+def pages(doc: int, count: int, words: int = 150):
+    rng = random.Random(doc)
+    return [
+        Document(
+            page_content=f"Document {doc} page {page}: report section {doc * count + page}. "
+            + " ".join(rng.choice(VOCABULARY) for _ in range(words)),
+            metadata={"page": page},
+        )
+        for page in range(count)
+    ]
+
+
+def timed(fn, repeat: int = 1) -> float:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return 1000 * statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--docs", type=int, nargs="+", default=[10, 100, 1000, 3000])
+    parser.add_argument("--pages", type=int, default=8)
+    parser.add_argument("--words", type=int, default=150, help="words per page")
+    parser.add_argument("--backend", choices=["numpy", "qdrant_local"], default="numpy")
+    parser.add_argument("--queries", type=int, default=50)
+    args = parser.parse_args()
+
+    # Keep the index in memory so the numbers are search cost, not disk writes
+    os.environ.setdefault("NUMPY_INDEX_DIR", ":memory:")
+    os.environ.setdefault("QDRANT_PATH", ":memory:")
+    os.environ.setdefault("KEYWORD_INDEX_DIR", ":memory:")
+    embeddings = DeterministicFakeEmbedding(size=256)
+    text = "report section " + " ".join(VOCABULARY[:8])
+    query = embeddings.embed_query(text)
+
+    print(f"{'docs':>6} {'chunks':>8} {'scoped ms':>10} {'unscoped ms':>12} {'bm25 scoped ms':>15} "
+          f"{'hybrid scoped ms':>17} {'add ms':>8} {'remove ms':>10}")
+    with tempfile.TemporaryDirectory() as tmp:
+        corpus = PDFCorpus(
+            "bench",
+            embeddings=embeddings,
+            vector_backend=args.backend,
+            ingest_cache=IngestCache(os.path.join(tmp, "manifest.json")),
+            embed_concurrency=1,
+        )
+        store = corpus.store()
+        keyword_index = get_keyword_index(corpus.collection_name)
+        added = 0
+        with contextlib.redirect_stdout(io.StringIO()) as log:
+            for target in args.docs:
+                while added < target:
+                    corpus.add_pages(f"doc-{added}", pages(added, args.pages, args.words), name=f"doc-{added}.pdf")
+                    added += 1
+                scope = [f"doc-{target // 2}"]
+                scoped_filter = corpus.filter(scope)
+                hybrid = HybridRetriever(
+                    vector_store=store,
+                    keyword_index=keyword_index,
+                    k=4,
+                    vector_filter=scoped_filter,
+                    keyword_filter={"doc_id": scope},
+                )
+                scoped = timed(lambda: store.similarity_search_by_vector(query, k=4, filter=scoped_filter), args.queries)
+                unscoped = timed(lambda: store.similarity_search_by_vector(query, k=4), args.queries)
+                bm25 = timed(lambda: keyword_index.search(text, 20, {"doc_id": scope}), args.queries)
+                fused = timed(lambda: hybrid.invoke(text), args.queries)
+                add = timed(lambda: corpus.add_pages("extra", pages(-1, args.pages, args.words)))
+                remove = timed(lambda: corpus.remove("extra"))
+                with contextlib.redirect_stdout(sys.__stdout__):
+                    print(f"{target:>6} {target * args.pages:>8} {scoped:>10.3f} {unscoped:>12.3f} {bm25:>15.3f} "
+                          f"{fused:>17.3f} {add:>8.1f} {remove:>10.1f}")
+        del log
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""Prompt tokens, answer latency and hit rate: vector top-k vs hybrid retrieval.
+
+A synthetic resume-like PDF is split into ~1000-character chunks. Each
+chunk holds one fact naming an organization, buried in filler text. The
+stand-in embedding is a bag of words over the common vocabulary only, so,
+like real dense models, it barely sees rare names. Each question asks about
+one organization by name. A hit means the fact sentence reached the
+prompt. The fake LLM charges ``--prefill`` seconds per prompt token on top
+of its base latency.
+
+    python benchmarks/bench_hybrid.py --chunks 200 --questions 50
+"""
+import argparse
+import contextlib
+import hashlib
+import io
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+os.environ.setdefault("KEYWORD_INDEX_DIR", ":memory:")
+from langchain_core.embeddings import Embeddings
+
+from agents.hybrid import tokenize
+from agents.fakes import FakeChatModel
+from benchmarks.bench_modes import UsageCounter, build_stub_pdf_agent
+
+FILLER = (
+    "project team delivered model pipeline data cloud platform customers analytics "
+    "research engineering product report quarterly growth python systems design"
+).split()
+ROLES = ["intern", "engineer", "analyst", "researcher", "consultant"]
+
+
+class VocabularyEmbedding(Embeddings):
+    """Bag-of-words vectors over FILLER and ROLES only; organization names are invisible to it."""
+
+    def __init__(self, size: int = 64):
+        self.size = size
+        self.vocabulary = {word: i % size for i, word in enumerate(FILLER + ROLES)}
+
+    def _embed(self, text: str):
+        vector = [0.0] * self.size
+        for token in tokenize(text):
+            if token in self.vocabulary:
+                vector[self.vocabulary[token]] += 1.0
+        return vector
+
+    def embed_documents(self, texts):
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text):
+        return self._embed(text)
+
+
+def org_name(i: int) -> str:
+    return "Org" + hashlib.sha1(str(i).encode()).hexdigest()[:6]
+
+
+def make_chunks(count: int, seed: int = 0):
+    rng = random.Random(seed)
+    chunks, facts = [], []
+    for i in range(count):
+        role = rng.choice(ROLES)
+        fact = f"Sharath worked at {org_name(i)} as a {role} in {2010 + i % 15}."
+        filler = [" ".join(rng.choice(FILLER) for _ in range(14)).capitalize() + "." for _ in range(9)]
+        filler.insert(rng.randrange(len(filler)), fact)
+        chunks.append(" ".join(filler))
+        facts.append((org_name(i), role, fact))
+    return chunks, facts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--chunks", type=int, default=200)
+    parser.add_argument("--questions", type=int, default=50)
+    parser.add_argument("--llm-latency", type=float, default=0.05)
+    parser.add_argument("--prefill", type=float, default=0.0002, help="seconds per prompt token")
+    args = parser.parse_args()
+
+    chunks, facts = make_chunks(args.chunks)
+    rng = random.Random(1)
+    asked = [facts[rng.randrange(len(facts))] for _ in range(args.questions)]
+
+    setups = [
+        ("vector k=4", "vector", {}),
+        ("hybrid", "hybrid", {}),
+        ("hybrid, no rerank", "hybrid", {"RERANKER": "none"}),
+        ("hybrid, no compress", "hybrid", {"RETRIEVER_COMPRESS_CHARS": "0"}),
+    ]
+    print(f"{'retriever':>20} {'hit rate':>9} {'chunks/q':>9} {'~prompt tok/q':>14} {'ms/q':>8}")
+    with tempfile.TemporaryDirectory() as cache_dir:
+        for label, retriever, env in setups:
+            previous = {name: os.environ.get(name) for name in env}
+            os.environ.update(env)
+            counter = UsageCounter()
+            llm = FakeChatModel(latency=args.llm_latency, prompt_token_latency=args.prefill, callbacks=[counter])
+            with contextlib.redirect_stdout(io.StringIO()):
+                agent = build_stub_pdf_agent(
+                    llm, "direct", cache_dir, retriever=retriever, pages=chunks, embeddings=VocabularyEmbedding()
+                )
+            for name, value in previous.items():
+                if value is None:
+                    os.environ.pop(name)
+                else:
+                    os.environ[name] = value
+
+            hits = sources = 0
+            for i, (org, role, fact) in enumerate(asked):
+                question = f"When did Sharath work at {org} as a {role}? ({i})"
+                docs = agent.qa_chain.retriever.invoke(question)
+                sources += len(docs)
+                hits += any(fact in doc.page_content for doc in docs)
+
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                for i, (org, role, _) in enumerate(asked):
+                    agent.ask(f"When did Sharath work at {org} as a {role}? [{i}]")
+            n = len(asked)
+            ms = 1000 * (time.perf_counter() - start) / n
+            print(f"{label:>20} {hits / n:>9.0%} {sources / n:>9.1f} {counter.tokens / n:>14.0f} {ms:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""LLM calls, tokens and latency per question: ReAct loop vs direct execution.
+
+The PDF agent ingests a generated PDF into an in-memory NumPy index with
+the fake embedding model, the weather agent runs over the fake
+OpenWeatherMap, and both use the fake chat model (agents.fakes) with a
+fixed per-call latency. Tokens are estimated as
+characters / 4 of every prompt and completion.
+
+    python benchmarks/bench_modes.py --questions 20 --llm-latency 0.2
+"""
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from langchain_core.callbacks import BaseCallbackHandler
+
+from agents.answer_cache import AnswerCache
+from agents.fakes import FakeChatModel, FakeEmbeddings, make_pdf
+from agents.ingest_cache import IngestCache
+from agents.pdf_agent import PDFAgent
+from benchmarks.bench_async import build_stub_weather_agent
+
+PAGES = [
+    "Sharath worked as a machine learning intern at Acme Analytics in 2023.",
+    "He built retrieval pipelines with LangChain and Qdrant at Nimbus Labs.",
+    "Education: B.Tech in Computer Science. Skills: Python, LangGraph, FastAPI.",
+    "Projects include a multi-agent assistant answering PDF and weather questions.",
+]
+QUESTIONS = [
+    "What organizations has Sharath worked for",
+    "Which skills are listed",
+    "What projects has he built",
+    "Compare his two internships",
+]
+
+
+class UsageCounter(BaseCallbackHandler):
+    def __init__(self):
+        self.calls = 0
+        self.tokens = 0
+
+    def on_llm_start(self, serialized, prompts, **kwargs):
+        self.calls += 1
+        self.tokens += sum(len(p) for p in prompts) // 4
+
+    def on_llm_end(self, response, **kwargs):
+        self.tokens += sum(len(g.text) for gens in response.generations for g in gens) // 4
+
+
+def build_stub_pdf_agent(
+    llm, mode: str, cache_dir: str, retriever: str = "vector", pages=PAGES, embeddings=None, pdf: bytes = None,
+    chunker: str = "character",
+) -> PDFAgent:
+    """A PDFAgent over ``pdf`` (default: one page per entry of ``pages``) with offline backends.
+
+    Indexes stay in memory and the answer cache has no semantic lookups, so
+    every distinct question reaches the LLM.
+    """
+    os.environ.setdefault("NUMPY_INDEX_DIR", ":memory:")
+    os.environ.setdefault("KEYWORD_INDEX_DIR", ":memory:")
+    agent = PDFAgent(
+        pdf or make_pdf([[page] for page in pages]),
+        collection_name=f"bench_{mode}_{retriever}",
+        ingest_cache=IngestCache(os.path.join(cache_dir, "manifest.json")),
+        answer_cache=AnswerCache(path=os.path.join(cache_dir, f"answers_{mode}_{retriever}.jsonl"), similarity_threshold=None),
+        semantic_cache=False,
+        vector_backend="numpy",
+        mode=mode,
+        retriever=retriever,
+        llm=llm,
+        embeddings=embeddings or FakeEmbeddings(latency="0"),
+        chunker=chunker,
+    )
+    agent.agent.verbose = False
+    return agent
+
+
+def bench(ask, questions, counter: UsageCounter) -> dict:
+    counter.calls = counter.tokens = 0
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for question in questions:
+            ask(question)
+    n = len(questions)
+    return {"calls": counter.calls / n, "tokens": counter.tokens / n, "ms": (time.perf_counter() - start) * 1000 / n}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--questions", type=int, default=20)
+    parser.add_argument("--llm-latency", type=float, default=0.2)
+    parser.add_argument("--tool-latency", type=float, default=0.05)
+    args = parser.parse_args()
+
+    # Distinct questions, so the answer cache never short-circuits a run
+    pdf_questions = [f"{QUESTIONS[i % len(QUESTIONS)]} ({i})?" for i in range(args.questions)]
+    cities = [f"What is the weather in City {i}" for i in range(args.questions)]
+
+    print(f"{'agent':>8} {'mode':>7} {'LLM calls/q':>12} {'~tokens/q':>10} {'ms/q':>8}")
+    with tempfile.TemporaryDirectory() as cache_dir:
+        for mode in ("react", "direct", "auto"):
+            counter = UsageCounter()
+            llm = FakeChatModel(latency=args.llm_latency, callbacks=[counter])
+            with contextlib.redirect_stdout(io.StringIO()):
+                pdf_agent = build_stub_pdf_agent(llm, mode, cache_dir)
+            r = bench(pdf_agent.ask, pdf_questions, counter)
+            print(f"{'pdf':>8} {mode:>7} {r['calls']:>12.2f} {r['tokens']:>10.0f} {r['ms']:>8.1f}")
+
+        for mode in ("react", "direct"):
+            counter = UsageCounter()
+            weather_agent = build_stub_weather_agent(args.llm_latency, args.tool_latency)
+            weather_agent.mode = mode
+            weather_agent.llm.callbacks = [counter]
+            r = bench(weather_agent.ask, cities, counter)
+            print(f"{'weather':>8} {mode:>7} {r['calls']:>12.2f} {r['tokens']:>10.0f} {r['ms']:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
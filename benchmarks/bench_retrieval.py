@@ -0,0 +1,123 @@
+"""Ingest throughput, query latency and memory of the in-process vector backends.
+
+Synthetic pages go through the same StreamingIngestor path as PDFAgent, and
+a deterministic fake embedding model stands in for Gemini, so runs are
+offline and repeatable. The numbers show backend overhead, not embedding cost.
+
+    python benchmarks/bench_retrieval.py --chunks 1000 10000 50000 --queries 200
+"""
+import argparse
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+from qdrant_client import QdrantClient
+
+from agents.ingest import IngestJob, StreamingIngestor
+from agents.vector_backends import NumpyBackend, QdrantBackend
+
+WORDS = "weather rain pressure humidity resume project python agent vector graph cloud model river city".split()
+
+
+def make_pages(chunks: int, chunks_per_page: int, chunk_size: int, seed: int = 0):
+    rng = random.Random(seed)
+    pages = []
+    for number in range(max(1, chunks // chunks_per_page)):
+        # Whole chunks of roughly chunk_size characters, so the splitter yields chunks_per_page each
+        parts = []
+        for _ in range(chunks_per_page):
+            words = []
+            while sum(len(w) + 1 for w in words) < chunk_size - 16:
+                words.append(rng.choice(WORDS))
+            parts.append(" ".join(words))
+        pages.append(Document(page_content="\n\n".join(parts), metadata={"page": number}))
+    return pages
+
+
+def make_backend(name: str):
+    if name == "numpy":
+        return NumpyBackend(":memory:")
+    if name == "qdrant_local":
+        return QdrantBackend(QdrantClient(location=":memory:"), local=True)
+    raise ValueError(f"Unknown backend {name!r}")
+
+
+def percentile(values, q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q * (len(values) - 1))))]
+
+
+def bench(backend_name: str, chunks: int, args) -> dict:
+    embeddings = DeterministicFakeEmbedding(size=args.dim)
+    splitter = RecursiveCharacterTextSplitter(chunk_size=args.chunk_size, chunk_overlap=0)
+    pages = make_pages(chunks, args.chunks_per_page, args.chunk_size)
+
+    tracemalloc.start()
+    backend = make_backend(backend_name)
+    collection_name = f"bench_{chunks}"
+    ingestor = StreamingIngestor(
+        backend.sink(collection_name),
+        embeddings,
+        splitter,
+        batch_size=args.batch_size,
+        max_concurrency=args.concurrency,
+    )
+    job = IngestJob()
+    job.run(lambda: ingestor.run(iter(pages), {}, job))
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    store = backend.open_store(collection_name, embeddings)
+    rng = random.Random(1)
+    queries = [" ".join(rng.choice(WORDS) for _ in range(8)) for _ in range(args.queries)]
+    # Embed up front so the latencies are the backend's, not the fake model's
+    vectors = [embeddings.embed_query(q) for q in queries]
+    for vector in vectors[:10]:
+        store.similarity_search_by_vector(vector, k=args.k)
+    latencies = []
+    for vector in vectors:
+        start = time.perf_counter()
+        store.similarity_search_by_vector(vector, k=args.k)
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    return {
+        "chunks": job.stats["chunks"],
+        "ingest_per_s": job.stats["chunks"] / job.stats["seconds"],
+        "p50_ms": percentile(latencies, 0.50),
+        "p99_ms": percentile(latencies, 0.99),
+        "mem_mb": current / 1e6,
+        "peak_mb": peak / 1e6,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--backends", nargs="+", default=["numpy", "qdrant_local"], choices=["numpy", "qdrant_local"])
+    parser.add_argument("--chunks", type=int, nargs="+", default=[1000, 10000, 50000], help="corpus sizes in chunks")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=4)
+    parser.add_argument("--dim", type=int, default=768, help="fake embedding size")
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--chunks-per-page", type=int, default=4)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--concurrency", type=int, default=4)
+    args = parser.parse_args()
+
+    print(f"{'backend':>13} {'chunks':>8} {'ingest/s':>10} {'p50 ms':>8} {'p99 ms':>8} {'mem MB':>8} {'peak MB':>8}")
+    for chunks in args.chunks:
+        for backend_name in args.backends:
+            r = bench(backend_name, chunks, args)
+            print(
+                f"{backend_name:>13} {r['chunks']:>8} {r['ingest_per_s']:>10.0f} {r['p50_ms']:>8.2f} "
+                f"{r['p99_ms']:>8.2f} {r['mem_mb']:>8.1f} {r['peak_mb']:>8.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
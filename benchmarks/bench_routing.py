@@ -0,0 +1,141 @@
+"""Split and classification accuracy, and router latency, on labeled messages.
+
+Every message is labeled with the questions it holds and the agent each
+one belongs to. Routers compared:
+
+- keyword: the previous behaviour, splitting on "and"/"then" and routing
+  anything without the word "weather" to the PDF agent.
+- centroid: RoutingEngine with its local hashing embeddings.
+- llm (``--llm``): RoutingEngine with one structured call to the
+  configured LLM router per message. Needs API keys.
+
+A message counts as exact when the router finds the same number of
+questions, in the same order, with the same agents. "Extra runs" are
+agent runs beyond the labeled ones, caused by over-splitting. Latency is
+measured cold (first sight of a message) and warm (cached).
+
+    python benchmarks/bench_routing.py --repeat 5
+"""
+import argparse
+import contextlib
+import io
+import os
+import re
+import statistics
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from nodes.node import build_routing_engine
+
+PDF, WEATHER = "pdf_agent", "weather_agent"
+
+# (message, [agent of each question, in order])
+LABELED = [
+    ("What organizations has Sharath worked for and tell me the weather in Mumbai", [PDF, WEATHER]),
+    ("Who were Tom and Jerry's employers?", [PDF]),
+    ("What is Sharath's experience with Python and Java?", [PDF]),
+    ("Where did he study and what is the weather in Delhi?", [PDF, WEATHER]),
+    ("Is it raining in London right now?", [WEATHER]),
+    ("How hot is Chennai today", [WEATHER]),
+    ("What's the forecast for Tokyo then summarize his education", [WEATHER, PDF]),
+    ("Tell me about his research and teaching", [PDF]),
+    ("Sharath's skills and the weather in Pune", [PDF, WEATHER]),
+    ("What is the temperature in Berlin?", [WEATHER]),
+    ("Compare the weather in Delhi and Mumbai", [WEATHER]),
+    ("Which companies did he intern at and what did he do there?", [PDF]),
+    ("Is it sunny in Barcelona? Also, what degree does Sharath have?", [WEATHER, PDF]),
+    ("List his publications", [PDF]),
+    ("Will it snow in Oslo tomorrow", [WEATHER]),
+    ("What tools and frameworks has he used?", [PDF]),
+    ("Describe his role at Infosys and the projects he led", [PDF]),
+    ("How humid is Singapore and how windy is it in Dubai?", [WEATHER, WEATHER]),
+    ("What is Sharath's email address?", [PDF]),
+    ("Give me the weather in Paris, France", [WEATHER]),
+    ("What awards has he won then check the temperature in Hyderabad", [PDF, WEATHER]),
+    ("Research and development experience", [PDF]),
+    ("Is it cold in Chicago", [WEATHER]),
+    ("Summarize his leadership and teamwork skills", [PDF]),
+    ("Where does he live and what is the weather there?", [PDF]),
+    ("Does Sharath know Docker and Kubernetes?", [PDF]),
+    ("What's the rain forecast for Seattle and Portland", [WEATHER]),
+    ("Which university and which year did he graduate?", [PDF]),
+    ("How many projects are listed, and is it raining in Kolkata?", [PDF, WEATHER]),
+    ("What certifications does he hold", [PDF]),
+    ("What's the weather in Delhi and is it going to rain there?", [WEATHER]),
+    ("What is his latest project and which stack does it use?", [PDF]),
+    ("Check the weather in Pune and where did he study?", [WEATHER, PDF]),
+    ("Where did he work last and what is the weather in Bangalore?", [PDF, WEATHER]),
+]
+
+
+def keyword_route(message: str):
+    # The splitter and classifier nodes.node used before RoutingEngine
+    parts = re.split(r'\band then\b|\band\b|\bthen\b', message, flags=re.IGNORECASE)
+    questions = [part.strip() for part in parts if part.strip()]
+    return [(q, WEATHER if re.search(r'\bweather\b', q, re.IGNORECASE) else PDF) for q in questions]
+
+
+def engine_route(engine):
+    return lambda message: [(route.question, route.agent) for route in engine.route(message)]
+
+
+def evaluate(route, repeat: int) -> dict:
+    exact = split_ok = labels_ok = labels = extra = 0
+    cold, warm = [], []
+    for message, gold in LABELED:
+        start = time.perf_counter()
+        routes = route(message)
+        cold.append(time.perf_counter() - start)
+        for _ in range(repeat):
+            start = time.perf_counter()
+            route(message)
+            warm.append(time.perf_counter() - start)
+        agents = [agent for _, agent in routes]
+        exact += agents == gold
+        split_ok += len(agents) == len(gold)
+        extra += max(0, len(agents) - len(gold))
+        if len(agents) == len(gold):
+            labels_ok += sum(a == g for a, g in zip(agents, gold))
+            labels += len(gold)
+    return {
+        "exact": exact / len(LABELED),
+        "split": split_ok / len(LABELED),
+        "label": labels_ok / labels if labels else 0.0,
+        "extra": extra,
+        "cold_ms": 1000 * statistics.median(cold),
+        "warm_ms": 1000 * statistics.median(warm) if warm else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5, help="cached lookups per message")
+    parser.add_argument("--llm", action="store_true", help="also route with one LLM call per message")
+    parser.add_argument("--show", action="store_true", help="print every message the centroid router gets wrong")
+    args = parser.parse_args()
+
+    routers = [("keyword", keyword_route, args.repeat)]
+    with contextlib.redirect_stdout(io.StringIO()):
+        centroid = build_routing_engine(strategy="centroid")
+    routers.append(("centroid", engine_route(centroid), args.repeat))
+    if args.llm:
+        routers.append(("llm", engine_route(build_routing_engine(strategy="llm")), args.repeat))
+
+    print(f"{'router':>9} {'exact':>7} {'split':>7} {'label':>7} {'extra runs':>11} {'cold ms':>9} {'warm ms':>9}")
+    for name, route, repeat in routers:
+        r = evaluate(route, repeat)
+        print(
+            f"{name:>9} {r['exact']:>7.0%} {r['split']:>7.0%} {r['label']:>7.0%} {r['extra']:>11} "
+            f"{r['cold_ms']:>9.3f} {r['warm_ms']:>9.3f}"
+        )
+
+    if args.show:
+        for message, gold in LABELED:
+            routes = centroid.route(message)
+            if [route.agent for route in routes] != gold:
+                print(f"\n{message!r}\n  expected {gold}\n  got {[(r.question, r.agent, round(r.score, 2)) for r in routes]}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""Per-turn latency, memory and prompt size over long checkpointed sessions.
+
+Runs the PDF/weather graph for ``--turns`` turns in one ConversationSession
+with stub agents (fixed-size answers, no LLM), once with unbounded history
+and no checkpoint pruning and once with the default windowing, summary and
+pruning, on both the in-memory and the sqlite checkpointer.
+
+    python benchmarks/bench_sessions.py --turns 150
+"""
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from agents.modes import with_context
+from agents.registry import get_registry
+from nodes.sessions import ConversationSession, extractive_summarizer, get_checkpointer
+
+
+class StubAgent:
+    """Answers instantly with a fixed-size reply and records the prompt it got."""
+
+    def __init__(self, name: str, answer_chars: int):
+        self.name = name
+        self.answer = (f"{name} answer. " * answer_chars)[:answer_chars]
+        self.prompt_chars = 0
+
+    def stream(self, question: str, context: str = ""):
+        self.prompt_chars = len(with_context(question, context))
+        yield {"type": "final", "text": self.answer}
+
+    stream_weather = stream
+
+
+def run(session: ConversationSession, turns: int, pdf_agent: StubAgent):
+    latencies = []
+    tracemalloc.start()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for turn in range(turns):
+            start = time.perf_counter()
+            session.ask(f"Question {turn}: what did Sharath work on in project {turn}?")
+            latencies.append(time.perf_counter() - start)
+    memory, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return latencies, memory, pdf_agent.prompt_chars
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--turns", type=int, default=150)
+    parser.add_argument("--answer-chars", type=int, default=400)
+    parser.add_argument("--window", type=int, default=10, help="turns averaged at the start and end of the session")
+    args = parser.parse_args()
+
+    pdf_agent = StubAgent("pdf_agent", args.answer_chars)
+    weather_agent = StubAgent("weather_agent", args.answer_chars)
+    registry = get_registry()
+    registry.get_pdf_agent = lambda *_, **__: pdf_agent
+    registry.get_weather_agent = lambda: weather_agent
+
+    w = args.window
+    print(f"{'checkpointer':>12} {'history':>10} {'first ms':>9} {'last ms':>9} {'memory KB':>10} {'stored KB':>10} {'prompt chars':>13}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for kind in ("memory", "sqlite"):
+            for bounded in (False, True):
+                path = os.path.join(tmp, f"{kind}_{bounded}.sqlite")
+                checkpointer = get_checkpointer(kind, path)
+                session = ConversationSession(
+                    checkpointer=checkpointer,
+                    summarizer=extractive_summarizer(),
+                    prune=bounded,
+                    **({} if bounded else {"max_messages": 10 ** 9}),
+                )
+                latencies, memory, prompt_chars = run(session, args.turns, pdf_agent)
+                stored = os.path.getsize(path) if kind == "sqlite" else memory
+                first = 1000 * sum(latencies[:w]) / w
+                last = 1000 * sum(latencies[-w:]) / w
+                label = "windowed" if bounded else "unbounded"
+                print(f"{kind:>12} {label:>10} {first:>9.2f} {last:>9.2f} {memory / 1024:>10.0f} {stored / 1024:>10.0f} {prompt_chars:>13}")
+
+
+if __name__ == "__main__":
+    main()
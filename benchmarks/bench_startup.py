@@ -0,0 +1,110 @@
+"""Cold import time of the app and agent modules, checked against a budget.
+
+Each target runs in a fresh interpreter under ``python -X importtime``, so
+the numbers are what a new container or a first Streamlit run pays. The
+budget file caps each target's time and lists packages it must not import
+at all (the heavy ones that should only load on first use), which is the
+part of the check that does not depend on how fast the machine is.
+
+    python benchmarks/bench_startup.py              # report
+    python benchmarks/bench_startup.py --check      # exit 1 if over budget
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+BUDGET_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "startup_budget.json")
+
+# The app target runs app.py once with no input, as a cold Streamlit start does
+TARGETS = {
+    "app": "from streamlit.testing.v1 import AppTest; AppTest.from_file('app.py', default_timeout=120).run()",
+    "agents.registry": "import agents.registry",
+    "agents.metrics": "import agents.metrics",
+    "agents.answer_cache": "import agents.answer_cache",
+    "nodes.node": "import nodes.node",
+    "agents.weather_agent": "import agents.weather_agent",
+    "agents.pdf_agent": "import agents.pdf_agent",
+}
+
+
+def parse_importtime(stderr: str):
+    """Return ({module: cumulative_us}, {top_level_module: cumulative_us}, {second_level_module: cumulative_us})."""
+    modules = {}
+    top_level = {}
+    second_level = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        _, cumulative_us, name = line[len("import time:"):].split("|")
+        # Nested imports are indented by two spaces per level under the first
+        modules[name.strip()] = int(cumulative_us)
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        if depth == 0:
+            top_level[name.strip()] = int(cumulative_us)
+        elif depth == 1:
+            second_level[name.strip()] = int(cumulative_us)
+    return modules, top_level, second_level
+
+
+def measure(code: str, repeat: int):
+    best = None
+    for _ in range(repeat):
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", code],
+            cwd=ROOT,
+            capture_output=True,
+            text=True,
+            env={**os.environ, "PYTHONPATH": ROOT, "PYTHONDONTWRITEBYTECODE": "1"},
+        )
+        if result.returncode != 0:
+            raise RuntimeError(f"{code!r} failed:\n{result.stderr[-2000:]}")
+        modules, top_level, second_level = parse_importtime(result.stderr)
+        total = sum(top_level.values())
+        if best is None or total < best[3]:
+            best = (modules, top_level, second_level, total)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("targets", nargs="*", default=list(TARGETS), help=f"subset of {list(TARGETS)}")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per target; the fastest counts")
+    parser.add_argument("--top", type=int, default=5, help="heaviest imports to list per target")
+    parser.add_argument("--budget", default=BUDGET_PATH)
+    parser.add_argument("--check", action="store_true", help="exit 1 if any target is over budget")
+    args = parser.parse_args()
+
+    with open(args.budget, "r", encoding="utf-8") as f:
+        budget = json.load(f)
+
+    failures = []
+    print(f"{'target':>22} {'import ms':>10} {'budget ms':>10}")
+    for target in args.targets:
+        modules, top_level, second_level, total_us = measure(TARGETS[target], args.repeat)
+        limit = budget.get(target, {})
+        max_ms = limit.get("max_ms")
+        print(f"{target:>22} {total_us / 1000:>10.0f} {max_ms if max_ms is not None else '-':>10}")
+
+        # What the target's own imports cost; for the app that is streamlit and the agents package
+        heaviest = {**top_level, **second_level} if target == "app" else second_level
+        for name, us in sorted(heaviest.items(), key=lambda item: -item[1])[: args.top]:
+            print(f"{'':>22}   {us / 1000:>8.0f}  {name}")
+
+        if max_ms is not None and total_us / 1000 > max_ms:
+            failures.append(f"{target}: {total_us / 1000:.0f} ms > {max_ms} ms")
+        loaded = {name.split(".")[0] for name in modules}
+        for package in limit.get("forbid", []):
+            if package in loaded:
+                failures.append(f"{target}: imports {package} at startup")
+
+    if failures:
+        print("\nOver budget:\n  " + "\n  ".join(failures))
+        if args.check:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,232 @@
+"""Offline load test: drive the graph and the agents at a target QPS.
+
+The LLM, embeddings, weather API and vector store all come from
+agents.backends. By default they are deterministic fakes with latency
+distributions (``--backends fake``). ``--backends replay`` uses cassettes
+recorded from the real services with ``AGENT_BACKENDS=record``. Nothing
+touches the network, so the test runs in CI.
+
+Requests arrive open-loop at ``--qps`` (Poisson by default) for
+``--duration`` seconds. Latency is measured from each request's scheduled
+arrival, so time spent queued behind busy workers counts. Each target
+reports achieved throughput, end-to-end p50/p95/p99 and the per-stage
+percentiles collected by agents.metrics (LLM calls, retrieval, embedding,
+weather fetches, graph nodes, routing). Answer and weather caches are off
+unless ``--cache`` is passed.
+
+    python benchmarks/load_test.py --target graph fanout --qps 5 --duration 20
+    python benchmarks/load_test.py --check --max-p95-ms 3000 --json loadtest.json
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from agents.fakes import make_pdf
+
+TARGETS = ("graph", "fanout", "pdf", "weather")
+ORGS = ["Infosys", "Acme Analytics", "Globex", "Initech", "Umbrella Labs", "Stark Industries", "Wayne Tech", "Hooli"]
+ROLES = ["intern", "data engineer", "ML engineer", "research assistant", "software engineer"]
+CITIES = ["Mumbai", "Delhi", "Pune", "London", "Paris", "Tokyo", "Chennai", "Berlin", "Toronto", "Sydney"]
+
+
+def resume_pages():
+    lines = [f"Sharath worked at {org} as a {ROLES[i % len(ROLES)]} from {2012 + i} to {2013 + i}." for i, org in enumerate(ORGS)]
+    lines += ["Skills: Python, SQL, PyTorch, LangChain, Docker.", "Education: B.Tech in Computer Science, 2012."]
+    return [lines[:5], lines[5:]]
+
+
+def make_messages(target: str, count: int, rng: random.Random):
+    def pdf_question():
+        org = rng.choice(ORGS)
+        return rng.choice([f"What did Sharath do at {org}?", f"When did Sharath work at {org}?", f"What was his role at {org}?"])
+
+    def weather_question():
+        city = rng.choice(CITIES)
+        return rng.choice([f"What is the weather in {city}?", f"Tell me the weather in {city}"])
+
+    messages = []
+    for _ in range(count):
+        if target == "pdf":
+            messages.append(pdf_question())
+        elif target == "weather":
+            messages.append(weather_question())
+        else:
+            messages.append(rng.choice([pdf_question(), weather_question(), f"{pdf_question()} and tell me the weather in {rng.choice(CITIES)}"]))
+    return messages
+
+
+def percentile(values, q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))] if values else 0.0
+
+
+def arrival_offsets(qps: float, duration: float, poisson: bool, rng: random.Random):
+    offsets, t = [], 0.0
+    while True:
+        t += rng.expovariate(qps) if poisson else 1.0 / qps
+        if t > duration:
+            return offsets
+        offsets.append(t)
+
+
+def raise_failed(branches):
+    # Fan-out reports failed branches in its results instead of raising
+    for branch in branches:
+        if branch["status"] != "ok":
+            raise RuntimeError(f"{branch['agent']} {branch['status']}: {branch['answer']}")
+    return branches
+
+
+def run_phase(fn, messages, offsets, workers: int):
+    def call(message, scheduled):
+        try:
+            fn(message)
+            status = "ok"
+        except Exception as e:
+            status = f"error: {type(e).__name__}: {e}"
+        return time.perf_counter() - scheduled, status
+
+    futures = []
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="load") as pool:
+        start = time.perf_counter()
+        for message, offset in zip(messages, offsets):
+            delay = start + offset - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            futures.append(pool.submit(call, message, start + offset))
+        results = [future.result() for future in futures]
+    return results, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--target", nargs="+", choices=TARGETS, default=["graph", "fanout"])
+    parser.add_argument("--qps", type=float, default=5.0)
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds of arrivals per target")
+    parser.add_argument("--workers", type=int, default=32)
+    parser.add_argument("--arrivals", choices=["poisson", "uniform"], default="poisson")
+    parser.add_argument("--backends", choices=["fake", "replay"], default="fake")
+    parser.add_argument("--llm-latency", default="lognormal:0.08:0.5", help="latency spec, see agents.fakes.Latency")
+    parser.add_argument("--embed-latency", default="lognormal:0.02:0.4")
+    parser.add_argument("--weather-latency", default="lognormal:0.05:0.6")
+    parser.add_argument("--pdf", help="PDF to ask about (default: a generated resume)")
+    parser.add_argument("--cache", action="store_true", help="keep the answer and weather caches on")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="write the report here")
+    parser.add_argument("--check", action="store_true", help="exit 1 if a target misses the thresholds below")
+    parser.add_argument("--max-p95-ms", type=float, default=5000)
+    parser.add_argument("--max-error-rate", type=float, default=0.01)
+    parser.add_argument("--min-throughput", type=float, default=0.9, help="fraction of the offered QPS")
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="load-test-")
+    # Caches and indexes read their locations at import time, so configure before importing agents
+    os.environ["AGENT_BACKENDS"] = args.backends
+    os.environ["FAKE_LLM_LATENCY"] = args.llm_latency
+    os.environ["FAKE_EMBED_LATENCY"] = args.embed_latency
+    os.environ["FAKE_WEATHER_LATENCY"] = args.weather_latency
+    os.environ.setdefault("AGENT_CACHE_DIR", tmp)
+    os.environ.setdefault("NUMPY_INDEX_DIR", ":memory:")
+    os.environ.setdefault("KEYWORD_INDEX_DIR", ":memory:")
+    os.environ.setdefault("VECTOR_BACKEND", "numpy")
+    if not args.cache:
+        # The question pool is small; without this most requests would never reach a backend
+        os.environ["ANSWER_CACHE_TTL"] = "0"
+        os.environ["WEATHER_CACHE_TTL"] = "0"
+
+    from langchain_core.messages import HumanMessage
+
+    import nodes.node as node
+    from agents.metrics import get_metrics
+    from agents.registry import get_registry
+    from nodes.fanout import run_questions_parallel
+
+    pdf_path = args.pdf
+    if pdf_path is None:
+        pdf_path = os.path.join(tmp, "resume.pdf")
+        with open(pdf_path, "wb") as f:
+            f.write(make_pdf(resume_pages()))
+    node.DEFAULT_PDF_PATH = pdf_path
+    graph = node.build_graph()
+
+    targets = {
+        "graph": lambda message: graph.invoke({"messages": [HumanMessage(content=message)]}),
+        "fanout": lambda message: raise_failed(run_questions_parallel(node.split_questions(message), pdf_path)),
+        "pdf": lambda message: node.answer_pdf(message, pdf_path),
+        "weather": lambda message: node.answer_weather_question(message),
+    }
+
+    report = {"config": vars(args), "targets": []}
+    failures = []
+    rng = random.Random(args.seed)
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        get_registry().get_pdf_agent(pdf_path)
+        get_registry().get_weather_agent()
+        report["warmup_seconds"] = time.perf_counter() - start
+
+    print(f"backends={args.backends} qps={args.qps:g} duration={args.duration:g}s arrivals={args.arrivals} cache={args.cache} "
+          f"(agents built in {report['warmup_seconds']:.2f}s)")
+    for target in args.target:
+        offsets = arrival_offsets(args.qps, args.duration, args.arrivals == "poisson", rng)
+        messages = make_messages(target, len(offsets), rng)
+        get_metrics().reset()
+        with contextlib.redirect_stdout(io.StringIO()):
+            results, wall = run_phase(targets[target], messages, offsets, args.workers)
+
+        latencies = [seconds for seconds, status in results if status == "ok"]
+        errors = [status for _, status in results if status != "ok"]
+        offered = len(offsets) / args.duration
+        summary = {
+            "target": target,
+            "requests": len(results),
+            "errors": len(errors),
+            "error_rate": len(errors) / len(results) if results else 0.0,
+            "offered_qps": offered,
+            "throughput_qps": len(latencies) / wall if wall else 0.0,
+            "p50_ms": 1000 * percentile(latencies, 0.50),
+            "p95_ms": 1000 * percentile(latencies, 0.95),
+            "p99_ms": 1000 * percentile(latencies, 0.99),
+            "stages": get_metrics().summary(),
+            "sample_errors": sorted(set(errors))[:5],
+        }
+        report["targets"].append(summary)
+
+        print(f"\n[{target}] {summary['requests']} requests, {summary['errors']} errors, "
+              f"offered {offered:.2f} qps, throughput {summary['throughput_qps']:.2f} qps, "
+              f"end-to-end p50 {summary['p50_ms']:.0f} / p95 {summary['p95_ms']:.0f} / p99 {summary['p99_ms']:.0f} ms")
+        print(f"  {'stage':>12} {'name':<28} {'status':>6} {'count':>6} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+        for row in summary["stages"]:
+            print(f"  {row['stage']:>12} {row['name'][:28]:<28} {row['status']:>6} {row['count']:>6} "
+                  f"{row['p50_ms']:>8.1f} {row['p95_ms']:>8.1f} {row['p99_ms']:>8.1f}")
+        for error in summary["sample_errors"]:
+            print(f"  {error}")
+
+        if summary["error_rate"] > args.max_error_rate:
+            failures.append(f"{target}: error rate {summary['error_rate']:.1%} > {args.max_error_rate:.1%}")
+        if summary["p95_ms"] > args.max_p95_ms:
+            failures.append(f"{target}: p95 {summary['p95_ms']:.0f} ms > {args.max_p95_ms:.0f} ms")
+        if summary["throughput_qps"] < args.min_throughput * offered:
+            failures.append(f"{target}: throughput {summary['throughput_qps']:.2f} < {args.min_throughput:.0%} of {offered:.2f} qps")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    if args.check:
+        for failure in failures:
+            print(f"FAIL {failure}")
+        if failures:
+            sys.exit(1)
+        print("\nAll targets within thresholds")
+
+
+if __name__ == "__main__":
+    main()
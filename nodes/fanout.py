@@ -0,0 +1,313 @@
+import asyncio
+import operator
+import os
+import queue
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Annotated, List
+from langchain_core.messages import HumanMessage
+from langgraph.graph import MessagesState, StateGraph, START, END
+from langgraph.types import Send
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from agents.ingest_cache import read_source
+from nodes.node import aanswer_question, answer_question, classify_question, split_questions, stream_question
+
+MAX_CONCURRENCY = int(os.getenv("FANOUT_MAX_CONCURRENCY", "4"))
+BRANCH_TIMEOUT = float(os.getenv("FANOUT_BRANCH_TIMEOUT", "120"))
+
+# Shared pool that graph branches run on so a branch can be abandoned on timeout
+_branch_executor = ThreadPoolExecutor(max_workers=32, thread_name_prefix="fanout-branch")
+
+
+def _branch_result(index: int, question: str, answer: str, status: str, seconds: float) -> dict:
+    return {
+        "index": index,
+        "question": question,
+        "agent": classify_question(question),
+        "answer": answer,
+        "status": status,
+        "seconds": seconds,
+    }
+
+
+def _timeout_answer(timeout: float) -> str:
+    return f"No answer within {timeout:g}s."
+
+
+def run_questions_parallel(
+    questions: List[str],
+    pdf_path: str = None,
+    max_concurrency: int = MAX_CONCURRENCY,
+    timeout: float = BRANCH_TIMEOUT,
+    answer_fn=answer_question,
+) -> List[dict]:
+    """Answer independent sub-questions concurrently, in input order.
+
+    At most ``max_concurrency`` branches run at once. Each branch gets
+    ``timeout`` seconds from the moment it starts; a branch that overruns is
+    reported with status "timeout" while the others still return. Python
+    threads cannot be killed, so an abandoned branch keeps its worker until
+    the underlying call returns. ``pdf_path`` may also be the PDF's bytes
+    or a file-like object, which is read once and shared by every branch
+    (see PDFAgent).
+    """
+    if not questions:
+        return []
+    pdf_path = read_source(pdf_path)
+
+    results = [None] * len(questions)
+    started = {}
+    executor = ThreadPoolExecutor(
+        max_workers=max(1, min(max_concurrency, len(questions))),
+        thread_name_prefix="fanout",
+    )
+
+    def branch(index, question):
+        started[index] = time.monotonic()
+        return answer_fn(question, pdf_path)
+
+    futures = {executor.submit(branch, i, q): i for i, q in enumerate(questions)}
+    pending = set(futures)
+    try:
+        while pending:
+            now = time.monotonic()
+            for future in list(pending):
+                index = futures[future]
+                if index in started and now - started[index] >= timeout and not future.done():
+                    pending.discard(future)
+                    results[index] = _branch_result(
+                        index, questions[index], _timeout_answer(timeout), "timeout", now - started[index]
+                    )
+            if not pending:
+                break
+
+            deadlines = [started[futures[f]] + timeout - now for f in pending if futures[f] in started]
+            # Queued branches have no deadline yet; poll until a worker picks them up
+            wait_for = min(deadlines) if deadlines else 0.05
+            done, pending = wait(pending, timeout=max(wait_for, 0.0), return_when=FIRST_COMPLETED)
+
+            finished = time.monotonic()
+            for future in done:
+                index = futures[future]
+                seconds = finished - started.get(index, finished)
+                try:
+                    results[index] = _branch_result(index, questions[index], future.result(), "ok", seconds)
+                except Exception as e:
+                    results[index] = _branch_result(index, questions[index], f"Error: {e}", "error", seconds)
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+    return results
+
+
+def stream_questions_parallel(
+    questions: List[str],
+    pdf_path: str = None,
+    max_concurrency: int = MAX_CONCURRENCY,
+    timeout: float = BRANCH_TIMEOUT,
+    stream_fn=stream_question,
+):
+    """Stream several sub-questions at once, interleaving their events.
+
+    Yields the agent stream events of every branch as they arrive, each
+    tagged with the branch ``index`` and ``agent``. Every branch ends with
+    exactly one "final" event; branches that fail, overrun ``timeout`` or
+    whose stream ends without one get a final event with status
+    "error"/"timeout" instead.
+    """
+    pdf_path = read_source(pdf_path)
+    events = queue.Queue()
+    slots = threading.Semaphore(max(1, max_concurrency))
+    started = {}
+    finished = set()
+
+    def branch(index, question):
+        with slots:
+            started[index] = time.monotonic()
+            final = False
+            try:
+                for event in stream_fn(question, pdf_path):
+                    events.put((index, event))
+                    final = final or event["type"] == "final"
+            except Exception as e:
+                events.put((index, {"type": "final", "text": f"Error: {e}", "status": "error"}))
+                return
+            if not final:
+                # Finish the branch now rather than at its timeout
+                events.put((index, {"type": "final", "text": "Error: the stream ended without an answer.", "status": "error"}))
+
+    for i, q in enumerate(questions):
+        threading.Thread(target=branch, args=(i, q), name=f"fanout-stream-{i}", daemon=True).start()
+
+    while len(finished) < len(questions):
+        now = time.monotonic()
+        for index, began in list(started.items()):
+            if index not in finished and now - began >= timeout:
+                finished.add(index)
+                yield {
+                    "index": index,
+                    "agent": classify_question(questions[index]),
+                    "type": "final",
+                    "text": _timeout_answer(timeout),
+                    "status": "timeout",
+                }
+        try:
+            index, event = events.get(timeout=0.05)
+        except queue.Empty:
+            continue
+        if index in finished:
+            continue
+        if event["type"] == "final":
+            finished.add(index)
+            event.setdefault("status", "ok")
+        yield {"index": index, "agent": classify_question(questions[index]), **event}
+
+
+async def arun_questions_parallel(
+    questions: List[str],
+    pdf_path: str = None,
+    max_concurrency: int = MAX_CONCURRENCY,
+    timeout: float = BRANCH_TIMEOUT,
+    answer_fn=aanswer_question,
+) -> List[dict]:
+    # Async counterpart of run_questions_parallel; overrunning branches are cancelled
+    pdf_path = read_source(pdf_path)
+    semaphore = asyncio.Semaphore(max(1, max_concurrency))
+
+    async def branch(index, question):
+        async with semaphore:
+            start = time.monotonic()
+            try:
+                answer = await asyncio.wait_for(answer_fn(question, pdf_path), timeout)
+                status = "ok"
+            except asyncio.TimeoutError:
+                answer, status = _timeout_answer(timeout), "timeout"
+            except Exception as e:
+                answer, status = f"Error: {e}", "error"
+            return _branch_result(index, question, answer, status, time.monotonic() - start)
+
+    return list(await asyncio.gather(*(branch(i, q) for i, q in enumerate(questions))))
+
+
+class FanOutState(MessagesState):
+    questions: List[str]
+    answers: Annotated[List[dict], operator.add]
+    pdf_path: str
+    branch_timeout: float
+
+
+def split_node(state: FanOutState):
+    user_message = None
+    for message in reversed(state["messages"]):
+        if isinstance(message, HumanMessage):
+            user_message = message.content
+            break
+    if user_message is None:
+        raise ValueError("No user message found in state.")
+    return {"questions": split_questions(user_message)}
+
+
+def dispatch_questions(state: FanOutState):
+    return [
+        Send("answer_branch", {
+            "index": i,
+            "question": q,
+            "pdf_path": state.get("pdf_path"),
+            "timeout": state.get("branch_timeout") or BRANCH_TIMEOUT,
+        })
+        for i, q in enumerate(state["questions"])
+    ]
+
+
+def answer_branch(branch: dict):
+    start = time.monotonic()
+    timeout = branch["timeout"]
+    future = _branch_executor.submit(answer_question, branch["question"], branch.get("pdf_path"))
+    try:
+        answer, status = future.result(timeout=timeout), "ok"
+    except TimeoutError:
+        answer, status = _timeout_answer(timeout), "timeout"
+    except Exception as e:
+        answer, status = f"Error: {e}", "error"
+    result = _branch_result(branch["index"], branch["question"], answer, status, time.monotonic() - start)
+    return {"answers": [result]}
+
+
+async def aanswer_branch(branch: dict):
+    start = time.monotonic()
+    timeout = branch["timeout"]
+    try:
+        answer = await asyncio.wait_for(aanswer_question(branch["question"], branch.get("pdf_path")), timeout)
+        status = "ok"
+    except asyncio.TimeoutError:
+        answer, status = _timeout_answer(timeout), "timeout"
+    except Exception as e:
+        answer, status = f"Error: {e}", "error"
+    result = _branch_result(branch["index"], branch["question"], answer, status, time.monotonic() - start)
+    return {"answers": [result]}
+
+
+def merge_node(state: FanOutState):
+    # Branches finish in any order; restore the order the user asked in
+    ordered = sorted(state["answers"], key=lambda a: a["index"])
+    return {"messages": [HumanMessage(content=a["answer"], name=a["agent"]) for a in ordered]}
+
+
+def build_parallel_graph(use_async: bool = False):
+    workflow = StateGraph(FanOutState)
+    workflow.add_node("split", split_node)
+    workflow.add_node("answer_branch", aanswer_branch if use_async else answer_branch)
+    workflow.add_node("merge", merge_node)
+
+    workflow.add_edge(START, "split")
+    workflow.add_conditional_edges("split", dispatch_questions, ["answer_branch"])
+    workflow.add_edge("answer_branch", "merge")
+    workflow.add_edge("merge", END)
+
+    return workflow.compile()
+
+
+def run_parallel_graph(
+    user_input: str,
+    pdf_path: str = None,
+    max_concurrency: int = MAX_CONCURRENCY,
+    timeout: float = BRANCH_TIMEOUT,
+):
+    graph = build_parallel_graph()
+    state = graph.invoke(
+        {
+            "messages": [HumanMessage(content=user_input)],
+            "pdf_path": read_source(pdf_path),
+            "branch_timeout": timeout,
+        },
+        config={"max_concurrency": max_concurrency},
+    )
+    return sorted(state["answers"], key=lambda a: a["index"])
+
+
+async def arun_parallel_graph(
+    user_input: str,
+    pdf_path: str = None,
+    max_concurrency: int = MAX_CONCURRENCY,
+    timeout: float = BRANCH_TIMEOUT,
+):
+    graph = build_parallel_graph(use_async=True)
+    state = await graph.ainvoke(
+        {
+            "messages": [HumanMessage(content=user_input)],
+            "pdf_path": read_source(pdf_path),
+            "branch_timeout": timeout,
+        },
+        config={"max_concurrency": max_concurrency},
+    )
+    return sorted(state["answers"], key=lambda a: a["index"])
+
+
+if __name__ == "__main__":
+    user_input = "What organizations has Sharath worked for and tell me the weather in Mumbai"
+    start = time.perf_counter()
+    for result in run_questions_parallel(split_questions(user_input)):
+        print(f"{result['agent']} ({result['status']}, {result['seconds']:.2f}s): {result['answer']}")
+    print(f"Total: {time.perf_counter() - start:.2f}s")
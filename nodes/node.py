@@ -1,94 +1,279 @@
+import asyncio
 import os
 import sys
+import threading
 from typing import List, Literal
 from langchain_core.messages import BaseMessage, HumanMessage
-from langgraph.prebuilt import create_react_agent
 from langgraph.graph import MessagesState, END
 from langgraph.types import Command
+from langgraph.config import get_stream_writer
 from langgraph.graph import StateGraph, START
-from IPython.display import Image, display
-import re
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
-from agents.weather_agent import WeatherAgent
-from agents.pdf_agent import PDFAgent
+import agents.metrics_handler  # noqa: F401  (installs the metrics callback handler)
+from agents.registry import get_registry
+from nodes.routing import RoutingEngine
+
+DEFAULT_PDF_PATH = "Sharath_OnePage.pdf"
+# Earlier turns given to the agents' LLM prompts along with the current question
+HISTORY_MAX_CHARS = int(os.getenv("SESSION_HISTORY_MAX_CHARS", "2000"))
+
+
+class ConversationState(MessagesState):
+    # Running summary of turns that were trimmed from ``messages``
+    summary: str
+
+
+PDF_EXAMPLES = [
+    "What organizations has Sharath worked for?",
+    "Where did Sharath study?",
+    "What skills are listed in the resume?",
+    "Summarize Sharath's work experience",
+    "Which projects did he build at his last job?",
+    "What programming languages does Sharath know?",
+    "What degree does he hold and from which university?",
+    "List the certifications in the document",
+    "Who was his manager on the data team?",
+    "What does the PDF say about machine learning?",
+    "How many years of experience does he have?",
+    "What was his role at the company?",
+]
+WEATHER_EXAMPLES = [
+    "What is the weather in Mumbai?",
+    "Tell me the weather in London",
+    "Is it raining in Bangalore right now?",
+    "What's the temperature in New York today?",
+    "Weather forecast for Paris",
+    "How hot is it in Delhi?",
+    "Will it be sunny in Chennai tomorrow?",
+    "How humid is it in Singapore?",
+    "Is it cold in Toronto?",
+    "What are the current conditions and wind speed in Tokyo?",
+]
 
 
 def split_questions(user_message: str) -> List[str]:
-    # Naive split on ' and ', ' then ', case insensitive
-    parts = re.split(r'\band then\b|\band\b|\bthen\b', user_message, flags=re.IGNORECASE)
-    return [part.strip() for part in parts if part.strip()]
-
-def classify_question(question: str) -> Literal["pdf_agent", "weather_agent"]:
-    # Simple keyword-based classification
-    if re.search(r'\bweather\b', question, re.IGNORECASE):
-        return "weather_agent"
-    else:
-        return "pdf_agent"
+    # Splits only where the parts are independent questions; see nodes.routing
+    return get_routing_engine().split(user_message)
 
-def pdf_agent_node(state: MessagesState) -> Command[Literal["weather_agent", END]]:
-    pdf_agent = PDFAgent(pdf_path="Sharath_OnePage.pdf")
-    user_message = None
+def classify_question(question: str) -> str:
+    # Name of a registered agent, e.g. "pdf_agent" or "weather_agent"
+    return get_routing_engine().classify(question)
+
+def answer_weather(weather_agent, question: str, context: str = "") -> str:
+    # The agent looks up "weather in <location>" directly (cached, no LLM) and
+    # hands anything else, with the conversation ``context``, to its ReAct loop
+    return str(weather_agent.ask(question, context))
+
+async def aanswer_weather(weather_agent, question: str, context: str = "") -> str:
+    return str(await weather_agent.aask(question, context))
+
+def stream_weather(weather_agent, question: str, context: str = ""):
+    return weather_agent.stream(question, context)
+
+def answer_pdf(question: str, pdf_path: str = None) -> str:
+    return get_registry().get_pdf_agent(pdf_path or DEFAULT_PDF_PATH).ask(question)
+
+def stream_pdf(question: str, pdf_path: str = None):
+    return get_registry().get_pdf_agent(pdf_path or DEFAULT_PDF_PATH).stream(question)
+
+async def aanswer_pdf(question: str, pdf_path: str = None) -> str:
+    # Building an agent can ingest a PDF, so keep it off the event loop
+    pdf_agent = await asyncio.to_thread(get_registry().get_pdf_agent, pdf_path or DEFAULT_PDF_PATH)
+    return await pdf_agent.aask(question)
+
+def answer_weather_question(question: str, pdf_path: str = None) -> str:
+    return answer_weather(get_registry().get_weather_agent(), question)
+
+def stream_weather_question(question: str, pdf_path: str = None):
+    return stream_weather(get_registry().get_weather_agent(), question)
+
+async def aanswer_weather_question(question: str, pdf_path: str = None) -> str:
+    weather_agent = await asyncio.to_thread(get_registry().get_weather_agent)
+    return await aanswer_weather(weather_agent, question)
+
+def build_routing_engine(**kwargs) -> RoutingEngine:
+    """RoutingEngine with the PDF and weather agents; register more on the result.
+
+    ROUTER_STRATEGY picks "centroid" (default, local) or "llm" (one call to
+    the shared LLM router per new message).
+    """
+    strategy = kwargs.pop("strategy", None) or os.getenv("ROUTER_STRATEGY", "centroid")
+    if strategy == "llm" and kwargs.get("llm") is None:
+        from agents.backends import get_backends
+
+        kwargs["llm"] = get_backends().llm()
+    kwargs.setdefault("cache_size", int(os.getenv("ROUTER_CACHE_SIZE", "1024")))
+    engine = RoutingEngine(default_agent="pdf_agent", strategy=strategy, **kwargs)
+    engine.register(
+        "pdf_agent",
+        PDF_EXAMPLES,
+        description="Questions about the uploaded PDF (a resume): people, employers, education, skills, projects.",
+        answer=answer_pdf,
+        aanswer=aanswer_pdf,
+        stream=stream_pdf,
+    )
+    engine.register(
+        "weather_agent",
+        WEATHER_EXAMPLES,
+        description="Current weather, temperature or forecast for a location.",
+        answer=answer_weather_question,
+        aanswer=aanswer_weather_question,
+        stream=stream_weather_question,
+    )
+    return engine
+
+_routing_engine = None
+_routing_engine_lock = threading.Lock()
+
+def get_routing_engine() -> RoutingEngine:
+    global _routing_engine
+    with _routing_engine_lock:
+        if _routing_engine is None:
+            _routing_engine = build_routing_engine()
+        return _routing_engine
+
+def answer_question(question: str, pdf_path: str = None) -> str:
+    # Answer one already-split sub-question with the agent it classifies to
+    return get_routing_engine().agent(classify_question(question)).answer(question, pdf_path)
+
+def stream_question(question: str, pdf_path: str = None):
+    # Streaming counterpart of answer_question; see agents.streaming for events
+    return get_routing_engine().agent(classify_question(question)).stream(question, pdf_path)
+
+def forward_stream(events, agent_name: str) -> str:
+    # Re-emit agent events on the graph's "custom" stream and return the answer
+    writer = get_stream_writer()
+    text_result = ""
+    for event in events:
+        writer({"agent": agent_name, **event})
+        if event["type"] == "final":
+            text_result = event["text"]
+    return text_result
+
+async def aanswer_question(question: str, pdf_path: str = None) -> str:
+    return await get_routing_engine().agent(classify_question(question)).aanswer(question, pdf_path)
+
+def last_user_message(state: MessagesState) -> str:
+    # Agent replies are HumanMessages too, but named after the agent
     for message in reversed(state["messages"]):
-        if isinstance(message, HumanMessage):
-            user_message = message.content
-            break
-    if user_message is None:
-        raise ValueError("No user message found in state.")
-
-    result = pdf_agent.agent.invoke({"input": user_message})
-    # Extract string from result
-    if isinstance(result, dict):
-        # Try common keys
-        text_result = result.get("output") or result.get("text") or str(result)
-    else:
-        text_result = str(result)
+        if isinstance(message, HumanMessage) and message.name is None:
+            return message.content
+    raise ValueError("No user message found in state.")
+
+def conversation_context(state: MessagesState, max_chars: int = None) -> str:
+    """Summary plus the turns before the current question, at most ``max_chars``.
+
+    Empty for the first turn, so one-shot runs pass the question unchanged.
+    """
+    max_chars = HISTORY_MAX_CHARS if max_chars is None else max_chars
+    messages = state["messages"]
+    # The current turn starts at the last message the user (not an agent) sent
+    current = next((i for i in range(len(messages) - 1, -1, -1)
+                    if isinstance(messages[i], HumanMessage) and messages[i].name is None), len(messages))
+    lines = [f"{m.name or ('user' if isinstance(m, HumanMessage) else m.type)}: {m.content}" for m in messages[:current]]
+    history = "\n".join(lines)[-max_chars:] if max_chars else ""
+    summary = state.get("summary") or ""
+    parts = []
+    if summary:
+        parts.append(f"Conversation summary: {summary}")
+    if history:
+        parts.append(f"Recent conversation:\n{history}")
+    return "\n".join(parts)
+
+def pdf_agent_node(state: MessagesState) -> Command[Literal["weather_agent", END]]:
+    pdf_agent = get_registry().get_pdf_agent(DEFAULT_PDF_PATH)
+    # Retrieval and the answer cache see the current question; history only reaches the prompt
+    events = pdf_agent.stream(last_user_message(state), conversation_context(state))
+
+    text_result = forward_stream(events, "pdf_agent")
 
     final_msg = HumanMessage(content=text_result, name="pdf_agent")
-    goto = get_next_node(final_msg, "weather_agent")
+    goto = get_next_node(final_msg, "weather_agent", state)
     return Command(
-        update={"messages": state["messages"] + [final_msg]},
+        # Only the new message; the add_messages reducer appends it
+        update={"messages": [final_msg]},
         goto=goto,
     )
 
 def weather_agent_node(state: MessagesState) -> Command[Literal["pdf_agent", END]]:
-    weather_agent = WeatherAgent()
-    user_message = None
-    for message in reversed(state["messages"]):
-        if isinstance(message, HumanMessage):
-            user_message = message.content
-            break
-    if user_message is None:
-        raise ValueError("No user message found in state.")
-
-    match = re.search(r"weather in ([\w\s,]+)", user_message, re.IGNORECASE)
-    location = match.group(1).strip() if match else user_message
-    result = weather_agent.ask(location)
+    weather_agent = get_registry().get_weather_agent()
+    # The location comes from the current question only; history is for the agent fallback
+    stream = stream_weather(weather_agent, last_user_message(state), conversation_context(state))
+
+    result = forward_stream(stream, "weather_agent")
     final_msg = HumanMessage(content=result, name="weather_agent")
-    goto = get_next_node(final_msg, "pdf_agent")
+    goto = get_next_node(final_msg, "pdf_agent", state)
+    return Command(
+        # Only the new message; the add_messages reducer appends it
+        update={"messages": [final_msg]},
+        goto=goto,
+    )
+
+async def apdf_agent_node(state: MessagesState) -> Command[Literal["weather_agent", END]]:
+    pdf_agent = await asyncio.to_thread(get_registry().get_pdf_agent, DEFAULT_PDF_PATH)
+
+    result = await pdf_agent.aask(last_user_message(state), conversation_context(state))
+    final_msg = HumanMessage(content=result, name="pdf_agent")
+    goto = get_next_node(final_msg, "weather_agent", state)
     return Command(
-        update={"messages": state["messages"] + [final_msg]},
+        # Only the new message; the add_messages reducer appends it
+        update={"messages": [final_msg]},
         goto=goto,
     )
 
-def get_next_node(last_message: BaseMessage, goto: str):
+async def aweather_agent_node(state: MessagesState) -> Command[Literal["pdf_agent", END]]:
+    weather_agent = await asyncio.to_thread(get_registry().get_weather_agent)
+
+    result = await aanswer_weather(weather_agent, last_user_message(state), conversation_context(state))
+    final_msg = HumanMessage(content=result, name="weather_agent")
+    goto = get_next_node(final_msg, "pdf_agent", state)
+    return Command(
+        # Only the new message; the add_messages reducer appends it
+        update={"messages": [final_msg]},
+        goto=goto,
+    )
+
+def answered_this_turn(state: MessagesState, agent_name: str) -> bool:
+    for message in reversed(state["messages"]):
+        if isinstance(message, HumanMessage) and message.name is None:
+            return False
+        if message.name == agent_name:
+            return True
+    return False
+
+def get_next_node(last_message: BaseMessage, goto: str, state: MessagesState = None):
+    # Each agent answers at most once per user turn, otherwise the two
+    # agents would hand the turn back and forth until the recursion limit
     if "FINAL ANSWER" in last_message.content:
         return END
+    if state is not None and answered_this_turn(state, goto):
+        return END
     return goto
 
-def build_graph():
-    workflow = StateGraph(MessagesState)
-    workflow.add_node("pdf_agent", pdf_agent_node)
-    workflow.add_node("weather_agent", weather_agent_node)
+def build_graph(use_async: bool = False, checkpointer=None, compact_node=None):
+    # Async nodes are only usable through graph.ainvoke/astream. With a
+    # checkpointer, state persists per thread_id (see nodes.sessions); an
+    # optional compact_node trims and summarizes history before each turn
+    workflow = StateGraph(ConversationState)
+    workflow.add_node("pdf_agent", apdf_agent_node if use_async else pdf_agent_node)
+    workflow.add_node("weather_agent", aweather_agent_node if use_async else weather_agent_node)
 
-    workflow.add_edge(START, "pdf_agent")
+    if compact_node is not None:
+        workflow.add_node("compact", compact_node)
+        workflow.add_edge(START, "compact")
+        workflow.add_edge("compact", "pdf_agent")
+    else:
+        workflow.add_edge(START, "pdf_agent")
     workflow.add_edge("pdf_agent", "weather_agent")
     workflow.add_edge("weather_agent", END)
 
-    graph = workflow.compile()
+    graph = workflow.compile(checkpointer=checkpointer)
     return graph
 
 if __name__ == "__main__":
+    from IPython.display import Image, display
+
     graph = build_graph()
     display(Image(graph.get_graph().draw_mermaid_png()))
 
@@ -98,24 +283,10 @@ if __name__ == "__main__":
     # Split into sub-questions
     questions = split_questions(user_input)
 
-    # Prepare empty message list to accumulate conversation
-    messages = []
-
-    # Process each question routed to the correct agent node
-    for question in questions:
-        agent_name = classify_question(question)
-        # Run the corresponding node manually with current messages + new question
-        state = {"messages": messages + [HumanMessage(content=question)]}
-        if agent_name == "pdf_agent":
-            cmd = pdf_agent_node(state)
-        else:
-            cmd = weather_agent_node(state)
-
-        # Update messages with agent response
-        messages = cmd.update["messages"]
+    # Independent sub-questions are answered concurrently and come back in order
+    from nodes.fanout import run_questions_parallel
+    results = run_questions_parallel(questions)
 
     # Print all agent responses
-    for msg in messages:
-        if not isinstance(msg, HumanMessage):
-            continue
-        print(f"{msg.name or 'user'}: {msg.content}")
+    for result in results:
+        print(f"{result['agent']}: {result['answer']}")
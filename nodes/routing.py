@@ -0,0 +1,305 @@
+import hashlib
+import json
+import os
+import re
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import List, NamedTuple, Optional
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from agents.metrics import get_metrics
+
+ROUTER_STRATEGIES = ("centroid", "llm")
+
+# Sentence ends always separate questions
+SENTENCE_BOUNDARY = re.compile(r"(?<=[?!;])\s+|(?<=\.)\s+(?=[A-Z])")
+# Places a sentence may hold two questions; they only split if the pieces look independent
+CONNECTOR = re.compile(r"\s*,?\s*\b(?:and then|and also|and|then|also|plus)\b\s*|\s*,\s+", re.IGNORECASE)
+# A piece starting like this is its own clause: "... and tell me the weather in Pune"
+CLAUSE_START = re.compile(
+    r"^(?:what|what's|whats|who|whom|whose|where|when|which|why|how|is|are|was|were|do|does|did|can|could|"
+    r"will|would|should|has|have|had|tell|give|show|list|describe|summari[sz]e|explain|find|get|check|"
+    r"please|i|i'd|let|let's)\b",
+    re.IGNORECASE,
+)
+# Words that point back at something the previous clause named: "... and what is the weather there?"
+REFERS_BACK = re.compile(r"\b(?:there|that|those|them|it)\b", re.IGNORECASE)
+# ... except "is there ..." and weather's impersonal "it": "and is it raining in Kolkata"
+WEATHER_WORDS = r"rain(?:ing|y)?|snow(?:ing|y)?|sunny|cloudy|foggy|stormy|windy|humid|hot|warm|cold|chilly|freezing"
+NOT_REFERRING = re.compile(
+    rf"\b(?:is|are|was|were)\s+there\b|\bthere\s+(?:is|are|was|were)\b|"
+    rf"\bit(?:'s|\s+is|\s+was|\s+will)?\s+(?:be\s+|going\s+to\s+(?:be\s+)?)?(?:{WEATHER_WORDS})\b|"
+    rf"\b(?:{WEATHER_WORDS})\s+(?:is|was|will)\s+it\b",
+    re.IGNORECASE,
+)
+# Usually the PDF's subject rather than the previous clause, so only a hint
+PERSONAL = re.compile(r"\b(?:he|him|his|she|her|they|their)\b", re.IGNORECASE)
+TOKEN = re.compile(r"[a-z0-9']+")
+
+
+class Route(NamedTuple):
+    question: str
+    agent: str
+    score: float
+
+
+class AgentRoute:
+    """A routable agent: example questions that define it and the callables that answer for it."""
+
+    def __init__(self, name: str, examples, description: str = "", answer=None, aanswer=None, stream=None):
+        self.name = name
+        self.examples = list(examples)
+        self.description = description
+        self.answer = answer
+        self.aanswer = aanswer
+        self.stream = stream
+
+
+class HashingEmbeddings:
+    """Local bag of words plus character trigrams, hashed into ``size`` dimensions.
+
+    Needs no model or network, costs microseconds per question and is
+    robust to plurals and typos ("forecasts", "temprature"). Any LangChain
+    ``Embeddings`` can be passed to RoutingEngine instead.
+    """
+
+    def __init__(self, size: int = 1024):
+        self.size = size
+
+    def _index(self, feature: str) -> int:
+        return int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=4).digest(), "little") % self.size
+
+    def _embed(self, text: str):
+        vector = np.zeros(self.size, dtype=np.float32)
+        for word in TOKEN.findall(text.lower()):
+            vector[self._index("w:" + word)] += 2.0
+            padded = f"<{word}>"
+            for i in range(len(padded) - 2):
+                vector[self._index(padded[i:i + 3])] += 1.0
+        return vector
+
+    def embed_documents(self, texts):
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text):
+        return self._embed(text)
+
+
+def _unit(vector):
+    vector = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+class RoutingEngine:
+    """Split a user message into questions and pick an agent for each, in one cheap pass.
+
+    Every agent is registered with example questions; their normalized mean
+    embedding is the agent's centroid. A message is cut at sentence ends,
+    then at connectors ("and", "then", commas). The pieces are embedded in
+    one batch. A connector separates two questions only when the piece
+    after it starts a new clause, or when both sides confidently belong to
+    different agents. So "Tom and Jerry's employers" stays one question,
+    and so does a piece that refers back ("... and what is the weather
+    there?"). A new clause that only mentions "he" or "his" splits off
+    when it is nearest to a different agent than the text before it.
+    Each question goes to its nearest centroid, or to ``default_agent`` when
+    no centroid is close.
+
+    With ``strategy="llm"`` one structured LLM call splits and classifies
+    instead, and any reply that cannot be parsed falls back to the
+    centroids. Results are LRU-cached per input, so repeated messages and
+    the per-question lookups made while answering cost nothing.
+    """
+
+    def __init__(
+        self,
+        embeddings=None,
+        default_agent: str = None,
+        strategy: str = "centroid",
+        llm=None,
+        min_score: float = 0.2,
+        min_margin: float = 0.05,
+        cache_size: int = 1024,
+    ):
+        if strategy not in ROUTER_STRATEGIES:
+            raise ValueError(f"Unknown routing strategy {strategy!r}; expected one of {ROUTER_STRATEGIES}")
+        if strategy == "llm" and llm is None:
+            raise ValueError('The "llm" routing strategy needs an llm')
+        self.embeddings = embeddings or HashingEmbeddings()
+        self.default_agent = default_agent
+        self.strategy = strategy
+        self.llm = llm
+        self.min_score = min_score
+        self.min_margin = min_margin
+        self.cache_size = cache_size
+        self._agents = OrderedDict()
+        self._names = []
+        self._centroids = None
+        self._lock = threading.Lock()
+        self._cache = OrderedDict()
+
+    def register(self, name: str, examples, description: str = "", answer=None, aanswer=None, stream=None) -> AgentRoute:
+        """Add (or replace) an agent; ``answer(question, pdf_path)`` and friends are looked up via ``agent(name)``."""
+        if not examples:
+            raise ValueError(f"Agent {name!r} needs at least one example question")
+        route = AgentRoute(name, examples, description, answer, aanswer, stream)
+        vectors = self.embeddings.embed_documents(route.examples)
+        centroid = _unit(np.mean([_unit(v) for v in vectors], axis=0))
+        with self._lock:
+            self._agents[name] = (route, centroid)
+            self._names = list(self._agents)
+            self._centroids = np.stack([c for _, c in self._agents.values()])
+            if self.default_agent is None:
+                self.default_agent = name
+            # Earlier routes may have gone elsewhere
+            self._cache.clear()
+        return route
+
+    @property
+    def agents(self) -> List[str]:
+        return list(self._names)
+
+    def agent(self, name: str) -> AgentRoute:
+        try:
+            return self._agents[name][0]
+        except KeyError:
+            raise KeyError(f"No agent registered as {name!r}; known agents: {self.agents}") from None
+
+    def route(self, text: str) -> List[Route]:
+        """(question, agent, score) for every question in ``text``, in the order asked."""
+        key = " ".join(text.split())
+        with self._lock:
+            routes = self._cache.get(key)
+            if routes is not None:
+                self._cache.move_to_end(key)
+        if routes is not None:
+            get_metrics().incr("cache_lookups", cache="routing", result="hit")
+            return list(routes)
+
+        get_metrics().incr("cache_lookups", cache="routing", result="miss")
+        start = time.perf_counter()
+        routes = None
+        if self.strategy == "llm":
+            routes = self._route_llm(key)
+        if routes is None:
+            routes = self._route_centroid(key)
+        get_metrics().observe("route", time.perf_counter() - start, self.strategy)
+
+        with self._lock:
+            self._cache[key] = tuple(routes)
+            # Answering classifies each split question again; seed those lookups
+            for route in routes:
+                self._cache.setdefault(" ".join(route.question.split()), (route,))
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return list(routes)
+
+    def split(self, text: str) -> List[str]:
+        return [route.question for route in self.route(text)]
+
+    def classify(self, question: str) -> str:
+        """The agent for one already split question."""
+        routes = self.route(question)
+        if len(routes) == 1:
+            return routes[0].agent
+        # Several questions in one: route the whole text to its overall nearest agent
+        agent, _, _ = self._nearest(self.embeddings.embed_query(question))
+        return agent
+
+    def _nearest(self, vector):
+        scores = self._centroids @ _unit(vector)
+        order = np.argsort(scores)[::-1]
+        best = float(scores[order[0]])
+        margin = best - float(scores[order[1]]) if len(order) > 1 else best
+        if best < self.min_score:
+            return self.default_agent, best, 0.0
+        return self._names[order[0]], best, margin
+
+    def _confident(self, vector):
+        agent, score, margin = self._nearest(vector)
+        return agent if score >= self.min_score and margin >= self.min_margin else None
+
+    def _route_centroid(self, text: str) -> List[Route]:
+        if self._centroids is None:
+            raise RuntimeError("Register at least one agent before routing")
+        sentences = [s.strip() for s in SENTENCE_BOUNDARY.split(text) if s.strip()]
+        pieces = [[p.strip() for p in CONNECTOR.split(s) if p and p.strip()] for s in sentences]
+        flat = [p for sentence in pieces for p in sentence]
+        if not flat:
+            return []
+        vectors = iter(np.asarray(self.embeddings.embed_documents(flat), dtype=np.float32))
+
+        routes = []
+        for sentence, sentence_pieces in zip(sentences, pieces):
+            if not sentence_pieces:
+                continue
+            groups = []  # [start piece, end piece, summed vector]
+            for i, piece in enumerate(sentence_pieces):
+                vector = next(vectors)
+                if groups and not self._starts_question(piece, groups[-1][2], vector):
+                    groups[-1][1] = i
+                    groups[-1][2] = groups[-1][2] + vector
+                else:
+                    groups.append([i, i, vector])
+            for first, last, vector in groups:
+                question = self._substring(sentence, sentence_pieces[first], sentence_pieces[last])
+                agent, score, _ = self._nearest(vector)
+                routes.append(Route(question, agent, score))
+        return routes
+
+    def _starts_question(self, piece: str, previous, vector) -> bool:
+        if REFERS_BACK.search(NOT_REFERRING.sub(" ", piece)):
+            # Answering it needs the previous clause, so they stay one question
+            return False
+        if CLAUSE_START.match(piece):
+            if PERSONAL.search(piece):
+                # "... and which year did he graduate" continues a question for the same agent
+                return self._nearest(previous)[0] != self._nearest(vector)[0]
+            return True
+        before, after = self._confident(previous), self._confident(vector)
+        return before is not None and after is not None and before != after
+
+    @staticmethod
+    def _substring(sentence: str, first: str, last: str) -> str:
+        # The original wording between the pieces, connectors inside a question included
+        start = sentence.find(first)
+        end = sentence.find(last, start) + len(last)
+        return sentence[start:end].strip(" ,")
+
+    def _route_llm(self, text: str) -> Optional[List[Route]]:
+        catalog = "\n".join(
+            f"- {name}: {route.description or '; '.join(route.examples[:3])}" for name, (route, _) in self._agents.items()
+        )
+        prompt = (
+            "Split the user's message into independent questions and assign each one to exactly one agent.\n"
+            f"Agents:\n{catalog}\n"
+            "Keep a question whole when its parts depend on each other or only make sense together.\n"
+            'Reply with JSON only: [{"question": "...", "agent": "<agent name>"}, ...]\n\n'
+            f"Message: {text}"
+        )
+        try:
+            reply = self.llm.invoke(prompt)
+            content = getattr(reply, "content", reply)
+            match = re.search(r"\[.*\]", content, re.DOTALL)
+            items = json.loads(match.group(0) if match else content)
+            routes = [
+                Route(str(item["question"]).strip(), item["agent"], 1.0)
+                for item in items
+                if str(item.get("question", "")).strip()
+            ]
+        except Exception as e:
+            print(f"LLM routing failed ({e}); using centroid routing")
+            return None
+        if not routes or any(route.agent not in self._agents for route in routes):
+            print("LLM routing returned an unknown agent; using centroid routing")
+            return None
+        return routes
+
+    def metrics(self) -> dict:
+        with self._lock:
+            return {"agents": len(self._agents), "cache_size": len(self._cache), "strategy": self.strategy}
@@ -0,0 +1,253 @@
+import asyncio
+import os
+import queue
+import sqlite3
+import sys
+import threading
+import uuid
+from langchain_core.messages import HumanMessage, RemoveMessage
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from agents.ingest_cache import CACHE_DIR
+from nodes.node import build_graph
+
+CHECKPOINTER = os.getenv("SESSION_CHECKPOINTER", "memory")
+CHECKPOINT_DB = os.getenv("SESSION_DB", os.path.join(CACHE_DIR, "sessions.sqlite"))
+# Once a thread holds more than MAX messages, all but the last KEEP are
+# folded into the running summary
+MAX_MESSAGES = int(os.getenv("SESSION_MAX_MESSAGES", "24"))
+KEEP_MESSAGES = int(os.getenv("SESSION_KEEP_MESSAGES", "8"))
+SUMMARY_MAX_CHARS = int(os.getenv("SESSION_SUMMARY_MAX_CHARS", "1500"))
+
+
+def get_checkpointer(kind: str = None, path: str = None):
+    """A LangGraph checkpointer: "memory" (per process) or "sqlite" (survives restarts)."""
+    kind = kind or CHECKPOINTER
+    if kind == "memory":
+        from langgraph.checkpoint.memory import InMemorySaver
+
+        return InMemorySaver()
+    if kind == "sqlite":
+        from langgraph.checkpoint.sqlite import SqliteSaver
+
+        path = path or CHECKPOINT_DB
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        # Graph steps may run on worker threads; SqliteSaver serializes access itself
+        return SqliteSaver(sqlite3.connect(path, check_same_thread=False))
+    raise ValueError(f"Unknown checkpointer {kind!r}; expected 'memory' or 'sqlite'")
+
+
+def _speaker(message) -> str:
+    return message.name or ("user" if isinstance(message, HumanMessage) else message.type)
+
+
+def extractive_summarizer(max_chars: int = SUMMARY_MAX_CHARS):
+    """Summarize by appending trimmed turns to the old summary, keeping the newest ``max_chars``.
+
+    No LLM call, so compaction costs microseconds; used as the fallback of
+    llm_summarizer and by the benchmark.
+    """
+    def summarize(summary: str, messages) -> str:
+        lines = [f"{_speaker(m)}: {' '.join(str(m.content).split())[:200]}" for m in messages]
+        text = "\n".join(([summary] if summary else []) + lines)
+        return text[-max_chars:]
+
+    return summarize
+
+
+def llm_summarizer(llm=None, max_chars: int = SUMMARY_MAX_CHARS):
+    """Summarize trimmed turns with the configured LLM, falling back to extractive_summarizer."""
+    fallback = extractive_summarizer(max_chars)
+
+    def summarize(summary: str, messages) -> str:
+        model = llm
+        if model is None:
+            from agents.backends import get_backends
+
+            model = get_backends().llm()
+        transcript = "\n".join(f"{_speaker(m)}: {m.content}" for m in messages)
+        prompt = (
+            f"Update the running summary of a conversation in at most {max_chars // 6} words. "
+            "Keep names, facts and open questions; drop pleasantries.\n\n"
+            f"Current summary:\n{summary or '(none)'}\n\nNew messages:\n{transcript}\n\nUpdated summary:"
+        )
+        try:
+            return str(model.invoke(prompt).content)[:max_chars]
+        except Exception as e:
+            print(f"Summarizing history failed ({e}); keeping an extractive summary")
+            return fallback(summary, messages)
+
+    return summarize
+
+
+def make_compact_node(max_messages: int = MAX_MESSAGES, keep_messages: int = KEEP_MESSAGES, summarizer=None):
+    """Graph node that bounds ``messages``: past ``max_messages``, the oldest are summarized and removed.
+
+    Compaction runs once every ``max_messages - keep_messages`` messages, so
+    its cost (one summarizer call) is amortized over several turns.
+    """
+    if keep_messages >= max_messages:
+        raise ValueError("keep_messages must be smaller than max_messages")
+    summarizer = summarizer or llm_summarizer()
+
+    def compact(state):
+        messages = state["messages"]
+        if len(messages) <= max_messages:
+            return {}
+        old = messages[:-keep_messages]
+        return {
+            "summary": summarizer(state.get("summary") or "", old),
+            "messages": [RemoveMessage(id=m.id) for m in old],
+        }
+
+    return compact
+
+
+def prune_checkpoints(checkpointer, thread_id: str):
+    """Drop every checkpoint of ``thread_id`` but the latest, so storage per thread stays flat.
+
+    Sessions only ever resume from the latest checkpoint; the history
+    LangGraph keeps for time travel would otherwise grow with every step.
+    Only older checkpoints (and their writes and channel blobs) are deleted
+    and the latest is never rewritten, so a failure part way leaves the
+    thread resumable. Savers other than the in-memory and sqlite ones are
+    left unpruned.
+    """
+    from langgraph.checkpoint.memory import InMemorySaver
+
+    if isinstance(checkpointer, InMemorySaver):
+        _prune_memory(checkpointer, thread_id)
+        return
+    try:
+        from langgraph.checkpoint.sqlite import SqliteSaver
+    except ImportError:
+        return
+    if isinstance(checkpointer, SqliteSaver):
+        _prune_sqlite(checkpointer, thread_id)
+
+
+def _prune_memory(checkpointer, thread_id: str):
+    for checkpoint_ns in list(checkpointer.storage.get(thread_id, {})):
+        latest = checkpointer.get_tuple({"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns}})
+        if latest is None:
+            continue
+        keep, versions = latest.checkpoint["id"], latest.checkpoint["channel_versions"]
+        checkpoints = checkpointer.storage[thread_id][checkpoint_ns]
+        for checkpoint_id in [c for c in checkpoints if c != keep]:
+            del checkpoints[checkpoint_id]
+        for key in [k for k in checkpointer.writes if k[:2] == (thread_id, checkpoint_ns) and k[2] != keep]:
+            del checkpointer.writes[key]
+        # Channel values live in blobs keyed by version; keep the ones the latest checkpoint reads
+        for key in [k for k in checkpointer.blobs if k[:2] == (thread_id, checkpoint_ns) and versions.get(k[2]) != k[3]]:
+            del checkpointer.blobs[key]
+
+
+def _prune_sqlite(checkpointer, thread_id: str):
+    # Each row holds its full checkpoint, so the latest stands alone. One
+    # transaction for both tables: it commits whole or rolls back.
+    latest_id = (
+        "(SELECT MAX(c.checkpoint_id) FROM checkpoints c"
+        " WHERE c.thread_id = {table}.thread_id AND c.checkpoint_ns = {table}.checkpoint_ns)"
+    )
+    with checkpointer.lock, checkpointer.conn:
+        checkpointer.setup()
+        for table in ("writes", "checkpoints"):
+            checkpointer.conn.execute(
+                f"DELETE FROM {table} WHERE thread_id = ? AND checkpoint_id < {latest_id.format(table=table)}",
+                (str(thread_id),),
+            )
+
+
+class ConversationSession:
+    """One multi-turn conversation over the PDF/weather graph.
+
+    State lives in the checkpointer under ``thread_id``, so each turn sends
+    only the new user message and a session can be resumed (across
+    processes with the sqlite checkpointer) by reusing the id. History is
+    bounded by the compact node, and old checkpoints are pruned after each
+    turn, so per-turn latency and memory stay flat over long sessions.
+    """
+
+    def __init__(
+        self,
+        thread_id: str = None,
+        checkpointer=None,
+        max_messages: int = MAX_MESSAGES,
+        keep_messages: int = KEEP_MESSAGES,
+        summarizer=None,
+        prune: bool = True,
+        graph=None,
+    ):
+        self.thread_id = thread_id or uuid.uuid4().hex
+        self.checkpointer = checkpointer if checkpointer is not None else get_checkpointer()
+        self.prune = prune
+        self.graph = graph or build_graph(
+            checkpointer=self.checkpointer,
+            compact_node=make_compact_node(max_messages, keep_messages, summarizer),
+        )
+        self.config = {"configurable": {"thread_id": self.thread_id}}
+        # One turn at a time per thread; concurrent turns would race on the checkpoint
+        self._lock = threading.Lock()
+
+    def ask(self, message: str):
+        """Run one turn and return the agents' reply messages."""
+        with self._lock:
+            state = self.graph.invoke({"messages": [HumanMessage(content=message)]}, self.config)
+            if self.prune:
+                prune_checkpoints(self.checkpointer, self.thread_id)
+        return self._replies(state)
+
+    def stream(self, message: str):
+        """Run one turn, yielding agent events (see agents.streaming) as they arrive.
+
+        The turn runs on its own thread, which holds the session lock; events
+        are yielded without it, so the caller may do anything between them
+        (even start another turn, which waits for this one). A consumer that
+        stops early leaves the turn to finish and be checkpointed.
+        """
+        events = queue.Queue()
+
+        def run():
+            try:
+                with self._lock:
+                    for chunk in self.graph.stream(
+                        {"messages": [HumanMessage(content=message)]}, self.config, stream_mode="custom"
+                    ):
+                        events.put(("event", chunk))
+                    if self.prune:
+                        prune_checkpoints(self.checkpointer, self.thread_id)
+            except BaseException as e:
+                events.put(("error", e))
+            finally:
+                events.put(("done", None))
+
+        threading.Thread(target=run, name=f"session-{self.thread_id}", daemon=True).start()
+        while True:
+            kind, item = events.get()
+            if kind == "done":
+                return
+            if kind == "error":
+                raise item
+            yield item
+
+    async def aask(self, message: str):
+        # The sqlite checkpointer is synchronous, so run the turn on a worker thread
+        return await asyncio.to_thread(self.ask, message)
+
+    @staticmethod
+    def _replies(state: dict):
+        messages = state["messages"]
+        start = len(messages)
+        while start > 0 and not (isinstance(messages[start - 1], HumanMessage) and messages[start - 1].name is None):
+            start -= 1
+        return messages[start:]
+
+    def history(self) -> dict:
+        """Current ``messages`` and ``summary`` of the thread."""
+        values = self.graph.get_state(self.config).values
+        return {"messages": values.get("messages", []), "summary": values.get("summary", "")}
+
+    def clear(self):
+        with self._lock:
+            self.checkpointer.delete_thread(self.thread_id)
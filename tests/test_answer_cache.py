@@ -0,0 +1,37 @@
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from agents.answer_cache import AnswerCache
+
+
+def journal_lines(path) -> int:
+    with open(path, encoding="utf-8") as f:
+        return len(f.readlines())
+
+
+def test_stores_append_to_the_journal_and_survive_a_restart(tmp_path):
+    path = str(tmp_path / "answers.jsonl")
+    cache = AnswerCache(path=path)
+    cache.store("qa", "doc", "What grew?", "Revenue.", 1.0, vector=[1.0, 0.0])
+    cache.store("qa", "doc", "Who reported?", "Finance.", 1.0)
+    cache.store("qa", "doc", "What grew?", "Revenue, by 5%.", 1.0, vector=[1.0, 0.0])
+    assert journal_lines(path) == 3
+
+    reloaded = AnswerCache(path=path)
+    assert reloaded.lookup("qa", "doc", "what grew")[0] == "Revenue, by 5%."
+    assert reloaded.lookup("qa", "doc", "Who reported?")[0] == "Finance."
+    assert reloaded.lookup("qa", "doc", "Anything else?", vector=[0.99, 0.01])[0] == "Revenue, by 5%."
+
+
+def test_journal_is_compacted_to_the_live_entries(tmp_path):
+    path = str(tmp_path / "answers.jsonl")
+    cache = AnswerCache(path=path, max_entries=3)
+    for i in range(20):
+        cache.store("qa", "doc", f"question {i}", f"answer {i}", 1.0)
+    assert journal_lines(path) <= 6
+    reloaded = AnswerCache(path=path, max_entries=3)
+    assert [reloaded.lookup("qa", "doc", f"question {i}")[0] for i in (16, 17, 18, 19)] == [None, "answer 17", "answer 18", "answer 19"]
+
+    cache.clear()
+    assert AnswerCache(path=path).metrics()["size"] == 0
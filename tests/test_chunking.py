@@ -0,0 +1,122 @@
+import os
+import sys
+
+import pytest
+from langchain_core.documents import Document
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from agents.chunking import (
+    ContextAssembler,
+    StructuredTextSplitter,
+    chunking_params,
+    context_budget,
+    estimate_tokens,
+    is_heading,
+)
+from agents.fakes import FakeChatModel
+
+PAGE = """EXPERIENCE
+Acme Corp, Data Engineer, 2021 to 2023. Built the ingestion pipeline that
+loads sensor data into the warehouse every hour.
+Led the migration from cron jobs to Airflow.
+• Cut nightly batch time from six hours to forty minutes.
+• Mentored two junior engineers.
+EDUCATION
+B.Tech in Computer Science, IIT Bombay, 2017 to 2021.
+SKILLS
+Python, SQL, Spark, Airflow, Kubernetes.
+"""
+
+
+@pytest.mark.parametrize("line, heading", [
+    ("EXPERIENCE", True),
+    ("2.1 Revenue by Region", True),
+    ("## Projects", True),
+    ("Key results:", True),
+    ("Work Experience", True),
+    ("Led the migration from cron jobs to Airflow.", False),
+    ("Python, SQL, Spark, Airflow, Kubernetes", False),
+    ("Built the ingestion pipeline that", False),
+])
+def test_heading_detection(line, heading):
+    assert is_heading(line) is heading
+
+
+def test_sections_rejoin_wrapped_lines_and_split_bullets():
+    sections = StructuredTextSplitter().sections(PAGE)
+
+    assert [heading for heading, _ in sections] == ["EXPERIENCE", "EDUCATION", "SKILLS"]
+    assert sections[0][1] == [
+        "Acme Corp, Data Engineer, 2021 to 2023. Built the ingestion pipeline that "
+        "loads sensor data into the warehouse every hour.",
+        "Led the migration from cron jobs to Airflow.",
+        "• Cut nightly batch time from six hours to forty minutes.",
+        "• Mentored two junior engineers.",
+    ]
+
+
+def test_small_sections_are_packed_and_chunks_carry_their_section():
+    docs = StructuredTextSplitter(chunk_size=256).create_documents([PAGE], [{"page": 0}])
+
+    assert len(docs) == 1
+    assert docs[0].metadata == {"page": 0, "section": "EXPERIENCE"}
+    assert "SKILLS\nPython, SQL" in docs[0].page_content
+
+
+def test_long_sections_split_at_sentences_and_repeat_the_heading():
+    sentences = [f"Sentence number {i} describes one more result of the project." for i in range(40)]
+    text = "RESULTS\n" + " ".join(sentences)
+    splitter = StructuredTextSplitter(chunk_size=64, chunk_overlap=16)
+
+    chunks = splitter.split_text(text)
+
+    assert len(chunks) > 1
+    assert all(chunk.startswith("RESULTS\n") for chunk in chunks)
+    assert all(estimate_tokens(chunk) <= 64 for chunk in chunks)
+    bodies = [chunk[len("RESULTS\n"):] for chunk in chunks]
+    # No sentence is cut, and every one appears
+    assert all(body.endswith("project.") for body in bodies)
+    assert all(any(sentence in body for body in bodies) for sentence in sentences)
+    # Each chunk after the first starts with the last sentence(s) of the one before
+    assert all(bodies[i].split(". ")[0] + "." in bodies[i - 1] for i in range(1, len(bodies)))
+
+
+def doc(text: str, page: int = 0) -> Document:
+    return Document(page_content=text, metadata={"page": page})
+
+
+def test_assembler_drops_near_duplicates_and_respects_max_chunks():
+    passage = "Revenue grew twelve percent in the northern region during the second quarter of the year."
+    docs = [doc(passage, 0), doc(passage + " Source: annual report.", 1), doc("The board met twice.", 2), doc("Costs fell.", 3)]
+
+    assert [d.metadata["page"] for d in ContextAssembler(max_tokens=1000).assemble(docs)] == [0, 2, 3]
+    assert [d.metadata["page"] for d in ContextAssembler(max_tokens=1000, max_chunks=2).assemble(docs)] == [0, 2]
+
+
+def test_assembler_fits_the_budget_trimming_at_most_one_chunk():
+    best = doc("First result sentence. " * 10, 0)
+    long = doc("Second finding here. " * 40, 1)
+    short = doc("A short note.", 2)
+    assembler = ContextAssembler(max_tokens=100, min_tokens=20)
+
+    selected = assembler.assemble([best, long, short])
+
+    assert [d.metadata["page"] for d in selected] == [0, 1]
+    assert sum(estimate_tokens(d.page_content) for d in selected) <= 100
+    # The chunk that did not fit was cut at a sentence boundary
+    assert selected[1].page_content.endswith("here.") and len(selected[1].page_content) < len(long.page_content)
+    # Too little room left to be worth a cut: skip to a smaller chunk instead
+    assert [d.metadata["page"] for d in ContextAssembler(max_tokens=70, min_tokens=20).assemble([best, long, short])] == [0, 2]
+
+
+def test_chunking_params_and_context_budget_defaults(monkeypatch):
+    for name in ("PDF_CHUNKER", "CHUNK_SIZE", "CHUNK_OVERLAP", "CONTEXT_TOKEN_BUDGET"):
+        monkeypatch.delenv(name, raising=False)
+
+    assert chunking_params() == ("structured", 256, 32)
+    assert chunking_params("character") == ("character", 1000, 0)
+    with pytest.raises(ValueError):
+        chunking_params("semantic")
+    assert context_budget(FakeChatModel(latency="0")) == 1000
+    monkeypatch.setenv("CONTEXT_TOKEN_BUDGET", "400")
+    assert context_budget(FakeChatModel(latency="0")) == 400
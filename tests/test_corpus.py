@@ -0,0 +1,130 @@
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import numpy as np
+
+from agents.corpus import PDFCorpus, get_corpus
+from agents.fakes import FakeEmbeddings, make_pdf
+from agents.hybrid import BM25Index
+from agents.ingest_cache import IngestCache
+from agents.vector_backends import NumpyBackend, NumpyVectorStore
+
+
+def test_document_is_reingested_when_its_collection_is_gone(monkeypatch, tmp_path):
+    monkeypatch.setenv("NUMPY_INDEX_DIR", ":memory:")
+    monkeypatch.setenv("KEYWORD_INDEX_DIR", ":memory:")
+    manifest = str(tmp_path / "manifest.json")
+    pdf = make_pdf([["Revenue grew in every region."], ["The board met twice."]])
+    corpus = PDFCorpus(
+        "contains", embeddings=FakeEmbeddings(latency="0"), vector_backend="numpy", ingest_cache=IngestCache(manifest)
+    )
+    doc_id = corpus.add(pdf)
+    assert doc_id in corpus
+    assert [entry["doc_id"] for entry in corpus.documents()] == [doc_id]
+
+    # A restart with the manifest on disk but the in-memory index gone
+    corpus.backend = NumpyBackend(":memory:")
+    corpus.ingest_cache = IngestCache(manifest)
+    assert doc_id not in corpus
+    assert corpus.documents() == []
+
+    assert corpus.add(pdf) == doc_id
+    assert corpus.backend.exists(corpus.collection_name)
+    assert [doc.metadata["doc_id"] for doc in corpus.search("revenue", k=1)] == [doc_id]
+
+
+def chunks(doc_id: str, count: int = 3):
+    ids = [f"{doc_id}-{i}" for i in range(count)]
+    texts = [f"chunk {i} of {doc_id} on revenue" for i in range(count)]
+    return ids, texts, [{"doc_id": doc_id, "page": i} for i in range(count)]
+
+
+def test_numpy_store_appends_changes_and_replays_them_on_reopen(tmp_path):
+    path = str(tmp_path / "index")
+    embeddings = FakeEmbeddings(latency="0")
+    store = NumpyVectorStore(embeddings, path=path)
+    for doc_id in ["a", "b", "c", "d"]:
+        ids, texts, metadatas = chunks(doc_id)
+        store.add_texts(texts, metadatas, ids)
+        store.save()
+    snapshot = os.path.getmtime(os.path.join(path, "vectors.npy"))
+    ids, texts, metadatas = chunks("e")
+    store.add_texts(texts, metadatas, ids)
+    store.delete(filter={"doc_id": "b"})
+    store.save()
+
+    # Adding one document and removing another appended to the journal, the snapshot is untouched
+    assert os.path.getmtime(os.path.join(path, "vectors.npy")) == snapshot
+    assert os.path.exists(os.path.join(path, "journal.jsonl"))
+    reopened = NumpyVectorStore(embeddings, path=path)
+    assert sorted(reopened._ids) == sorted(store._ids)
+    assert "b-0" not in reopened._ids and "e-2" in reopened._ids
+    vector = embeddings.embed_query("chunk 1 of e on revenue")
+    assert [doc.page_content for doc in reopened.similarity_search_by_vector(vector, k=1, filter={"doc_id": "e"})] == [
+        "chunk 1 of e on revenue"
+    ]
+    np.testing.assert_allclose(
+        reopened._matrix[reopened._positions["d-1"]], store._matrix[store._positions["d-1"]]
+    )
+
+
+def test_numpy_store_compacts_once_the_journal_outgrows_the_snapshot(tmp_path):
+    path = str(tmp_path / "index")
+    store = NumpyVectorStore(FakeEmbeddings(latency="0"), path=path)
+    ids, texts, metadatas = chunks("a")
+    store.add_texts(texts, metadatas, ids)
+    store.save()
+    for doc_id in ["b", "c"]:
+        ids, texts, metadatas = chunks(doc_id)
+        store.add_texts(texts, metadatas, ids)
+        store.save()
+
+    assert not os.path.exists(os.path.join(path, "journal.jsonl"))
+    assert len(NumpyVectorStore(path=path)) == 9
+
+
+def test_keyword_index_appends_changes_and_replays_them_on_reopen(tmp_path):
+    path = str(tmp_path / "keywords.json")
+    index = BM25Index(path)
+    for doc_id in ["a", "b", "c"]:
+        index.add(*chunks(doc_id))
+        index.save()
+    snapshot = os.path.getmtime(path)
+    index.add(*chunks("d", 2))
+    index.delete({"doc_id": "a"})
+    index.save()
+
+    assert os.path.getmtime(path) == snapshot
+    reopened = BM25Index(path)
+    assert sorted(reopened._chunks) == sorted(index._chunks)
+    assert [doc.metadata["doc_id"] for doc, _ in reopened.search("revenue", k=10, filter={"doc_id": "d"})] == ["d", "d"]
+    assert reopened.search("revenue", k=10, filter={"doc_id": "a"}) == []
+
+
+def test_ingest_manifest_appends_and_sees_other_writers(tmp_path):
+    path = str(tmp_path / "manifest.json")
+    first, second = IngestCache(path), IngestCache(path)
+    for i in range(4):
+        first.put(f"doc-{i}", pages=i)
+    second.put("doc-9", pages=9)
+    # Each put so far was one appended line
+    assert os.path.exists(first.journal_path) and not os.path.exists(path)
+    first.discard("doc-1")
+
+    reopened = IngestCache(path)
+    assert sorted(key for key, _ in reopened.find()) == ["doc-0", "doc-2", "doc-3", "doc-9"]
+    assert reopened.get("doc-9")["pages"] == 9
+
+
+def test_corpus_is_shared_per_embeddings(monkeypatch, tmp_path):
+    monkeypatch.setenv("NUMPY_INDEX_DIR", ":memory:")
+    monkeypatch.setenv("KEYWORD_INDEX_DIR", ":memory:")
+    manifest = IngestCache(str(tmp_path / "manifest.json"))
+    embeddings, other = FakeEmbeddings(latency="0"), FakeEmbeddings(latency="0")
+
+    corpus = get_corpus("shared", embeddings=embeddings, vector_backend="numpy", ingest_cache=manifest)
+
+    assert get_corpus("shared", embeddings=embeddings, vector_backend="numpy", ingest_cache=manifest) is corpus
+    other_corpus = get_corpus("shared", embeddings=other, vector_backend="numpy", ingest_cache=manifest)
+    assert other_corpus is not corpus and other_corpus.embeddings is other
@@ -0,0 +1,52 @@
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import agents.backends
+from agents.answer_cache import AnswerCache
+from agents.fakes import FakeChatModel, FakeEmbeddings, FakeWeather, make_pdf
+from agents.ingest_cache import IngestCache
+from agents.pdf_agent import PDFAgent
+from agents.weather_agent import WeatherAgent
+from agents.weather_cache import WeatherCache
+
+DOTENV = {
+    "AGENT_BACKENDS": "fake",
+    "AGENT_MODE": "direct",
+    "VECTOR_BACKEND": "numpy",
+    "NUMPY_INDEX_DIR": ":memory:",
+    "KEYWORD_INDEX_DIR": ":memory:",
+    "PDF_CHUNKER": "character",
+    "PDF_RETRIEVER": "vector",
+    "PDF_CORPUS": "dotenv-corpus",
+    "FAKE_LLM_LATENCY": "0",
+    "FAKE_EMBED_LATENCY": "0",
+    "FAKE_WEATHER_LATENCY": "0",
+}
+
+
+def test_first_agent_built_reads_settings_from_dotenv(monkeypatch, tmp_path):
+    (tmp_path / ".env").write_text("".join(f"{name}={value}\n" for name, value in DOTENV.items()))
+    monkeypatch.chdir(tmp_path)
+    for name in DOTENV:
+        # setenv first so teardown also removes what load_dotenv adds
+        monkeypatch.setenv(name, "")
+        monkeypatch.delenv(name)
+    # As in a fresh process: nothing has latched the backend mode yet
+    monkeypatch.setattr(agents.backends, "_backends", None)
+
+    agent = PDFAgent(
+        make_pdf([["Revenue grew in every region."]]),
+        ingest_cache=IngestCache(str(tmp_path / "manifest.json")),
+        answer_cache=AnswerCache(path=str(tmp_path / "answers.jsonl")),
+    )
+    weather = WeatherAgent(weather_cache=WeatherCache())
+
+    assert agents.backends.get_backends().mode == "fake"
+    assert isinstance(agent.llm, FakeChatModel)
+    assert isinstance(agent.embeddings, FakeEmbeddings)
+    assert (agent.mode, agent.vector_backend, agent.chunker, agent.retriever, agent.corpus.name) == (
+        "direct", "numpy", "character", "vector", "dotenv-corpus"
+    )
+    assert isinstance(weather.weather_tool, FakeWeather)
+    assert weather.mode == "direct"
@@ -0,0 +1,142 @@
+import asyncio
+import os
+import sys
+import threading
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from nodes.fanout import arun_questions_parallel, run_questions_parallel, stream_questions_parallel
+
+QUESTIONS = [
+    "Where did he study?",
+    "What's the weather in Pune?",
+    "Which companies did he work for?",
+    "What's the weather in Oslo?",
+    "What are his skills?",
+]
+
+
+class Peak:
+    """Tracks how many branches run at once."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.running = 0
+        self.peak = 0
+
+    def __enter__(self):
+        with self._lock:
+            self.running += 1
+            self.peak = max(self.peak, self.running)
+
+    def __exit__(self, *exc):
+        with self._lock:
+            self.running -= 1
+
+
+def test_answers_come_back_in_input_order_within_the_concurrency_cap():
+    peak = Peak()
+
+    def answer(question, pdf_path):
+        with peak:
+            # Later questions finish first
+            time.sleep(0.01 * (len(QUESTIONS) - QUESTIONS.index(question)))
+            return question.upper()
+
+    results = run_questions_parallel(QUESTIONS, max_concurrency=2, answer_fn=answer)
+
+    assert [r["answer"] for r in results] == [q.upper() for q in QUESTIONS]
+    assert [r["index"] for r in results] == list(range(len(QUESTIONS)))
+    assert {r["status"] for r in results} == {"ok"}
+    assert peak.peak == 2
+
+
+def test_a_slow_or_failing_branch_does_not_hold_up_the_others():
+    release = threading.Event()
+
+    def answer(question, pdf_path):
+        if "Pune" in question:
+            release.wait(10)
+        if "skills" in question:
+            raise RuntimeError("agent failed")
+        return "ok"
+
+    start = time.monotonic()
+    results = run_questions_parallel(QUESTIONS, timeout=0.2, answer_fn=answer)
+    release.set()
+
+    assert time.monotonic() - start < 2
+    assert [r["status"] for r in results] == ["ok", "timeout", "ok", "ok", "error"]
+    assert results[4]["answer"] == "Error: agent failed"
+
+
+def collect(events):
+    by_branch = {}
+    for event in events:
+        by_branch.setdefault(event["index"], []).append(event)
+    return by_branch
+
+
+def test_streams_end_each_branch_with_one_final_event():
+    peak = Peak()
+
+    def stream(question, pdf_path):
+        with peak:
+            for word in question.split():
+                time.sleep(0.001)
+                yield {"type": "token", "text": word}
+            yield {"type": "final", "text": question}
+
+    by_branch = collect(stream_questions_parallel(QUESTIONS, max_concurrency=2, stream_fn=stream))
+
+    assert sorted(by_branch) == list(range(len(QUESTIONS)))
+    for index, events in by_branch.items():
+        assert [e["type"] for e in events].count("final") == 1
+        assert events[-1] == {
+            "index": index, "agent": events[-1]["agent"], "type": "final", "text": QUESTIONS[index], "status": "ok"
+        }
+        assert " ".join(e["text"] for e in events[:-1]) == QUESTIONS[index]
+    assert by_branch[1][-1]["agent"] == "weather_agent"
+    assert peak.peak == 2
+
+
+def test_a_stream_without_a_final_event_ends_its_branch_at_once():
+    release = threading.Event()
+
+    def stream(question, pdf_path):
+        yield {"type": "step", "text": "thinking"}
+        if "Pune" in question:
+            # Ends without an answer
+            return
+        if "Oslo" in question:
+            release.wait(10)
+        yield {"type": "final", "text": "done"}
+
+    start = time.monotonic()
+    by_branch = collect(stream_questions_parallel(QUESTIONS[:4], timeout=0.5, stream_fn=stream))
+    elapsed = time.monotonic() - start
+    release.set()
+
+    assert by_branch[1][-1]["status"] == "error"
+    assert by_branch[3][-1]["status"] == "timeout"
+    assert [events[-1]["status"] for events in by_branch.values()].count("ok") == 2
+    # Only the Oslo branch waited for the timeout
+    assert elapsed < 2
+
+
+def test_async_fan_out_keeps_order_and_cancels_overrunning_branches():
+    cancelled = []
+
+    async def answer(question, pdf_path):
+        try:
+            await asyncio.sleep(5 if "Oslo" in question else 0.01)
+        except asyncio.CancelledError:
+            cancelled.append(question)
+            raise
+        return question
+
+    results = asyncio.run(arun_questions_parallel(QUESTIONS, timeout=0.2, answer_fn=answer))
+
+    assert [r["status"] for r in results] == ["ok", "ok", "ok", "timeout", "ok"]
+    assert [r["answer"] for r in results if r["status"] == "ok"] == [q for q in QUESTIONS if "Oslo" not in q]
+    assert cancelled == [QUESTIONS[3]]
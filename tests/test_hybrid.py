@@ -0,0 +1,80 @@
+import os
+import sys
+
+from langchain_core.documents import Document
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from agents.fakes import FakeEmbeddings
+from agents.hybrid import BM25Index, HybridRetriever, OverlapReranker, compress, reciprocal_rank_fusion
+from agents.vector_backends import NumpyVectorStore
+
+CHUNKS = {
+    "a-0": ("Sharath interned at Zorbit Labs building data pipelines.", {"doc_id": "a", "page": 0}),
+    "a-1": ("He studied computer science and enjoys hiking.", {"doc_id": "a", "page": 1}),
+    "b-0": ("Revenue grew in every region; Zorbit Labs was acquired.", {"doc_id": "b", "page": 0}),
+    "b-1": ("The board met twice and approved the budget.", {"doc_id": "b", "page": 1}),
+}
+
+
+def keyword_index() -> BM25Index:
+    index = BM25Index()
+    index.add(list(CHUNKS), [text for text, _ in CHUNKS.values()], [metadata for _, metadata in CHUNKS.values()])
+    return index
+
+
+def test_bm25_ranks_rare_terms_and_scopes_by_document():
+    index = keyword_index()
+
+    ranked = [doc.id for doc, _ in index.search("Where did Sharath intern?", k=4)]
+    assert ranked[0] == "a-0"
+    assert [doc.id for doc, _ in index.search("Zorbit Labs", k=4, filter={"doc_id": "b"})] == ["b-0"]
+    assert index.search("Zorbit", k=4, filter={"doc_id": "missing"}) == []
+
+    index.delete({"doc_id": "a"})
+    assert [doc.id for doc, _ in index.search("Zorbit Labs", k=4)] == ["b-0"]
+    assert len(index) == 2
+
+
+def test_reciprocal_rank_fusion_favours_documents_both_lists_rank():
+    docs = {name: Document(page_content=name, id=name) for name in "abcd"}
+    vector = [docs["a"], docs["b"], docs["c"]]
+    keyword = [docs["c"], docs["d"], docs["b"]]
+
+    assert [doc.id for doc in reciprocal_rank_fusion([vector, keyword])] == ["c", "b", "a", "d"]
+
+
+def test_overlap_reranker_scores_the_share_of_query_weight():
+    index = keyword_index()
+    docs = [Document(page_content=text, id=chunk_id) for chunk_id, (text, _) in CHUNKS.items()]
+
+    scores = OverlapReranker(index).score("Sharath Zorbit", docs)
+
+    assert scores[0] == 1.0
+    assert 0 < scores[2] < 1
+    assert scores[1] == scores[3] == 0
+
+
+def test_compress_keeps_matching_sentences_in_order():
+    doc = Document(
+        page_content="The company was founded in 1990. Revenue grew in 2023. Offices moved. Revenue fell in 2020.",
+        id="x",
+    )
+
+    assert compress("revenue", doc, 60).page_content == "Revenue grew in 2023. Revenue fell in 2020."
+    assert compress("revenue", doc, 0) is doc
+
+
+def test_hybrid_retriever_finds_exact_terms_the_vectors_miss():
+    embeddings = FakeEmbeddings(latency="0")
+    store = NumpyVectorStore(embeddings)
+    store.add_texts([text for text, _ in CHUNKS.values()], [metadata for _, metadata in CHUNKS.values()], list(CHUNKS))
+    index = keyword_index()
+    retriever = HybridRetriever(
+        vector_store=store, keyword_index=index, k=2, fetch_k=4, reranker=OverlapReranker(index), compress_chars=0
+    )
+
+    # The fake embeddings carry no meaning; the keyword side finds both
+    assert {doc.id for doc in retriever.invoke("Zorbit Labs")} == {"a-0", "b-0"}
+
+    scoped = retriever.model_copy(update={"vector_filter": {"doc_id": "a"}, "keyword_filter": {"doc_id": "a"}})
+    assert {doc.metadata["doc_id"] for doc in scoped.invoke("Zorbit Labs")} == {"a"}
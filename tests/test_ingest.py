@@ -0,0 +1,132 @@
+import os
+import sys
+import threading
+import time
+
+import pytest
+from langchain_core.documents import Document
+from langchain_text_splitters import CharacterTextSplitter
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from agents.fakes import FakeEmbeddings, make_pdf
+from agents.ingest import IngestJob, StreamingIngestor, load_pdf_pages
+
+
+class RecordingSink:
+    def __init__(self):
+        self.points = {}
+        self.deleted_pages = []
+        self.flushed = False
+
+    def ensure(self, size):
+        pass
+
+    def upsert(self, ids, vectors, chunks):
+        self.points.update(zip(ids, chunks))
+
+    def delete_pages(self, pages):
+        self.deleted_pages.extend(pages)
+        self.points = {i: c for i, c in self.points.items() if c.metadata["page"] not in pages}
+
+    def flush(self):
+        self.flushed = True
+
+
+class TrackedEmbeddings(FakeEmbeddings):
+    """Records batch sizes and how many batches are embedded at once."""
+
+    def __init__(self, fail_on: str = None):
+        super().__init__(latency="0")
+        self.fail_on = fail_on
+        self.batches = []
+        self.running = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+
+    def embed_documents(self, texts, **kwargs):
+        with self._lock:
+            self.batches.append(len(texts))
+            self.running += 1
+            self.peak = max(self.peak, self.running)
+        try:
+            time.sleep(0.01)
+            if self.fail_on and any(self.fail_on in text for text in texts):
+                raise RuntimeError("embedding quota exceeded")
+            return super().embed_documents(texts)
+        finally:
+            with self._lock:
+                self.running -= 1
+
+
+def pages(texts):
+    return (Document(page_content=text, metadata={"page": i}) for i, text in enumerate(texts))
+
+
+def ingest(texts, embeddings, sink, previous=None, **kwargs):
+    ingestor = StreamingIngestor(sink, embeddings, CharacterTextSplitter(chunk_size=1000, chunk_overlap=0), **kwargs)
+    job = IngestJob()
+    new_pages = job.run(lambda: ingestor.run(pages(texts), previous or {}, job))
+    return new_pages, job
+
+
+def test_chunks_are_embedded_in_bounded_concurrent_batches():
+    embeddings, sink = TrackedEmbeddings(), RecordingSink()
+
+    _, job = ingest([f"Page {i} text." for i in range(10)], embeddings, sink, batch_size=3, max_concurrency=2)
+
+    assert sorted(embeddings.batches) == [1, 3, 3, 3]
+    assert embeddings.peak == 2
+    assert (job.stats["pages"], job.stats["chunks"], job.stats["batches"]) == (10, 10, 4)
+    assert job.first_batch.is_set() and job.done and sink.flushed
+    assert len(sink.points) == 10
+
+
+def test_reingesting_an_edited_pdf_embeds_only_changed_pages():
+    sink = RecordingSink()
+    original = ["Intro.", "Revenue grew.", "Costs fell.", "Outlook."]
+    previous, _ = ingest(original, TrackedEmbeddings(), sink)
+    ids = set(sink.points)
+
+    embeddings = TrackedEmbeddings()
+    edited = ["Intro.", "Revenue grew twelve percent.", "Costs fell."]
+    _, job = ingest(edited, embeddings, sink, previous)
+
+    assert embeddings.batches == [1]
+    assert (job.stats["pages_embedded"], job.stats["pages_skipped"]) == (1, 2)
+    # The edited page is replaced and the removed last page deleted
+    assert sorted(sink.deleted_pages) == [1, 3]
+    assert sorted(chunk.page_content for chunk in sink.points.values()) == sorted(edited)
+    # Unchanged pages keep their point ids
+    assert len(ids & set(sink.points)) == 2
+
+
+def test_documents_in_one_collection_get_their_own_ids():
+    sink = RecordingSink()
+    ingest(["Same page."], TrackedEmbeddings(), sink, doc_id="a")
+    ingest(["Same page."], TrackedEmbeddings(), sink, doc_id="b")
+
+    assert sorted(chunk.metadata["doc_id"] for chunk in sink.points.values()) == ["a", "b"]
+
+
+def test_an_embedding_error_fails_the_job_without_blocking_waiters():
+    embeddings, sink = TrackedEmbeddings(fail_on="Page 5"), RecordingSink()
+    ingestor = StreamingIngestor(sink, embeddings, CharacterTextSplitter(chunk_size=1000), batch_size=1, max_concurrency=2)
+    job = IngestJob()
+
+    with pytest.raises(RuntimeError, match="quota"):
+        job.run(lambda: ingestor.run(pages([f"Page {i} text." for i in range(8)]), {}, job))
+
+    assert job.first_batch.is_set() and job.done
+    with pytest.raises(RuntimeError, match="quota"):
+        job.wait(1)
+    assert not sink.flushed
+
+
+def test_in_memory_pdf_pages_are_parsed_lazily_from_bytes():
+    pdf = make_pdf([["Revenue grew in every region."], ["The board met twice."]])
+
+    loaded = load_pdf_pages(pdf, "f" * 64)
+
+    assert not isinstance(loaded, list)
+    texts = [page.page_content for page in loaded]
+    assert "Revenue grew" in texts[0] and "board met" in texts[1]
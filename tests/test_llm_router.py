@@ -0,0 +1,102 @@
+import asyncio
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from langchain_core.messages import AIMessageChunk
+from langchain_core.outputs import ChatGenerationChunk
+from pydantic import Field
+
+from agents.fakes import FakeChatProvider
+from agents.llm_router import LLMRouter, Provider
+
+
+class Stream:
+    """A provider response stream that stays referenced until closed, like a pooled HTTP connection."""
+
+    def __init__(self, delay: float, text: str):
+        self.delay = delay
+        self.tokens = [text]
+        self.closed = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        time.sleep(self.delay)
+        self.delay = 0
+        if not self.tokens:
+            raise StopIteration
+        return ChatGenerationChunk(message=AIMessageChunk(content=self.tokens.pop()))
+
+    def close(self):
+        self.closed = True
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        await asyncio.sleep(self.delay)
+        self.delay = 0
+        if not self.tokens:
+            raise StopAsyncIteration
+        return ChatGenerationChunk(message=AIMessageChunk(content=self.tokens.pop()))
+
+    async def aclose(self):
+        self.closed = True
+
+
+class StreamingProvider(FakeChatProvider):
+    streams: list = Field(default_factory=list)
+
+    def _open(self) -> Any:
+        stream = Stream(self.latency, f"answer from {self.name}")
+        self.streams.append(stream)
+        return stream
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        return self._open()
+
+    def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        return self._open()
+
+
+def hedged_router(**kwargs):
+    slow = StreamingProvider(name="slow", latency=0.3)
+    fast = StreamingProvider(name="fast", latency=0.0)
+    return LLMRouter(providers=[Provider("slow", slow), Provider("fast", fast)], hedge_after=0.05, **kwargs), slow
+
+
+def test_losing_stream_is_closed():
+    router, slow = hedged_router()
+    assert "".join(chunk.content for chunk in router.stream("hi")) == "answer from fast"
+    time.sleep(0.4)
+    assert [stream.closed for stream in slow.streams] == [True]
+
+
+def test_losing_async_stream_is_closed():
+    router, slow = hedged_router()
+
+    async def run():
+        return "".join([chunk.content async for chunk in router.astream("hi")])
+
+    assert asyncio.run(run()) == "answer from fast"
+    assert [stream.closed for stream in slow.streams] == [True]
+
+
+def test_saturated_hedge_pool_runs_calls_in_the_caller_thread():
+    providers = [Provider(name, FakeChatProvider(name=name, latency=0.2)) for name in ("gemini", "groq")]
+    router = LLMRouter(providers=providers, hedge_after=1.0, hedge_threads=2)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        answers = list(pool.map(lambda i: router.invoke(f"question {i}").content, range(8)))
+    elapsed = time.perf_counter() - start
+
+    assert len(answers) == 8
+    # Eight 0.2s calls overlap instead of queueing two at a time
+    assert elapsed < 0.6
+    assert router.metrics()["hedges_skipped"] >= 6
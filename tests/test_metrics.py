@@ -0,0 +1,90 @@
+import json
+import os
+import sys
+
+import pytest
+from langchain_core.runnables import RunnableLambda
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from agents.fakes import FakeChatModel
+from agents.metrics import JsonlSink, MetricsRegistry
+from agents.metrics_handler import MetricsCallbackHandler
+
+
+def test_timer_records_ok_and_error_runs_separately():
+    metrics = MetricsRegistry()
+
+    with metrics.timer("retrieval", "vector"):
+        pass
+    with pytest.raises(ValueError):
+        with metrics.timer("retrieval", "vector"):
+            raise ValueError("index missing")
+
+    rows = {(row["stage"], row["name"], row["status"]): row for row in metrics.summary()}
+    assert set(rows) == {("retrieval", "vector", "ok"), ("retrieval", "vector", "error")}
+    assert all(row["count"] == 1 for row in rows.values())
+
+
+def test_summary_percentiles_come_from_recent_samples():
+    metrics = MetricsRegistry(samples=100)
+    for ms in range(1, 201):
+        metrics.observe("llm", ms / 1000, "router")
+
+    (row,) = metrics.summary()
+    assert row["count"] == 200
+    assert row["max_ms"] == pytest.approx(200)
+    # Only the last 100 samples (101-200 ms) feed the percentiles
+    assert row["p50_ms"] == pytest.approx(151)
+    assert row["p99_ms"] == pytest.approx(200)
+    assert row["mean_ms"] == pytest.approx(100.5)
+
+
+def test_counters_and_prometheus_exposition():
+    metrics = MetricsRegistry()
+    metrics.incr("cache_lookups", cache="answer", result="hit")
+    metrics.incr("cache_lookups", 2, cache="answer", result="hit")
+    metrics.incr("llm_tokens", 40, model='gemini "flash"', kind="prompt")
+    metrics.observe("embed", 0.02, "batch")
+    metrics.observe("embed", 0.3, "batch")
+
+    assert metrics.counters()["cache_lookups{cache=answer,result=hit}"] == 3
+    text = metrics.to_prometheus()
+    assert 'agent_stage_seconds_bucket{stage="embed",name="batch",status="ok",le="0.025"} 1' in text
+    assert 'agent_stage_seconds_bucket{stage="embed",name="batch",status="ok",le="0.5"} 2' in text
+    assert 'agent_stage_seconds_count{stage="embed",name="batch",status="ok"} 2' in text
+    assert text.count("# TYPE agent_cache_lookups_total counter") == 1
+    assert 'agent_cache_lookups_total{cache="answer",result="hit"} 3' in text
+    assert 'model="gemini \\"flash\\""' in text
+
+
+def test_sinks_receive_every_observation(tmp_path):
+    path = tmp_path / "metrics" / "events.jsonl"
+    metrics = MetricsRegistry(clock=lambda: 1.0)
+    metrics.add_sink(JsonlSink(str(path)))
+    metrics.add_sink(lambda event: 1 / 0)
+
+    list(metrics.timed_iter(iter(["page 1", "page 2"]), "parse", "pdf"))
+    metrics.incr("llm_calls", model="fake")
+
+    events = [json.loads(line) for line in path.read_text().splitlines()]
+    assert [(e["type"], e.get("stage") or e.get("metric")) for e in events] == [
+        ("timing", "parse"), ("timing", "parse"), ("counter", "llm_calls")
+    ]
+    # A failing sink does not stop the others or the caller
+    assert metrics.summary()[0]["count"] == 2
+
+
+def test_callback_handler_times_llm_calls_and_counts_tokens():
+    metrics = MetricsRegistry()
+    handler = MetricsCallbackHandler(metrics)
+    llm = FakeChatModel(latency="0")
+    chain = RunnableLambda(lambda question: f"Answer briefly: {question}") | llm
+
+    chain.invoke("How did revenue grow?", config={"callbacks": [handler]})
+
+    stages = {(row["stage"], row["status"]) for row in metrics.summary()}
+    assert ("llm", "ok") in stages
+    counters = metrics.counters()
+    assert sum(value for name, value in counters.items() if name.startswith("llm_calls")) == 1
+    prompt = [value for name, value in counters.items() if name.startswith("llm_tokens") and "kind=prompt" in name]
+    assert prompt and prompt[0] > 0
@@ -0,0 +1,116 @@
+import asyncio
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from langchain_core.messages import HumanMessage
+from langgraph.checkpoint.memory import InMemorySaver
+
+import nodes.node as node
+from agents.weather_cache import match_location
+
+
+class StubPDFAgent:
+    def __init__(self):
+        self.calls = []
+
+    def stream(self, question, context=""):
+        self.calls.append((question, context))
+        yield {"type": "final", "text": "Nothing about that in the PDF."}
+
+    async def aask(self, question, context=""):
+        self.calls.append((question, context))
+        return "Nothing about that in the PDF."
+
+
+class StubWeatherAgent:
+    def __init__(self):
+        self.locations = []
+        self.questions = []
+
+    def _answer(self, question, context):
+        location = match_location(question)
+        if location:
+            self.locations.append(location)
+            return f"Weather in {location}: sunny"
+        self.questions.append((question, context))
+        return "agent answer"
+
+    async def aask(self, question, context=""):
+        return self._answer(question, context)
+
+    def stream(self, question, context=""):
+        yield {"type": "final", "text": self._answer(question, context)}
+
+
+class StubRegistry:
+    def __init__(self):
+        self.weather_agent = StubWeatherAgent()
+        self.pdf_agent = StubPDFAgent()
+
+    def get_pdf_agent(self, pdf_path):
+        return self.pdf_agent
+
+    def get_weather_agent(self):
+        return self.weather_agent
+
+
+def weather_replies(result):
+    return [m.content for m in result["messages"] if m.name == "weather_agent"]
+
+
+def ask(graph, message, thread_id="session"):
+    return graph.invoke({"messages": [HumanMessage(content=message)]}, {"configurable": {"thread_id": thread_id}})
+
+
+def test_weather_location_comes_from_the_current_turn(monkeypatch):
+    registry = StubRegistry()
+    monkeypatch.setattr(node, "get_registry", lambda: registry)
+    graph = node.build_graph(checkpointer=InMemorySaver())
+
+    ask(graph, "tell me the weather in Mumbai")
+    result = ask(graph, "what is the weather in Paris")
+
+    assert registry.weather_agent.locations == ["Mumbai", "Paris"]
+    assert weather_replies(result)[-1] == "Weather in Paris: sunny"
+
+
+def test_async_weather_location_comes_from_the_current_turn(monkeypatch):
+    registry = StubRegistry()
+    monkeypatch.setattr(node, "get_registry", lambda: registry)
+    graph = node.build_graph(use_async=True, checkpointer=InMemorySaver())
+    config = {"configurable": {"thread_id": "session"}}
+
+    async def run():
+        await graph.ainvoke({"messages": [HumanMessage(content="tell me the weather in Mumbai")]}, config)
+        return await graph.ainvoke({"messages": [HumanMessage(content="what is the weather in Paris")]}, config)
+
+    result = asyncio.run(run())
+    assert weather_replies(result)[-1] == "Weather in Paris: sunny"
+
+
+def test_agent_fallback_gets_the_history(monkeypatch):
+    registry = StubRegistry()
+    monkeypatch.setattr(node, "get_registry", lambda: registry)
+    graph = node.build_graph(checkpointer=InMemorySaver())
+
+    ask(graph, "tell me the weather in Mumbai")
+    ask(graph, "and is it going to rain there?")
+
+    question, context = registry.weather_agent.questions[-1]
+    assert question == "and is it going to rain there?"
+    assert "user: tell me the weather in Mumbai" in context
+
+
+def test_pdf_agent_gets_the_bare_question_and_history_apart(monkeypatch):
+    registry = StubRegistry()
+    monkeypatch.setattr(node, "get_registry", lambda: registry)
+    graph = node.build_graph(checkpointer=InMemorySaver())
+
+    ask(graph, "Where did Sharath study?")
+    ask(graph, "What did he study there?")
+
+    assert registry.pdf_agent.calls[0] == ("Where did Sharath study?", "")
+    question, context = registry.pdf_agent.calls[-1]
+    assert question == "What did he study there?"
+    assert "user: Where did Sharath study?" in context
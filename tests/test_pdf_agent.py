@@ -0,0 +1,252 @@
+import io
+import os
+import sys
+import threading
+
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import agents.backends
+from agents.answer_cache import AnswerCache, normalize_question
+from agents.backends import Backends
+from agents.fakes import FakeChatModel, FakeEmbeddings, make_pdf
+from agents.ingest_cache import IngestCache
+from agents.pdf_agent import PDFAgent
+from agents.registry import AgentRegistry
+from agents.vector_backends import get_vector_backend
+
+
+class GatedEmbeddings(FakeEmbeddings):
+    """Embeds the first ingest batch, then holds every later one until ``release`` is set."""
+
+    def __init__(self):
+        super().__init__(latency="0")
+        self.release = threading.Event()
+        self.batches = 0
+
+    def embed_documents(self, texts, **kwargs):
+        if threading.current_thread() is not threading.main_thread():
+            self.batches += 1
+            if self.batches > 1:
+                self.release.wait(10)
+        return super().embed_documents(texts, **kwargs)
+
+
+def report_pdf(pages: int = 12) -> bytes:
+    return make_pdf([[f"Page {page} of the report: revenue grew in region {page}."] for page in range(pages)])
+
+
+def test_background_ingest_does_not_cache_partial_answers(monkeypatch, tmp_path):
+    monkeypatch.setenv("NUMPY_INDEX_DIR", ":memory:")
+    monkeypatch.setenv("KEYWORD_INDEX_DIR", ":memory:")
+    pdf = report_pdf()
+    answers = AnswerCache(path=str(tmp_path / "answers.json"))
+    embeddings = GatedEmbeddings()
+    agent = PDFAgent(
+        pdf,
+        ingest_cache=IngestCache(str(tmp_path / "manifest.json")),
+        answer_cache=answers,
+        embed_batch_size=2,
+        embed_concurrency=1,
+        background_ingest=True,
+        vector_backend="numpy",
+        mode="direct",
+        llm=FakeChatModel(latency="0"),
+        embeddings=embeddings,
+        chunker="character",
+    )
+
+    assert not agent.ingest_job.done
+    agent.ask("How did revenue grow?")
+    list(agent.stream("Which regions grew?"))
+    agent.ask_many(["What does page 3 say?"])
+    assert answers.metrics()["size"] == 0
+
+    embeddings.release.set()
+    agent.ingest_job.wait(10)
+    agent.ask("How did revenue grow?")
+    assert answers.metrics()["size"] == 1
+
+
+def test_semantic_miss_embeds_the_question_once(monkeypatch, tmp_path):
+    monkeypatch.setenv("NUMPY_INDEX_DIR", ":memory:")
+    monkeypatch.setenv("KEYWORD_INDEX_DIR", ":memory:")
+    embeddings = FakeEmbeddings(latency="0")
+    agent = PDFAgent(
+        report_pdf(),
+        ingest_cache=IngestCache(str(tmp_path / "manifest.json")),
+        answer_cache=AnswerCache(path=str(tmp_path / "answers.jsonl")),
+        vector_backend="numpy",
+        mode="direct",
+        llm=FakeChatModel(latency="0"),
+        embeddings=embeddings,
+        chunker="character",
+    )
+
+    for question in ["How did revenue grow in region 3?", "Which regions are in the report?"]:
+        calls = embeddings.calls
+        agent.ask(question)
+        assert embeddings.calls == calls + 1
+        calls = embeddings.calls
+        list(agent.stream(question + " Explain."))
+        assert embeddings.calls == calls + 1
+
+
+class QueryLog(FakeEmbeddings):
+    def __init__(self):
+        super().__init__(latency="0")
+        self.queries = []
+
+    def embed_query(self, text, **kwargs):
+        self.queries.append(text)
+        return super().embed_query(text, **kwargs)
+
+
+def test_history_reaches_the_prompt_but_not_retrieval_or_the_cache_key(monkeypatch, tmp_path):
+    monkeypatch.setenv("NUMPY_INDEX_DIR", ":memory:")
+    monkeypatch.setenv("KEYWORD_INDEX_DIR", ":memory:")
+    prompts = []
+    monkeypatch.setattr(FakeChatModel, "_prompt", staticmethod(
+        lambda messages: prompts.append("\n".join(str(m.content) for m in messages)) or prompts[-1]
+    ))
+    embeddings = QueryLog()
+    answers = AnswerCache(path=str(tmp_path / "answers.jsonl"))
+    agent = PDFAgent(
+        report_pdf(),
+        ingest_cache=IngestCache(str(tmp_path / "manifest.json")),
+        answer_cache=answers,
+        retriever="vector",
+        vector_backend="numpy",
+        mode="direct",
+        llm=FakeChatModel(latency="0"),
+        embeddings=embeddings,
+        chunker="character",
+    )
+    history = "user: Which region grew most?\npdf_agent: Region 7."
+
+    answer = agent.ask("How did revenue grow there?", context=history)
+    list(agent.stream("Which pages mention it?", context=history))
+
+    # The semantic cache embeds the question once and retrieval reuses that vector
+    assert embeddings.queries == [normalize_question("How did revenue grow there?"), normalize_question("Which pages mention it?")]
+    assert all(history in prompt for prompt in prompts)
+    assert answers.lookup("qa", agent.answer_key, "How did revenue grow there?")[0] == answer
+
+
+class OneShotStream(io.RawIOBase):
+    """A pipe-like upload: readable once, no seek, no getvalue."""
+
+    def __init__(self, data: bytes):
+        self.data = data
+        self.reads = 0
+
+    def readable(self):
+        return True
+
+    def readall(self):
+        self.reads += 1
+        if self.reads > 1:
+            raise OSError("stream already consumed")
+        return self.data
+
+
+def test_non_seekable_upload_is_read_once(monkeypatch, tmp_path):
+    monkeypatch.setenv("NUMPY_INDEX_DIR", ":memory:")
+    monkeypatch.setenv("KEYWORD_INDEX_DIR", ":memory:")
+    monkeypatch.setenv("FAKE_LLM_LATENCY", "0")
+    monkeypatch.setenv("FAKE_EMBED_LATENCY", "0")
+    # Registry keys hash the options, so the model comes from the backends
+    monkeypatch.setattr(agents.backends, "_backends", Backends("fake"))
+    upload = OneShotStream(report_pdf(3))
+    registry = AgentRegistry()
+    options = dict(
+        ingest_cache=IngestCache(str(tmp_path / "manifest.json")),
+        answer_cache=AnswerCache(path=str(tmp_path / "answers.jsonl")),
+        vector_backend="numpy",
+        mode="direct",
+        chunker="character",
+    )
+
+    agent = registry.get_pdf_agent(upload, **options)
+
+    assert upload.reads == 1
+    assert agent.ingest_stats["outcome"] == "miss"
+    assert "region 2" in agent.ask("Which regions grew?")
+    # The same content as bytes finds the warm agent
+    assert registry.get_pdf_agent(report_pdf(3), **options) is agent
+
+
+def test_idle_collections_are_evicted_with_their_manifest_entries(monkeypatch, tmp_path):
+    monkeypatch.setenv("NUMPY_INDEX_DIR", ":memory:")
+    monkeypatch.setenv("KEYWORD_INDEX_DIR", ":memory:")
+    monkeypatch.setenv("INGEST_MAX_COLLECTIONS", "2")
+    manifest = IngestCache(str(tmp_path / "manifest.json"))
+    options = dict(
+        ingest_cache=manifest,
+        answer_cache=AnswerCache(path=str(tmp_path / "answers.jsonl")),
+        vector_backend="numpy",
+        mode="direct",
+        llm=FakeChatModel(latency="0"),
+        embeddings=FakeEmbeddings(latency="0"),
+        chunker="character",
+    )
+    first, second = PDFAgent(report_pdf(2), **options), PDFAgent(report_pdf(3), **options)
+    # A hit makes the first the most recently used
+    assert PDFAgent(report_pdf(2), **options).ingest_stats["outcome"] == "hit"
+
+    third = PDFAgent(report_pdf(4), **options)
+
+    backend = get_vector_backend("numpy")
+    assert not backend.exists(second.vector_collection)
+    assert manifest.find(collection_name=second.vector_collection) == []
+    assert all(backend.exists(agent.vector_collection) for agent in (first, third))
+    assert PDFAgent(report_pdf(3), **options).ingest_stats["outcome"] == "miss"
+
+
+def test_collections_idle_past_the_ttl_are_evicted(monkeypatch, tmp_path):
+    monkeypatch.setenv("NUMPY_INDEX_DIR", ":memory:")
+    monkeypatch.setenv("KEYWORD_INDEX_DIR", ":memory:")
+    monkeypatch.setenv("INGEST_COLLECTION_TTL", "0")
+    options = dict(
+        ingest_cache=IngestCache(str(tmp_path / "manifest.json")),
+        answer_cache=AnswerCache(path=str(tmp_path / "answers.jsonl")),
+        vector_backend="numpy",
+        mode="direct",
+        llm=FakeChatModel(latency="0"),
+        embeddings=FakeEmbeddings(latency="0"),
+        chunker="character",
+    )
+    first = PDFAgent(report_pdf(2), **options)
+    second = PDFAgent(report_pdf(5), **options)
+
+    backend = get_vector_backend("numpy")
+    assert not backend.exists(first.vector_collection)
+    # The collection just built is never evicted by its own ingestion
+    assert backend.exists(second.vector_collection)
+
+
+@pytest.mark.parametrize("retriever", ["hybrid", "vector"])
+def test_ask_many_puts_k_chunks_in_each_prompt(monkeypatch, tmp_path, retriever):
+    monkeypatch.setenv("NUMPY_INDEX_DIR", ":memory:")
+    monkeypatch.setenv("KEYWORD_INDEX_DIR", ":memory:")
+    agent = PDFAgent(
+        report_pdf(),
+        ingest_cache=IngestCache(str(tmp_path / "manifest.json")),
+        answer_cache=AnswerCache(path=str(tmp_path / "answers.jsonl")),
+        retriever=retriever,
+        vector_backend="numpy",
+        mode="direct",
+        llm=FakeChatModel(latency="0"),
+        embeddings=FakeEmbeddings(latency="0"),
+        chunker="character",
+    )
+    questions = ["How did revenue grow in region 3?", "Which regions grew?"]
+
+    default = agent.ask_many(questions)
+    assert [r["sources"] for r in default] == [agent._retriever_k()] * 2
+    for k in (1, 5):
+        results = agent.ask_many(questions, k=k)
+        # Another k is another prompt, so nothing comes from the default k's cache entries
+        assert [(r["cached"], r["sources"]) for r in results] == [(False, k)] * 2
+    assert all(r["cached"] for r in agent.ask_many(questions, k=1))
+
@@ -0,0 +1,50 @@
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from agents.backends import embed_queries
+from agents.fakes import FakeEmbeddings
+from agents.recording import Cassette, RecordingEmbeddings
+
+
+def gemini_embeddings():
+    """Live Gemini embeddings that embed offline and record the arguments of each batch."""
+    genai = pytest.importorskip("langchain_google_genai")
+    fake = FakeEmbeddings(latency="0")
+    batch_kwargs = []
+
+    class OfflineGemini(genai.GoogleGenerativeAIEmbeddings):
+        def embed_documents(self, texts, **kwargs):
+            batch_kwargs.append(kwargs)
+            return fake.embed_documents(texts)
+
+        def embed_query(self, text, **kwargs):
+            return fake.embed_query(text)
+
+    return OfflineGemini.model_construct(model="models/gemini-embedding-001"), batch_kwargs
+
+
+def test_batched_queries_replay_like_embed_query(tmp_path):
+    path = str(tmp_path / "embeddings.jsonl")
+    live, batch_kwargs = gemini_embeddings()
+    recorder = RecordingEmbeddings(Cassette(path), live, mode="record", model="gemini-embedding-001")
+    recorded = embed_queries(recorder, ["revenue in 2023", "who is the ceo"])
+    assert batch_kwargs == [{"task_type": "RETRIEVAL_QUERY"}]
+
+    replay = RecordingEmbeddings(Cassette(path), mode="replay", model="gemini-embedding-001")
+    assert embed_queries(replay, ["revenue in 2023", "who is the ceo"]) == recorded
+    assert replay.embed_query("who is the ceo") == recorded[1]
+
+
+def test_only_gemini_embeddings_get_the_query_task_type():
+    class GoogleGenerativeAIEmbeddings(FakeEmbeddings):
+        """Same class name as the live Gemini embeddings, but not them."""
+
+        def embed_documents(self, texts, **kwargs):
+            assert kwargs == {}
+            return super().embed_documents(texts)
+
+    lookalike = GoogleGenerativeAIEmbeddings(latency="0")
+    assert embed_queries(lookalike, ["revenue"]) == [lookalike.embed_query("revenue")]
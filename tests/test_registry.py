@@ -0,0 +1,115 @@
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from agents.registry import AgentRegistry
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def wait_for(condition, timeout: float = 5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.001)
+
+
+def test_least_recently_used_agent_is_evicted_beyond_max_agents():
+    registry = AgentRegistry(max_agents=2, ttl_seconds=None)
+    built = []
+
+    def get(name):
+        return registry.get((name,), lambda: built.append(name) or object())
+
+    a = get("a")
+    get("b")
+    assert get("a") is a
+    get("c")
+
+    # "b" was the least recently used
+    assert get("a") is a
+    get("b")
+    assert built == ["a", "b", "c", "b"]
+    assert registry.stats()["evictions"] == 2
+
+
+def test_idle_agents_expire_after_the_ttl():
+    clock = Clock()
+    registry = AgentRegistry(max_agents=8, ttl_seconds=60, clock=clock)
+    first = registry.get(("weather",), object)
+
+    clock.now = 59
+    assert registry.get(("weather",), object) is first
+    clock.now = 59 + 61
+    assert registry.get(("weather",), object) is not first
+    assert registry.stats()["evictions"] == 1
+
+
+class CountingLocks(dict):
+    """The registry's per-key build locks, counting the callers that missed and went for one."""
+
+    def __init__(self):
+        super().__init__()
+        self.requests = 0
+
+    def setdefault(self, key, default=None):
+        self.requests += 1
+        return super().setdefault(key, default)
+
+
+def test_concurrent_gets_build_a_key_once_and_count_each_lookup_once():
+    registry = AgentRegistry()
+    registry._build_locks = locks = CountingLocks()
+    release = threading.Event()
+    builds = []
+
+    def slow_factory():
+        builds.append("pdf")
+        release.wait(10)
+        return object()
+
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(registry.get(("pdf",), slow_factory)), daemon=True)
+        for _ in range(4)
+    ]
+    for thread in threads:
+        thread.start()
+    # Every caller missed the warm pool; the three behind the builder must get its agent
+    wait_for(lambda: builds and locks.requests == 4)
+    # Another key builds while "pdf" is still building
+    other = registry.get(("weather",), object)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert builds == ["pdf"]
+    assert len(results) == 4 and len({id(agent) for agent in results}) == 1
+    assert registry.get(("weather",), object) is other
+    stats = registry.stats()
+    assert (stats["misses"], stats["coalesced"], stats["hits"], stats["builds"]) == (2, 3, 1, 2)
+    assert stats["hit_rate"] == 4 / 6
+
+
+def test_a_failed_build_is_retried_by_the_next_get():
+    registry = AgentRegistry()
+
+    def failing():
+        raise RuntimeError("ingestion failed")
+
+    with pytest.raises(RuntimeError):
+        registry.get(("pdf",), failing)
+    agent = registry.get(("pdf",), object)
+
+    assert registry.get(("pdf",), object) is agent
+    assert registry.stats()["build_errors"] == 1
@@ -0,0 +1,69 @@
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from nodes.node import build_routing_engine
+
+PDF, WEATHER = "pdf_agent", "weather_agent"
+
+
+class ReplyLLM:
+    def __init__(self, reply):
+        self.reply = reply
+        self.calls = 0
+
+    def invoke(self, prompt):
+        self.calls += 1
+        return self.reply
+
+
+@pytest.fixture
+def engine():
+    return build_routing_engine(strategy="centroid")
+
+
+def routes(engine, message):
+    return [(route.question, route.agent) for route in engine.route(message)]
+
+
+@pytest.mark.parametrize("message", [
+    "Where does he live and what is the weather there?",
+    "Which companies did he intern at and what did he do there?",
+    "What's the weather in Delhi and is it going to rain there?",
+    "What is his latest project and which stack does it use?",
+])
+def test_clause_that_refers_back_stays_with_the_first(engine, message):
+    assert engine.split(message) == [message]
+
+
+def test_independent_clauses_split_and_route_apart(engine):
+    assert routes(engine, "What organizations has Sharath worked for and tell me the weather in Mumbai") == [
+        ("What organizations has Sharath worked for", PDF),
+        ("tell me the weather in Mumbai", WEATHER),
+    ]
+    # Weather's impersonal "it" does not refer back
+    assert [agent for _, agent in routes(engine, "How many projects are listed, and is it raining in Kolkata?")] == [PDF, WEATHER]
+    assert [agent for _, agent in routes(engine, "How humid is Singapore and how windy is it in Dubai?")] == [WEATHER, WEATHER]
+
+
+def test_he_splits_only_towards_another_agent(engine):
+    assert [agent for _, agent in routes(engine, "What's the forecast for Tokyo then summarize his education")] == [WEATHER, PDF]
+    assert engine.split("Which university and which year did he graduate?") == ["Which university and which year did he graduate?"]
+
+
+def test_connectors_inside_one_question_do_not_split(engine):
+    assert routes(engine, "Who were Tom and Jerry's employers?") == [("Who were Tom and Jerry's employers?", PDF)]
+    assert engine.classify("Compare the weather in Delhi and Mumbai") == WEATHER
+
+
+def test_llm_routes_are_cached_and_bad_replies_fall_back(engine):
+    llm = ReplyLLM('[{"question": "Where did he study?", "agent": "pdf_agent"}]')
+    routed = build_routing_engine(strategy="llm", llm=llm)
+    assert routes(routed, "Where did he study?") == [("Where did he study?", PDF)]
+    routed.route("Where did he study?")
+    assert llm.calls == 1
+
+    broken = build_routing_engine(strategy="llm", llm=ReplyLLM("not json"))
+    assert broken.split("Is it cold in Chicago") == engine.split("Is it cold in Chicago")
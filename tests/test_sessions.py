@@ -0,0 +1,73 @@
+import os
+import sys
+import threading
+
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import nodes.node as node
+from nodes.sessions import ConversationSession, extractive_summarizer, get_checkpointer, prune_checkpoints
+from tests.test_node import StubRegistry
+
+
+@pytest.mark.parametrize("kind", ["memory", "sqlite"])
+def test_pruned_session_keeps_one_checkpoint_and_resumes(monkeypatch, kind):
+    monkeypatch.setattr(node, "get_registry", lambda: StubRegistry())
+    checkpointer = get_checkpointer(kind, path=":memory:")
+    session = ConversationSession("t1", checkpointer, summarizer=extractive_summarizer())
+
+    for city in ["Mumbai", "Paris", "Tokyo"]:
+        session.ask(f"what is the weather in {city}")
+
+    config = {"configurable": {"thread_id": "t1"}}
+    assert len(list(checkpointer.list(config))) == 1
+    users = [m.content for m in session.history()["messages"] if m.name is None]
+    assert users == ["what is the weather in Mumbai", "what is the weather in Paris", "what is the weather in Tokyo"]
+
+    # A new session object on the same thread resumes from the pruned checkpoint
+    replies = ConversationSession("t1", checkpointer, summarizer=extractive_summarizer()).ask("weather in Oslo")
+    assert replies[-1].content == "Weather in Oslo: sunny"
+    assert len(list(checkpointer.list(config))) == 1
+
+
+@pytest.mark.parametrize("kind", ["memory", "sqlite"])
+def test_prune_keeps_the_latest_checkpoint_in_place(monkeypatch, kind):
+    monkeypatch.setattr(node, "get_registry", lambda: StubRegistry())
+    checkpointer = get_checkpointer(kind, path=":memory:")
+    session = ConversationSession("t1", checkpointer, summarizer=extractive_summarizer(), prune=False)
+    config = {"configurable": {"thread_id": "t1"}}
+    other = ConversationSession("t2", checkpointer, summarizer=extractive_summarizer(), prune=False)
+    other.ask("weather in Lima")
+    other_checkpoints = len(list(checkpointer.list({"configurable": {"thread_id": "t2"}})))
+
+    for city in ["Mumbai", "Paris"]:
+        session.ask(f"what is the weather in {city}")
+    latest = checkpointer.get_tuple(config)
+    assert len(list(checkpointer.list(config))) > 1
+
+    prune_checkpoints(checkpointer, "t1")
+    pruned = checkpointer.get_tuple(config)
+    assert [c.checkpoint["id"] for c in checkpointer.list(config)] == [latest.checkpoint["id"]]
+    assert pruned.checkpoint["channel_values"] == latest.checkpoint["channel_values"]
+    assert len(list(checkpointer.list({"configurable": {"thread_id": "t2"}}))) == other_checkpoints
+    if kind == "memory":
+        versions = latest.checkpoint["channel_versions"]
+        assert all(key[0] != "t1" or versions.get(key[2]) == key[3] for key in checkpointer.blobs)
+
+
+def test_stream_does_not_hold_the_session_between_events(monkeypatch):
+    monkeypatch.setattr(node, "get_registry", lambda: StubRegistry())
+    session = ConversationSession("t1", get_checkpointer("memory"), summarizer=extractive_summarizer())
+
+    events = session.stream("what is the weather in Paris")
+    first = next(events)
+    # The consumer is paused mid-stream; another turn must still get through
+    other = threading.Thread(target=session.ask, args=("weather in Oslo",), daemon=True)
+    other.start()
+    other.join(5)
+
+    assert not other.is_alive()
+    assert first["agent"] == "pdf_agent"
+    assert [event["agent"] for event in events][-1] == "weather_agent"
+    users = [m.content for m in session.history()["messages"] if m.name is None]
+    assert users == ["what is the weather in Paris", "weather in Oslo"]
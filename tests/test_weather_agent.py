@@ -0,0 +1,65 @@
+import asyncio
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from agents.fakes import FakeChatModel, FakeWeather
+from agents.weather_agent import WeatherAgent
+from agents.weather_cache import WeatherCache
+
+
+class LoggedWeather(FakeWeather):
+    def __init__(self):
+        super().__init__(latency="0")
+        self.locations = []
+
+    def run(self, location):
+        self.locations.append(location)
+        return super().run(location)
+
+    async def arun(self, location):
+        self.locations.append(location)
+        return await super().arun(location)
+
+
+def weather_agent(mode="auto"):
+    return WeatherAgent(weather_cache=WeatherCache(), mode=mode, llm=FakeChatModel(latency="0"), weather=LoggedWeather())
+
+
+def answer(agent, how, question, context=""):
+    if how == "ask":
+        return agent.ask(question, context)
+    if how == "aask":
+        return asyncio.run(agent.aask(question, context))
+    return [event for event in agent.stream(question, context)][-1]["text"]
+
+
+@pytest.mark.parametrize("how", ["ask", "aask", "stream"])
+def test_named_location_is_looked_up_without_the_llm(how):
+    agent = weather_agent()
+
+    report = answer(agent, how, "what is the weather in Paris, France?")
+
+    assert report.startswith("In Paris, France, the current weather")
+    assert agent.llm.calls == 0
+    assert agent.weather_tool.locations == ["Paris, France"]
+
+
+@pytest.mark.parametrize("how", ["ask", "aask", "stream"])
+def test_other_input_goes_to_the_agent_not_the_weather_api(how):
+    agent = weather_agent()
+
+    answer(agent, how, "and is it going to rain there?", context="user: tell me the weather in Mumbai")
+
+    assert agent.llm.calls > 0
+    assert "and is it going to rain there?" not in agent.weather_tool.locations
+
+
+def test_react_mode_uses_the_agent_even_for_a_named_location():
+    agent = weather_agent(mode="react")
+
+    agent.ask("weather in Oslo")
+
+    assert agent.llm.calls > 0
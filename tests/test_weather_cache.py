@@ -0,0 +1,115 @@
+import asyncio
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from agents.weather_cache import WeatherCache
+
+
+class GatedFetch:
+    """A fetch that blocks until ``release`` is set, then returns or raises ``error``."""
+
+    def __init__(self, error: BaseException = None):
+        self.release = threading.Event()
+        self.error = error
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        self.release.wait(10)
+        if self.error is not None:
+            raise self.error
+        return f"report {self.calls}"
+
+
+def wait_for(condition, timeout: float = 5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.001)
+
+
+def fetch_concurrently(cache, fetch, locations):
+    """Start one thread per location, wait until all but the owner are coalesced, then release the fetch."""
+    results = [None] * len(locations)
+
+    def run(i):
+        try:
+            results[i] = cache.get_or_fetch(locations[i], fetch)
+        except BaseException as e:
+            results[i] = e
+
+    threads = [threading.Thread(target=run, args=(i,), daemon=True) for i in range(len(locations))]
+    for thread in threads:
+        thread.start()
+    wait_for(lambda: cache.metrics()["coalesced"] == len(locations) - 1)
+    fetch.release.set()
+    for thread in threads:
+        thread.join(5)
+        assert not thread.is_alive()
+    return results
+
+
+def test_concurrent_lookups_of_one_location_share_a_fetch():
+    cache = WeatherCache()
+    fetch = GatedFetch()
+
+    results = fetch_concurrently(cache, fetch, ["Tokyo", "tokyo ", "TOKYO?", "Tokyo"])
+
+    assert fetch.calls == 1
+    assert results == ["report 1"] * 4
+    assert cache.get_or_fetch("tokyo", fetch) == "report 1"
+    assert cache.metrics()["hits"] == 1
+
+
+@pytest.mark.parametrize("error", [RuntimeError("weather API down"), KeyboardInterrupt()])
+def test_a_failed_fetch_reaches_every_waiter_and_is_not_cached(error):
+    cache = WeatherCache()
+    fetch = GatedFetch(error)
+
+    results = fetch_concurrently(cache, fetch, ["Paris"] * 3)
+
+    assert all(result is error for result in results)
+    assert cache.metrics()["errors"] == 1
+    fetch.error = None
+    assert cache.get_or_fetch("Paris", fetch) == "report 2"
+
+
+def test_reports_expire_after_the_ttl():
+    now = [0.0]
+    cache = WeatherCache(ttl_seconds=300, clock=lambda: now[0])
+    fetch = GatedFetch()
+    fetch.release.set()
+
+    assert cache.get_or_fetch("Lima", fetch) == "report 1"
+    now[0] = 299
+    assert cache.get_or_fetch("Lima", fetch) == "report 1"
+    now[0] = 601
+    assert cache.get_or_fetch("Lima", fetch) == "report 2"
+
+
+def test_concurrent_coroutines_share_a_fetch_and_its_failure():
+    cache = WeatherCache()
+    calls = []
+
+    async def afetch():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        if len(calls) == 1:
+            raise RuntimeError("weather API down")
+        return "sunny"
+
+    async def main():
+        failed = await asyncio.gather(*(cache.aget_or_fetch("Oslo", afetch) for _ in range(3)), return_exceptions=True)
+        succeeded = await asyncio.gather(*(cache.aget_or_fetch("oslo", afetch) for _ in range(3)))
+        return failed, succeeded
+
+    failed, succeeded = asyncio.run(main())
+
+    assert all(isinstance(result, RuntimeError) for result in failed)
+    assert succeeded == ["sunny"] * 3
+    assert len(calls) == 2